@@ -26,9 +26,25 @@ Requisitos:
 Ejemplo:
 1. Una solicitud `GET /product/1` debe devolver los datos del producto con ID 1 y código 200.
 2. Una solicitud `GET /product/999` debe devolver un mensaje de error con código 404.
+
+Endpoints adicionales:
+- `POST /products/batch-get`: Devuelve varios productos por ID en una sola petición.
+- `GET /product/<id>/similar?k=10`: Devuelve los k productos más parecidos usando un KD-tree.
+- `POST /product`, `PUT|PATCH /product/<id>` y `DELETE /product/<id>`: Modifican el catálogo.
+- `POST /admin/reload` (o la señal SIGHUP): Recarga el catálogo en segundo plano.
+- `GET /admin/catalog`: Devuelve la versión del catálogo y el estado de la última recarga.
 """
 
-from flask import Flask, jsonify
+import json
+import os
+import signal
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from flask import Flask, jsonify, request
+from scipy.spatial import cKDTree
 
 # Lista de productos predefinida
 products = [
@@ -37,11 +53,317 @@ products = [
     {"id": 3, "name": "Tablet", "price": 349.99}
 ]
 
+# Índice de productos por ID para búsquedas en O(1)
+# Tras las escrituras (POST/PUT/PATCH/DELETE) es la fuente de verdad del catálogo
+products_by_id = {p["id"]: p for p in products}
+
+# Este contador se usará para asignar IDs únicos a los productos nuevos
+next_id = max(products_by_id) + 1
+
+# Cerrojo que serializa las escrituras; las lecturas nunca lo esperan
+write_lock = threading.Lock()
+
+# Campos que se indican al crear un producto (el ID lo asigna el servidor)
+PRODUCT_FIELDS = ("name", "price")
+
+# Número máximo de IDs admitidos en una consulta por lotes
+MAX_BATCH_SIZE = 100
+
+# Número máximo de productos similares que se pueden pedir
+MAX_SIMILAR = 100
+
+# Versión del catálogo: se incrementa cada vez que cambian los productos
+catalog_version = 0
+
+# Peso de la categoría frente al precio estandarizado: dos productos de categorías distintas
+# quedan a una distancia extra de CATEGORY_WEIGHT * sqrt(2)
+CATEGORY_WEIGHT = 1.0
+
+# Estado inmutable de un KD-tree construido para una versión concreta del catálogo
+SimilarityState = namedtuple("SimilarityState", "version tree ids rows mean std category_codes")
+
+def raw_features(product, category_codes):
+    """
+    Vector de características numéricas de un producto sin normalizar: el precio y, si el
+    catálogo tiene categorías, su categoría en codificación one-hot (una columna por categoría,
+    con valor CATEGORY_WEIGHT en la suya). La categoría es nominal: con un código ordinal dos
+    categorías contiguas en orden alfabético parecerían más similares que el resto.
+    Una categoría desconocida deja todas las columnas a cero.
+    """
+    features = [product["price"]] + [0.0] * len(category_codes)
+    code = category_codes.get(product.get("category"))
+    if code is not None:
+        features[1 + code] = CATEGORY_WEIGHT
+    return features
+
+class SimilarityIndex:
+    """
+    Índice de vecinos más cercanos (scipy.spatial.cKDTree) sobre las características de los productos.
+    El árbol se construye una sola vez; cuando cambia catalog_version se reconstruye en un hilo
+    en segundo plano mientras las consultas siguen usando el árbol anterior.
+    """
+
+    def __init__(self):
+        self._state = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def current(self):
+        """
+        Devuelve el estado actual del índice, construyéndolo si todavía no existe
+        """
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self._state = self.build()
+                state = self._state
+        elif state.version != catalog_version:
+            self._schedule_rebuild()
+        return state
+
+    def _schedule_rebuild(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            self._state = self.build()
+        finally:
+            self._rebuilding = False
+
+    def publish(self, state):
+        """
+        Sustituye el árbol en uso por otro ya construido
+        """
+        self._state = state
+
+    @staticmethod
+    def build(items=None, version=None):
+        """
+        Construye el KD-tree con las características de los productos indicados (por defecto,
+        los del catálogo actual). Solo se estandariza el precio: las columnas one-hot de la
+        categoría ya tienen la escala fijada por CATEGORY_WEIGHT.
+        """
+        if items is None:
+            version = catalog_version
+            items = list(products_by_id.values())
+        categories = sorted({p["category"] for p in items if "category" in p})
+        category_codes = {c: code for code, c in enumerate(categories)}
+
+        dimensions = 1 + len(category_codes)
+        features = np.array([raw_features(p, category_codes) for p in items], dtype=np.float64)
+        features = features.reshape(len(items), dimensions)
+        mean = np.zeros(dimensions)
+        std = np.ones(dimensions)
+        if items:
+            mean[0] = features[:, 0].mean()
+            std[0] = features[:, 0].std() or 1.0
+
+        ids = [p["id"] for p in items]
+        return SimilarityState(
+            version=version,
+            tree=cKDTree((features - mean) / std),
+            ids=ids,
+            rows={product_id: row for row, product_id in enumerate(ids)},
+            mean=mean,
+            std=std,
+            category_codes=category_codes
+        )
+
+    def similar(self, product, k):
+        """
+        Devuelve hasta k pares (producto, distancia) con los productos más cercanos al indicado
+        """
+        state = self.current()
+        if not state.ids:
+            return []
+
+        row = state.rows.get(product["id"])
+        if row is not None:
+            vector = state.tree.data[row]
+        else:
+            vector = (np.array(raw_features(product, state.category_codes)) - state.mean) / state.std
+
+        # Se piden vecinos de sobra para descartar el propio producto y los eliminados desde la construcción
+        distances, rows = state.tree.query(vector, k=min(k + 1, len(state.ids)))
+        result = []
+        for distance, r in zip(np.atleast_1d(distances), np.atleast_1d(rows)):
+            neighbour = products_by_id.get(state.ids[r])
+            if neighbour is None or neighbour["id"] == product["id"]:
+                continue
+            result.append((neighbour, float(distance)))
+        return result[:k]
+
+similarity_index = SimilarityIndex()
+
+def parse_product(data, partial=False, fields=PRODUCT_FIELDS):
+    """
+    Valida los campos de un producto recibidos en una petición de escritura
+    Si partial es True (PATCH) solo se validan los campos presentes
+    El precio debe ser un número no negativo y el resto de campos un texto no vacío
+    Lanza ValueError con un mensaje descriptivo si algún campo no es válido
+    """
+    if not isinstance(data, dict):
+        raise ValueError("El cuerpo de la solicitud debe ser un objeto JSON")
+
+    values = {}
+    for field in fields:
+        if field not in data:
+            if partial:
+                continue
+            raise ValueError(f"El campo '{field}' es obligatorio")
+        value = data[field]
+        if field == "price":
+            if type(value) not in (int, float) or value < 0:
+                raise ValueError("El campo 'price' debe ser un número no negativo")
+        elif not isinstance(value, str) or not value.strip():
+            raise ValueError(f"El campo '{field}' debe ser un texto no vacío")
+        values[field] = value
+
+    if not values:
+        raise ValueError("No se ha indicado ningún campo a actualizar")
+    return values
+
+def load_products(path=None, default=products, fields=PRODUCT_FIELDS):
+    """
+    Carga la lista de productos desde un fichero JSON, o devuelve default si no se indica
+    Lanza ValueError si el contenido del fichero no es una lista de productos válidos
+    """
+    if path is None:
+        return default
+
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    if not isinstance(items, list):
+        raise ValueError("El fichero de productos debe contener una lista")
+
+    ids = set()
+    for item in items:
+        parse_product(item, fields=fields)
+        if type(item.get("id")) is not int or item["id"] in ids:
+            raise ValueError(f"ID de producto no válido o repetido: {item.get('id')!r}")
+        ids.add(item["id"])
+    return items
+
+class CatalogReloader:
+    """
+    Recarga el catálogo en segundo plano al estilo RCU: el índice por ID y el KD-tree nuevos
+    se construyen sin bloquear a nadie y se publican con asignaciones de referencias.
+    Los lectores siempre ven índices completos, ya sean los anteriores o los nuevos.
+
+    Las escrituras realizadas mientras se construye el catálogo nuevo se descartan:
+    los datos recargados sustituyen al catálogo completo.
+
+    load lee los productos de un fichero y publish() los pone en servicio; otros catálogos
+    reutilizan la recarga en segundo plano sustituyendo ambos.
+    """
+
+    def __init__(self, load=load_products):
+        self._load = load
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_error = None
+        self.last_reload_at = None
+
+    @property
+    def running(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def start(self, path=None):
+        """
+        Inicia una recarga en segundo plano. Devuelve False si ya hay una en curso.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._thread = threading.Thread(target=self._reload, args=(path,), daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        """
+        Espera a que termine la recarga en curso, si la hay
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def publish(self, items):
+        """
+        Construye el índice por ID y el KD-tree de los productos indicados y los pone en servicio
+        """
+        global products_by_id, next_id, catalog_version
+        new_index = {p["id"]: dict(p) for p in items}
+        version = catalog_version + 1
+        state = SimilarityIndex.build(list(new_index.values()), version)
+        with write_lock:
+            version = max(version, catalog_version + 1)
+            similarity_index.publish(state._replace(version=version))
+            products_by_id = new_index
+            next_id = max(new_index, default=0) + 1
+            catalog_version = version
+
+    def _reload(self, path):
+        try:
+            self.publish(self._load(path))
+            self.last_error = None
+            self.last_reload_at = time.time()
+        except (OSError, ValueError) as e:
+            self.last_error = str(e)
+
+reloader = CatalogReloader()
+
+def insert_product(fields):
+    """
+    Añade un producto con el siguiente ID disponible y lo devuelve
+    """
+    global catalog_version, next_id
+    with write_lock:
+        product = {"id": next_id, **fields}
+        products_by_id[product["id"]] = product
+        next_id += 1
+        catalog_version += 1
+        return product
+
+def replace_product(product_id, fields):
+    """
+    Actualiza los campos indicados de un producto y devuelve su nueva versión (o None si no existe).
+    Se crea un diccionario nuevo y se sustituye con una única asignación, de modo que
+    un lector ve el producto anterior o el nuevo, nunca uno a medio actualizar.
+    """
+    global catalog_version
+    with write_lock:
+        old = products_by_id.get(product_id)
+        if old is None:
+            return None
+        product = {**old, **fields, "id": product_id}
+        products_by_id[product_id] = product
+        catalog_version += 1
+        return product
+
+def remove_product(product_id):
+    """
+    Elimina un producto. Devuelve False si no existe.
+    """
+    global catalog_version
+    with write_lock:
+        if products_by_id.pop(product_id, None) is None:
+            return False
+        catalog_version += 1
+        return True
+
 def create_app():
     """
     Crea y configura la aplicación Flask
     """
     app = Flask(__name__)
+    # Fichero JSON opcional con los productos que se cargan al recargar el catálogo
+    app.config["PRODUCTS_FILE"] = os.environ.get("PRODUCTS_FILE")
 
     @app.route('/product/<int:product_id>', methods=['GET'])
     def get_product(product_id):
@@ -50,8 +372,8 @@ def create_app():
         - Si existe: devuelve el producto con código 200 (OK)
         - Si no existe: devuelve un error con código 404 (Not Found)
         """
-        # Busca el producto en la lista
-        product = next((p for p in products if p["id"] == product_id), None)
+        # Busca el producto en el índice por ID
+        product = products_by_id.get(product_id)
 
         if product:
             # Si el producto existe, devuelve los datos con código 200
@@ -60,8 +382,127 @@ def create_app():
             # Si no existe, devuelve un mensaje de error con código 404
             return jsonify({"error": "Producto no encontrado", "id": product_id}), 404
 
+    @app.route('/product/<int:product_id>/similar', methods=['GET'])
+    def get_similar_products(product_id):
+        """
+        Devuelve los k productos más parecidos (por precio y categoría) a un producto
+        Parámetro de consulta k: número de productos a devolver (por defecto 10)
+        - Si el producto existe: devuelve los productos similares con código 200 (OK)
+        - Si k no es válido: devuelve un error con código 400 (Bad Request)
+        - Si el producto no existe: devuelve un error con código 404 (Not Found)
+        """
+        k = request.args.get('k', 10, type=int)
+        if k is None or not 1 <= k <= MAX_SIMILAR:
+            return jsonify({"error": f"El parámetro k debe ser un entero entre 1 y {MAX_SIMILAR}"}), 400
+
+        product = products_by_id.get(product_id)
+        if not product:
+            return jsonify({"error": "Producto no encontrado", "id": product_id}), 404
+
+        similar = [
+            {**neighbour, "distance": round(distance, 4)}
+            for neighbour, distance in similarity_index.similar(product, k)
+        ]
+        return jsonify({"id": product_id, "similar": similar}), 200
+
+    @app.route('/product', methods=['POST'])
+    def create_product():
+        """
+        Crea un producto nuevo
+        El cuerpo debe incluir un JSON con los campos "name" y "price"
+        Código de estado: 201 - Created, 400 - Bad Request si los datos no son válidos
+        """
+        try:
+            fields = parse_product(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(insert_product(fields)), 201
+
+    @app.route('/product/<int:product_id>', methods=['PUT', 'PATCH'])
+    def update_product(product_id):
+        """
+        Actualiza un producto existente
+        PUT requiere todos los campos; PATCH solo los que se quieran cambiar
+        Código de estado: 200 - OK, 400 - Bad Request, 404 - Not Found si no existe
+        """
+        try:
+            fields = parse_product(request.get_json(silent=True), partial=request.method == 'PATCH')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        product = replace_product(product_id, fields)
+        if product is None:
+            return jsonify({"error": "Producto no encontrado", "id": product_id}), 404
+        return jsonify(product), 200
+
+    @app.route('/product/<int:product_id>', methods=['DELETE'])
+    def delete_product(product_id):
+        """
+        Elimina un producto por su ID
+        Código de estado: 200 - OK, 404 - Not Found si no existe
+        """
+        if not remove_product(product_id):
+            return jsonify({"error": "Producto no encontrado", "id": product_id}), 404
+        return jsonify({"message": "Producto eliminado", "id": product_id}), 200
+
+    @app.route('/products/batch-get', methods=['POST'])
+    def batch_get_products():
+        """
+        Devuelve varios productos en una sola petición
+        El cuerpo de la solicitud debe incluir un JSON con el campo "ids" (lista de enteros)
+        - Devuelve los productos encontrados y los IDs que no existen con código 200 (OK)
+        - Si el cuerpo no es válido o supera MAX_BATCH_SIZE IDs, devuelve un error con código 400 (Bad Request)
+        """
+        data = request.get_json(silent=True)
+        ids = data.get("ids") if isinstance(data, dict) else None
+
+        if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+            return jsonify({"error": "El campo 'ids' debe ser una lista de enteros"}), 400
+
+        if len(ids) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Se admiten como máximo {MAX_BATCH_SIZE} IDs por petición"}), 400
+
+        found = []
+        missing = []
+        # dict.fromkeys elimina los IDs repetidos conservando el orden de la petición
+        for product_id in dict.fromkeys(ids):
+            product = products_by_id.get(product_id)
+            if product:
+                found.append(product)
+            else:
+                missing.append(product_id)
+
+        return jsonify({"products": found, "missing": missing}), 200
+
+    @app.route('/admin/reload', methods=['POST'])
+    def reload_catalog():
+        """
+        Inicia la recarga del catálogo en segundo plano desde PRODUCTS_FILE (o la lista predefinida)
+        Código de estado: 202 - Accepted, 409 - Conflict si ya hay una recarga en curso
+        """
+        if not reloader.start(app.config.get("PRODUCTS_FILE")):
+            return jsonify({"error": "Ya hay una recarga en curso"}), 409
+        return jsonify({"message": "Recarga iniciada", "version": catalog_version}), 202
+
+    @app.route('/admin/catalog', methods=['GET'])
+    def catalog_status():
+        """
+        Devuelve la versión del catálogo publicado y el estado de la última recarga
+        """
+        return jsonify({
+            "version": catalog_version,
+            "products": len(products_by_id),
+            "reloading": reloader.running,
+            "last_reload_at": reloader.last_reload_at,
+            "last_error": reloader.last_error
+        }), 200
+
     return app
 
 if __name__ == '__main__':
     app = create_app()
+    if hasattr(signal, "SIGHUP"):
+        # kill -HUP <pid> recarga el catálogo sin reiniciar el proceso
+        signal.signal(signal.SIGHUP, lambda signum, frame: reloader.start(app.config.get("PRODUCTS_FILE")))
     app.run(debug=True)
\ No newline at end of file
@@ -1,5 +1,8 @@
+import json
+
 import pytest
 from flask.testing import FlaskClient
+import ej2c1
 from ej2c1 import create_app
 
 @pytest.fixture
@@ -26,3 +29,125 @@ def test_get_product_not_found(client):
     response = client.get("/product/999")
     assert response.status_code == 404
     assert "error" in response.json
+
+def test_batch_get_products(client):
+    """Test POST /products/batch-get with existing and missing ids"""
+    response = client.post("/products/batch-get", json={"ids": [2, 999, 1, 2]})
+    assert response.status_code == 200
+    assert response.json == {
+        "products": [
+            {"id": 2, "name": "Smartphone", "price": 699.99},
+            {"id": 1, "name": "Laptop", "price": 999.99}
+        ],
+        "missing": [999]
+    }
+
+def test_batch_get_products_invalid(client):
+    """Test POST /products/batch-get with an invalid body or too many ids"""
+    response = client.post("/products/batch-get", json={"ids": "1,2"})
+    assert response.status_code == 400
+    assert "error" in response.json
+
+    response = client.post("/products/batch-get", json={"ids": list(range(101))})
+    assert response.status_code == 400
+    assert "error" in response.json
+
+def test_get_similar_products(client):
+    """Test GET /product/<id>/similar (nearest products by price)"""
+    response = client.get("/product/2/similar?k=2")
+    assert response.status_code == 200
+    assert response.json["id"] == 2
+    similar = response.json["similar"]
+    assert [p["id"] for p in similar] == [1, 3]
+    assert similar[0]["distance"] <= similar[1]["distance"]
+
+    response = client.get("/product/3/similar?k=1")
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json["similar"]] == [2]
+
+def test_get_similar_products_errors(client):
+    """Test GET /product/<id>/similar with a missing product or an invalid k"""
+    response = client.get("/product/999/similar")
+    assert response.status_code == 404
+    assert "error" in response.json
+
+    response = client.get("/product/1/similar?k=0")
+    assert response.status_code == 400
+    assert "error" in response.json
+
+@pytest.fixture
+def writable_client(monkeypatch) -> FlaskClient:
+    """Test client with its own copy of the catalog so writes do not leak into other tests"""
+    monkeypatch.setattr(ej2c1, "products_by_id", dict(ej2c1.products_by_id))
+    monkeypatch.setattr(ej2c1, "next_id", ej2c1.next_id)
+    monkeypatch.setattr(ej2c1, "catalog_version", ej2c1.catalog_version)
+    monkeypatch.setattr(ej2c1, "similarity_index", ej2c1.SimilarityIndex())
+    app = create_app()
+    app.testing = True
+    with app.test_client() as client:
+        yield client
+
+def test_create_update_delete_product(writable_client):
+    """Test POST /product, PATCH/PUT /product/<id> and DELETE /product/<id>"""
+    response = writable_client.post("/product", json={"name": "Monitor", "price": 199.99})
+    assert response.status_code == 201
+    product_id = response.json["id"]
+    assert writable_client.get(f"/product/{product_id}").json == {"id": product_id, "name": "Monitor", "price": 199.99}
+
+    response = writable_client.patch(f"/product/{product_id}", json={"price": 149.99})
+    assert response.status_code == 200
+    assert response.json == {"id": product_id, "name": "Monitor", "price": 149.99}
+
+    response = writable_client.put(f"/product/{product_id}", json={"name": "Monitor 4K"})
+    assert response.status_code == 400
+
+    response = writable_client.delete(f"/product/{product_id}")
+    assert response.status_code == 200
+    assert writable_client.get(f"/product/{product_id}").status_code == 404
+    assert writable_client.delete(f"/product/{product_id}").status_code == 404
+
+def test_similar_products_after_write(writable_client):
+    """Test that new products are served by the similarity index"""
+    response = writable_client.post("/product", json={"name": "Tablet Lite", "price": 329.99})
+    product_id = response.json["id"]
+
+    response = writable_client.get(f"/product/{product_id}/similar?k=1")
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json["similar"]] == [3]
+
+def test_reload_catalog(writable_client, tmp_path):
+    """Test POST /admin/reload swaps in the catalog read from PRODUCTS_FILE"""
+    products_file = tmp_path / "products.json"
+    products_file.write_text(json.dumps([
+        {"id": 10, "name": "Camera", "price": 549.0},
+        {"id": 11, "name": "Tripod", "price": 59.0}
+    ]))
+    writable_client.application.config["PRODUCTS_FILE"] = str(products_file)
+
+    old_version = writable_client.get("/admin/catalog").json["version"]
+    response = writable_client.post("/admin/reload")
+    assert response.status_code == 202
+    ej2c1.reloader.wait(5)
+
+    status = writable_client.get("/admin/catalog").json
+    assert status["version"] > old_version
+    assert status["products"] == 2
+    assert writable_client.get("/product/1").status_code == 404
+    assert writable_client.get("/product/10").json == {"id": 10, "name": "Camera", "price": 549.0}
+    assert [p["id"] for p in writable_client.get("/product/10/similar?k=1").json["similar"]] == [11]
+    assert writable_client.post("/product", json={"name": "Lens", "price": 299.0}).json["id"] == 12
+
+def test_similar_products_treat_categories_as_nominal(monkeypatch):
+    """Test that every other category is equally far, whatever its alphabetical order"""
+    items = [
+        {"id": 1, "name": "Atlas", "price": 100.0, "category": "books"},
+        {"id": 2, "name": "Reflex", "price": 100.0, "category": "cameras"},
+        {"id": 3, "name": "Quad", "price": 100.0, "category": "drones"}
+    ]
+    monkeypatch.setattr(ej2c1, "products_by_id", {p["id"]: p for p in items})
+    index = ej2c1.SimilarityIndex()
+    index.publish(ej2c1.SimilarityIndex.build(items, ej2c1.catalog_version))
+
+    similar = index.similar(items[0], 2)
+    assert sorted(p["id"] for p, _ in similar) == [2, 3]
+    assert similar[0][1] == pytest.approx(similar[1][1])
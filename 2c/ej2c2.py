@@ -27,58 +27,1245 @@ Si la lista de tareas inicial está vacía:
 Tu tarea es implementar esta API en Flask.
 """
 
-from flask import Flask, jsonify, request
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from bisect import bisect_right, insort
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+from heapq import heapify, heappop, heappush
+from itertools import islice
+from urllib.parse import urlencode
 
-# Esta lista almacenará todas las tareas
-tasks = []
-# Este contador se usará para asignar IDs únicos
-next_id = 1
+from flask import Flask, Response, jsonify, request
 
-def create_app():
+# Número máximo de operaciones en una petición a /tasks/bulk
+MAX_BULK_SIZE = 100_000
+
+# Resultado de TaskStore.bulk(): si se aplicaron los cambios y el resultado de cada operación
+# (la tarea creada, la tarea actualizada o None si no existe, y True/False por cada borrado)
+BulkResult = namedtuple("BulkResult", "applied created updated deleted")
+
+# Cambios recientes que se conservan para /tasks/changes
+CHANGE_LOG_SIZE = 10_000
+
+# Segundos máximos de espera de una petición de long-polling
+MAX_CHANGES_WAIT = 30
+
+# Segundos entre mensajes de keep-alive de Server-Sent Events
+SSE_HEARTBEAT = 15
+
+# Número máximo de tareas por página en GET /tasks?limit=
+MAX_PAGE_SIZE = 10_000
+
+# Tareas serializadas en cada fragmento de una respuesta en streaming
+STREAM_CHUNK_SIZE = 1000
+
+# Campos opcionales de una tarea además de "id" y "name"
+OPTIONAL_FIELDS = ("priority", "due_at")
+
+def parse_due_at(value):
+    """
+    Normaliza una fecha ISO 8601 a UTC con precisión de segundos ("2024-05-01T10:00:00+00:00").
+    Con un formato fijo, el orden de las cadenas es el orden cronológico.
+    Las fechas sin zona horaria se consideran UTC. Lanza ValueError si no es válida.
+    """
+    if not isinstance(value, str):
+        raise ValueError("El campo 'due_at' debe ser una fecha ISO 8601")
+    try:
+        due_at = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("El campo 'due_at' debe ser una fecha ISO 8601") from None
+    if due_at.tzinfo is None:
+        due_at = due_at.replace(tzinfo=timezone.utc)
+    return due_at.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+def parse_task_fields(data):
+    """
+    Valida los campos opcionales presentes en el cuerpo de una petición y los devuelve
+    normalizados. Un campo a null indica que se elimina. Lanza ValueError si alguno no es válido.
+    """
+    fields = {field: data[field] for field in OPTIONAL_FIELDS if field in data}
+    priority = fields.get("priority")
+    if priority is not None and type(priority) is not int:
+        raise ValueError("El campo 'priority' debe ser un entero")
+    if fields.get("due_at") is not None:
+        fields["due_at"] = parse_due_at(fields["due_at"])
+    return fields
+
+def schedule_key(task):
+    """
+    Orden de /tasks/next: primero las tareas con fecha límite (de la más próxima a la más lejana),
+    después las que solo tienen prioridad; a igualdad, mayor prioridad y después menor ID
+    """
+    due_at = task.get("due_at")
+    return (due_at is None, due_at or "", -task.get("priority", 0), task["id"])
+
+def is_scheduled(task):
+    return "due_at" in task or "priority" in task
+
+def merge_fields(task, fields):
+    """
+    Aplica a una tarea los campos opcionales indicados; los que valen None se eliminan
+    """
+    for field, value in (fields or {}).items():
+        if value is None:
+            task.pop(field, None)
+        else:
+            task[field] = value
+    return task
+
+def record_changes(record):
+    """
+    Cambios de tareas de un registro: el propio registro, o los de un lote ({"op": "bulk"})
+    """
+    return record["records"] if record["op"] == "bulk" else [record]
+
+def tokenize(text):
+    """
+    Palabras de un texto en minúsculas y sin tildes, para el índice invertido de nombres.
+    Separa las palabras igual que el tokenizador unicode61 de SQLite.
+    """
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return set(re.findall(r"[^\W_]+", "".join(c for c in text if not unicodedata.combining(c))))
+
+class VersionConflict(Exception):
+    """
+    La versión actual de la tarea no es ninguna de las esperadas (If-Match)
+    """
+
+    def __init__(self, task_id, version):
+        super().__init__(f"La tarea {task_id} está en la versión {version}")
+        self.task_id = task_id
+        self.version = version
+
+class ChangeFeed:
+    """
+    Registro acotado de los últimos cambios de un almacén de tareas.
+
+    Cada cambio recibe un número de secuencia global y consecutivo. Si no se indica el primero,
+    se parte de los microsegundos actuales desde epoch: así un proceso reiniciado nunca reutiliza
+    números de secuencia que un cliente pudiera haber visto antes, y ese cliente recibe la señal
+    de resincronizar en lugar de cambios que no corresponden a sus datos.
+    """
+
+    def __init__(self, seq=None, maxlen=CHANGE_LOG_SIZE):
+        self.seq = time.time_ns() // 1000 if seq is None else seq
+        self._entries = deque(maxlen=maxlen)    # (secuencia, ID, borrado)
+        self._changed = threading.Condition()
+
+    def publish(self, task_id, deleted):
+        """
+        Registra un cambio de la tarea indicada y despierta a los clientes en espera
+        """
+        with self._changed:
+            self.seq += 1
+            self._entries.append((self.seq, task_id, deleted))
+            self._changed.notify_all()
+
+    def since(self, seq):
+        """
+        Devuelve (secuencia actual, cambios posteriores a seq) o None si esos cambios ya no
+        están en el registro (o seq no es de este registro) y el cliente debe resincronizar
+        """
+        with self._changed:
+            oldest = self._entries[0][0] if self._entries else self.seq + 1
+            if seq > self.seq or seq < oldest - 1:
+                return None
+            # Las secuencias son consecutivas: los cambios pendientes son los últimos self.seq - seq
+            entries = list(islice(reversed(self._entries), self.seq - seq))
+            return self.seq, entries[::-1]
+
+    def wait(self, seq, timeout):
+        """
+        Espera hasta timeout segundos a que haya algún cambio posterior a seq
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: self.seq != seq, timeout)
+
+class TaskStore:
+    """
+    Almacén de tareas indexado por ID.
+    Los diccionarios de Python conservan el orden de inserción, así que las tareas se siguen
+    listando en el orden en que se crearon, y obtener, actualizar o eliminar una tarea es O(1).
+
+    Es seguro para servidores con varios hilos: todas las operaciones se hacen con un cerrojo,
+    de modo que la asignación de IDs es atómica y ninguna escritura concurrente se pierde.
+    Las tareas no se modifican nunca en su sitio: una actualización crea un diccionario nuevo,
+    así que una tarea devuelta a un hilo no cambia mientras se serializa.
+
+    Cada tarea tiene una versión, que empieza en 1 y aumenta con cada actualización.
+    update() y delete() aceptan las versiones esperadas y lanzan VersionConflict si la tarea
+    ha cambiado desde entonces (control de concurrencia optimista).
+
+    Para paginar y buscar, page() usa una lista ordenada de IDs (los borrados se descartan al
+    recorrerla y se compacta cuando son más de la mitad) y un índice invertido palabra -> IDs.
+
+    Las tareas con prioridad o fecha límite están además en un montículo ordenado por schedule_key().
+    Cada entrada lleva la versión de la tarea: al cambiar o borrar una tarea su entrada antigua
+    no se busca ni se elimina, sino que se descarta al encontrarla (borrado perezoso), y el
+    montículo se reconstruye cuando las entradas obsoletas son más de la mitad.
+
+    Cada cambio se describe con un registro ({"op": "put", "task": ...} o {"op": "delete", "id": ...};
+    los de bulk() van juntos en un único {"op": "bulk", "records": [...]}) que _record() aplica,
+    publica en el registro de cambios (changes) y pasa a _log() dentro del cerrojo.
+    Las escrituras validan contra _current(); las subclases pueden redefinir _record() y
+    _current() para aplicar los cambios más tarde (ver DurableTaskStore).
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._versions = {}
+        self._ids = []          # IDs en orden creciente; puede contener IDs borrados
+        self._deleted_ids = 0
+        self._tokens = {}       # palabra del nombre -> IDs de las tareas que la contienen
+        self._schedule = []     # montículo de (schedule_key, versión); puede contener entradas obsoletas
+        self._stale_schedule = 0
+        self._lock = threading.Lock()
+        # Este contador se usará para asignar IDs únicos
+        self.next_id = 1
+        self.changes = ChangeFeed()
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def all(self):
+        """
+        Devuelve la lista de tareas en orden de creación
+        """
+        with self._lock:
+            return list(self._tasks.values())
+
+    def get(self, task_id):
+        """
+        Devuelve la tarea con el ID indicado o None si no existe
+        """
+        return self._tasks.get(task_id)
+
+    def page(self, after=0, limit=None, query=None):
+        """
+        Devuelve, en orden de ID, hasta limit tareas con ID mayor que after.
+        Con query, solo las tareas cuyo nombre contiene todas las palabras de query.
+        """
+        with self._lock:
+            if query is not None:
+                words = tokenize(query)
+                postings = sorted((self._tokens.get(word, set()) for word in words), key=len)
+                ids = sorted(i for i in postings[0].intersection(*postings[1:]) if i > after) if postings else []
+            else:
+                start = bisect_right(self._ids, after)
+                ids = (self._ids[i] for i in range(start, len(self._ids)))
+            result = []
+            for task_id in ids:
+                task = self._tasks.get(task_id)
+                if task is not None:
+                    result.append(task)
+                    if len(result) == limit:
+                        break
+            return result
+
+    def get_versioned(self, task_id):
+        """
+        Devuelve (tarea, versión) o None si la tarea no existe
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return None if task is None else (task, self._versions[task_id])
+
+    def due(self, n, before=None):
+        """
+        Devuelve hasta n tareas programadas en el orden de schedule_key().
+        Con before (fecha normalizada con parse_due_at), solo las que vencen antes de esa fecha.
+        Recorre el montículo de mejor a peor sin modificarlo: el coste depende de n, no del total.
+        """
+        with self._lock:
+            heap = self._schedule
+            # Las entradas obsoletas de la cima se eliminan de verdad
+            while heap and not self._is_current(heap[0]):
+                heappop(heap)
+                self._stale_schedule -= 1
+            result = []
+            frontier = [(heap[0], 0)] if heap else []
+            while frontier and len(result) < n:
+                entry, i = heappop(frontier)
+                key = entry[0]
+                if before is not None and (key[0] or key[1] >= before):
+                    break
+                if self._is_current(entry):
+                    result.append(self._tasks[key[-1]])
+                for child in (2 * i + 1, 2 * i + 2):
+                    if child < len(heap):
+                        heappush(frontier, (heap[child], child))
+            return result
+
+    def _is_current(self, entry):
+        key, version = entry
+        return self._versions.get(key[-1]) == version
+
+    def add(self, name, fields=None):
+        """
+        Crea una tarea con el siguiente ID disponible y la devuelve
+        fields contiene los campos opcionales (OPTIONAL_FIELDS); los que valen None se ignoran
+        """
+        with self._lock:
+            task = merge_fields({"id": self.next_id, "name": name}, fields)
+            ticket = self._record({"op": "put", "task": task, "version": 1})
+        self._wait(ticket)
+        return task
+
+    def update(self, task_id, name, expected_versions=None, fields=None):
+        """
+        Cambia el nombre de una tarea y la devuelve, o devuelve None si no existe
+        """
+        result = self.update_versioned(task_id, name, expected_versions, fields)
+        return result and result[0]
+
+    def update_versioned(self, task_id, name, expected_versions=None, fields=None):
+        """
+        Cambia el nombre de una tarea y devuelve (tarea, nueva versión), o None si no existe.
+        fields contiene los campos opcionales que cambian; los que valen None se eliminan.
+        Si se indican expected_versions y la versión actual no es una de ellas, lanza VersionConflict.
+        """
+        with self._lock:
+            entry = self._current(task_id)
+            if entry is None:
+                return None
+            task, version = entry
+            if expected_versions is not None and version not in expected_versions:
+                raise VersionConflict(task_id, version)
+            task = merge_fields({**task, "name": name}, fields)
+            ticket = self._record({"op": "put", "task": task, "version": version + 1})
+        self._wait(ticket)
+        return task, version + 1
+
+    def delete(self, task_id, expected_versions=None):
+        """
+        Elimina una tarea. Devuelve False si no existe.
+        Si se indican expected_versions y la versión actual no es una de ellas, lanza VersionConflict.
+        """
+        with self._lock:
+            entry = self._current(task_id)
+            if entry is None:
+                return False
+            version = entry[1]
+            if expected_versions is not None and version not in expected_versions:
+                raise VersionConflict(task_id, version)
+            ticket = self._record({"op": "delete", "id": task_id})
+        self._wait(ticket)
+        return True
+
+    def bulk(self, creates=(), updates=(), deletes=(), atomic=False):
+        """
+        Aplica en una sola pasada varias altas ((nombre, campos)), actualizaciones
+        ((id, nombre, campos)) y borrados (IDs), en ese orden, tomando el cerrojo una única vez.
+        Los campos opcionales se aplican como en add() y update_versioned().
+        Con atomic=True, si alguna actualización o borrado se refiere a una tarea inexistente
+        no se aplica ningún cambio. Devuelve un BulkResult.
+        """
+        with self._lock:
+            # Cambios del lote aún no aplicados: ID -> (tarea nueva, versión), o None si se borra
+            changes = {}
+            records = []
+
+            def current(task_id):
+                if task_id in changes:
+                    return changes[task_id]
+                return self._current(task_id)
+
+            created = []
+            for offset, (name, fields) in enumerate(creates):
+                task = merge_fields({"id": self.next_id + offset, "name": name}, fields)
+                changes[task["id"]] = (task, 1)
+                records.append({"op": "put", "task": task, "version": 1})
+                created.append(task)
+
+            updated = []
+            for task_id, name, fields in updates:
+                entry = current(task_id)
+                task = None
+                if entry is not None:
+                    task = merge_fields({**entry[0], "name": name}, fields)
+                    changes[task_id] = (task, entry[1] + 1)
+                    records.append({"op": "put", "task": task, "version": entry[1] + 1})
+                updated.append(task)
+
+            deleted = []
+            for task_id in deletes:
+                exists = current(task_id) is not None
+                if exists:
+                    changes[task_id] = None
+                    records.append({"op": "delete", "id": task_id})
+                deleted.append(exists)
+
+            applied = not atomic or (None not in updated and all(deleted))
+            if not applied:
+                return BulkResult(False, created, updated, deleted)
+            # Un único registro: el lote se guarda y se aplica entero o no se aplica
+            ticket = self._record({"op": "bulk", "records": records}) if records else None
+        if records:
+            self._wait(ticket)
+        return BulkResult(True, created, updated, deleted)
+
+    def _current(self, task_id):
+        """
+        Devuelve (tarea, versión) contra la que se valida un cambio nuevo, o None si no existe.
+        Se llama con el cerrojo tomado.
+        """
+        task = self._tasks.get(task_id)
+        return None if task is None else (task, self._versions[task_id])
+
+    def _record(self, record):
+        """
+        Aplica un cambio, lo publica en el registro de cambios y lo pasa a _log()
+        """
+        self._apply(record)
+        self._publish(record)
+        return self._log(record)
+
+    def _publish(self, record):
+        for change in record_changes(record):
+            if change["op"] == "put":
+                self.changes.publish(change["task"]["id"], False)
+            else:
+                self.changes.publish(change["id"], True)
+
+    def _apply(self, record):
+        """
+        Aplica un registro de cambio a las tareas en memoria
+        """
+        if record["op"] == "bulk":
+            for change in record["records"]:
+                self._apply(change)
+        elif record["op"] == "put":
+            task = record["task"]
+            old = self._tasks.get(task["id"])
+            self._tasks[task["id"]] = task
+            # Los registros anteriores a las versiones no la incluyen
+            self._versions[task["id"]] = record.get("version", 1)
+            self.next_id = max(self.next_id, task["id"] + 1)
+            if old is None:
+                if not self._ids or task["id"] > self._ids[-1]:
+                    self._ids.append(task["id"])
+                else:
+                    insort(self._ids, task["id"])
+            elif old["name"] != task["name"]:
+                self._unindex(old)
+            if old is None or old["name"] != task["name"]:
+                self._index(task)
+            if old is not None and is_scheduled(old):
+                self._stale_schedule += 1
+            if is_scheduled(task):
+                heappush(self._schedule, (schedule_key(task), self._versions[task["id"]]))
+            self._compact_schedule()
+        else:
+            old = self._tasks.pop(record["id"], None)
+            self._versions.pop(record["id"], None)
+            if old is not None:
+                self._unindex(old)
+                if is_scheduled(old):
+                    self._stale_schedule += 1
+                    self._compact_schedule()
+                self._deleted_ids += 1
+                if self._deleted_ids > len(self._ids) // 2:
+                    self._ids = [task_id for task_id in self._ids if task_id in self._tasks]
+                    self._deleted_ids = 0
+
+    def _compact_schedule(self):
+        if self._stale_schedule > len(self._schedule) // 2:
+            self._schedule = [entry for entry in self._schedule if self._is_current(entry)]
+            heapify(self._schedule)
+            self._stale_schedule = 0
+
+    def _index(self, task):
+        for word in tokenize(task["name"]):
+            self._tokens.setdefault(word, set()).add(task["id"])
+
+    def _unindex(self, task):
+        for word in tokenize(task["name"]):
+            ids = self._tokens.get(word)
+            if ids is not None:
+                ids.discard(task["id"])
+                if not ids:
+                    del self._tokens[word]
+
+    def _reindex(self):
+        """
+        Reconstruye la lista de IDs y el índice de nombres a partir de las tareas
+        """
+        self._ids = sorted(self._tasks)
+        self._deleted_ids = 0
+        self._tokens = {}
+        for task in self._tasks.values():
+            self._index(task)
+        self._schedule = [(schedule_key(t), self._versions[t["id"]]) for t in self._tasks.values() if is_scheduled(t)]
+        heapify(self._schedule)
+        self._stale_schedule = 0
+
+    def _log(self, record):
+        """
+        Se llama con el cerrojo tomado por cada cambio aplicado; devuelve un valor para _wait()
+        """
+        return None
+
+    def _wait(self, ticket):
+        """
+        Se llama sin el cerrojo tras cada cambio, con el valor devuelto por _log()
+        """
+
+class DurableTaskStore(TaskStore):
+    """
+    Almacén de tareas persistente en disco.
+
+    - Cada cambio se añade a un log (ficheros log-<primera secuencia>.jsonl) con un número
+      de secuencia. Las escrituras concurrentes se agrupan: el primer hilo que necesita
+      sincronizar escribe en el fichero todos los registros pendientes y hace un único fsync
+      por lote (group commit); los demás esperan a que su registro quede en disco.
+    - Un cambio solo se aplica en memoria y se publica en changes cuando su lote está en disco,
+      así que las lecturas, el registro de cambios y las instantáneas muestran solo cambios
+      confirmados. Hasta entonces queda en _staged, contra el que se validan los cambios siguientes.
+    - Cada snapshot_every cambios, un hilo en segundo plano cambia a un fichero de log nuevo,
+      guarda una instantánea compacta (snapshot.json) y elimina los logs que ya contiene.
+    - Al arrancar se carga la instantánea y se reproducen solo los registros posteriores,
+      así que el tiempo de recuperación depende de snapshot_every y no de la antigüedad del servicio.
+    """
+
+    def __init__(self, data_dir, snapshot_every=10000, fsync=True):
+        super().__init__()
+        self.data_dir = data_dir
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(data_dir, exist_ok=True)
+
+        self._seq = 0                   # secuencia del último cambio registrado
+        self._durable_seq = 0           # secuencia del último cambio guardado en disco
+        self._applied_seq = 0           # secuencia del último cambio aplicado en memoria
+        self._pending = []              # registros (secuencia, registro, línea) aún no escritos
+        self._staged = {}               # ID -> (secuencia, tarea o None si se borra, versión) aún sin aplicar
+        self._flushing = False
+        self._failed = False            # una escritura del log falló: ya no se confirma ningún cambio
+        self._commit = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._since_snapshot = 0
+        self._snapshotting = False
+        self._snapshot_lock = threading.Lock()
+
+        self._recover()
+        self._durable_seq = self._applied_seq = self._seq
+        # El registro de cambios continúa la secuencia del log, que se conserva entre reinicios
+        self.changes = ChangeFeed(self._seq)
+        self._file = self._open_segment(self._seq + 1)
+
+    def _snapshot_path(self):
+        return os.path.join(self.data_dir, "snapshot.json")
+
+    def _segments(self):
+        """
+        Devuelve los ficheros de log ordenados por su primera secuencia
+        """
+        names = [n for n in os.listdir(self.data_dir) if n.startswith("log-") and n.endswith(".jsonl")]
+        return [os.path.join(self.data_dir, n) for n in sorted(names)]
+
+    def _open_segment(self, first_seq):
+        return open(os.path.join(self.data_dir, f"log-{first_seq:020d}.jsonl"), "a", encoding="utf-8")
+
+    def _recover(self):
+        """
+        Carga la última instantánea y reproduce los registros del log posteriores a ella
+        """
+        if os.path.exists(self._snapshot_path()):
+            with open(self._snapshot_path(), encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self._tasks = {task["id"]: task for task in snapshot["tasks"]}
+            versions = snapshot.get("versions", {})
+            self._versions = {task_id: versions.get(str(task_id), 1) for task_id in self._tasks}
+            self.next_id = snapshot["next_id"]
+            self._reindex()
+            self._seq = snapshot["seq"]
+
+        for path in self._segments():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Línea incompleta al final del log por una caída durante la escritura
+                        break
+                    if record["seq"] > self._seq:
+                        self._apply(record)
+                        self._seq = record["seq"]
+
+    def _current(self, task_id):
+        entry = self._staged.get(task_id)
+        if entry is None:
+            return super()._current(task_id)
+        _, task, version = entry
+        return None if task is None else (task, version)
+
+    def _record(self, record):
+        """
+        Registra el cambio en el log sin aplicarlo; _wait() lo aplica y lo publica cuando está en disco.
+        Si el log ya falló, lanza OSError sin tocar nada.
+        """
+        self._check_failed()
+        seq = self._log(record)
+        for change in record_changes(record):
+            if change["op"] == "put":
+                task = change["task"]
+                self._staged[task["id"]] = (seq, task, change["version"])
+                self.next_id = max(self.next_id, task["id"] + 1)
+            else:
+                self._staged[change["id"]] = (seq, None, None)
+        return seq
+
+    def _check_failed(self):
+        if self._failed:
+            raise OSError("El log de tareas falló en una escritura anterior; el cambio no está en disco")
+
+    def _log(self, record):
+        # Un lote consume una secuencia por cambio, como el registro de cambios al publicarlo:
+        # así changes sigue continuando la secuencia del log tras un reinicio
+        self._seq += len(record_changes(record))
+        line = json.dumps({"seq": self._seq, **record}, ensure_ascii=False) + "\n"
+        with self._commit:
+            self._pending.append((self._seq, record, line))
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every and not self._snapshotting:
+            self._since_snapshot = 0
+            self._snapshotting = True
+            threading.Thread(target=self.snapshot, daemon=True).start()
+        return self._seq
+
+    def _wait(self, seq):
+        """
+        Espera a que el registro con la secuencia indicada esté en disco (group commit)
+        Si falla la escritura de un lote (disco lleno, error de fsync...) el fichero puede haber
+        quedado con una línea parcial: el almacén deja de confirmar cambios, los cambios aún no
+        guardados no se aplican nunca y todos los que los esperan reciben OSError.
+        """
+        with self._commit:
+            while self._durable_seq < seq:
+                self._check_failed()
+                if self._flushing:
+                    self._commit.wait()
+                    continue
+                # Este hilo escribe el lote completo de registros pendientes
+                self._flushing = True
+                batch, self._pending = self._pending, []
+                written = False
+                self._commit.release()
+                try:
+                    self._write_batch(batch)
+                    written = True
+                finally:
+                    self._commit.acquire()
+                    self._flushing = False
+                    if not written:
+                        self._failed = True
+                    elif batch:
+                        self._durable_seq = batch[-1][0]
+                    self._commit.notify_all()
+
+    def _write_batch(self, batch):
+        """
+        Escribe un lote en el log y, ya en disco, lo aplica en memoria y lo publica
+        El cerrojo del fichero se mantiene hasta aplicarlo: así una instantánea nunca ve
+        un lote escrito en un log antiguo pero aún sin aplicar
+        """
+        with self._file_lock:
+            self._file.write("".join(line for _, _, line in batch))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            with self._lock:
+                for seq, record, _ in batch:
+                    self._apply(record)
+                    self._publish(record)
+                    self._applied_seq = seq
+                    for change in record_changes(record):
+                        task_id = change["task"]["id"] if change["op"] == "put" else change["id"]
+                        entry = self._staged.get(task_id)
+                        if entry is not None and entry[0] <= seq:
+                            del self._staged[task_id]
+
+    def snapshot(self):
+        """
+        Guarda una instantánea compacta de las tareas y elimina los logs que ya incluye
+        """
+        try:
+            with self._snapshot_lock:
+                self._take_snapshot()
+        finally:
+            self._snapshotting = False
+
+    def _take_snapshot(self):
+        # 1. Los registros nuevos pasan a otro fichero; los antiguos quedan cerrados
+        # 2. Copia consistente del estado aplicado: con el cerrojo del fichero, todo lo escrito
+        #    en los logs antiguos ya está aplicado y lo aún no escrito irá al fichero nuevo
+        with self._file_lock:
+            old_segments = self._segments()
+            self._file.close()
+            with self._lock:
+                first_seq = self._seq + 1
+                snapshot = {"seq": self._applied_seq, "next_id": self.next_id, "tasks": list(self._tasks.values()),
+                            "versions": self._versions.copy()}
+            self._file = self._open_segment(first_seq)
+
+        # 3. Escritura atómica: fichero temporal + fsync + os.replace
+        tmp_path = self._snapshot_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path())
+
+        # 4. Los logs anteriores al cambio de fichero ya están en la instantánea
+        for path in old_segments:
+            if path != self._file.name:
+                os.remove(path)
+
+    def close(self):
+        """
+        Escribe los registros pendientes y cierra el log
+        """
+        with self._lock:
+            seq = self._seq
+        self._wait(seq)
+        with self._snapshot_lock, self._file_lock:
+            self._file.close()
+
+class SQLiteTaskStore:
+    """
+    Almacén de tareas en una base de datos SQLite, con la misma interfaz que TaskStore.
+    Las tareas no tienen que caber en memoria y se conservan al reiniciar el servicio.
+
+    - La base de datos usa el modo WAL: las lecturas no bloquean a las escrituras ni al revés.
+    - Cada hilo reutiliza su propia conexión (un pool de una conexión por hilo), así que no se
+      abre una conexión por petición ni se comparte una conexión entre hilos.
+    - Las sentencias SQL son constantes, de modo que sqlite3 las prepara una sola vez por
+      conexión y las reutiliza desde su caché de sentencias.
+    - Las búsquedas por ID usan la clave primaria; AUTOINCREMENT evita reutilizar IDs borrados.
+    - El registro de cambios (changes) solo incluye las escrituras hechas desde este proceso.
+    - Las comprobaciones de versión leen y escriben dentro de una transacción BEGIN IMMEDIATE,
+      así que ningún otro proceso puede cambiar la tarea entre la comprobación y la escritura.
+    - La búsqueda por palabras usa una tabla FTS5 (tasks_fts) que los triggers mantienen al día.
+    - Las consultas de /tasks/next y /tasks/overdue recorren índices parciales ordenados por
+      fecha límite y prioridad; las columnas opcionales a NULL no aparecen en las tareas.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1,
+            priority INTEGER,
+            due_at TEXT
+        )
+        """,
+    )
+    # Columnas añadidas después de la primera versión de la tabla
+    MIGRATIONS = {
+        "version": "ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+        "priority": "ALTER TABLE tasks ADD COLUMN priority INTEGER",
+        "due_at": "ALTER TABLE tasks ADD COLUMN due_at TEXT",
+    }
+    SCHEDULE_SCHEMA = (
+        """
+        CREATE INDEX IF NOT EXISTS tasks_due ON tasks (due_at, COALESCE(priority, 0) DESC, id)
+        WHERE due_at IS NOT NULL
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (COALESCE(priority, 0) DESC, id)
+        WHERE due_at IS NULL AND priority IS NOT NULL
+        """,
+    )
+    SEARCH_SCHEMA = (
+        "CREATE VIRTUAL TABLE tasks_fts USING fts5(name, content='tasks', content_rowid='id')",
+        """
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, name) VALUES (new.id, new.name);
+        END
+        """,
+        """
+        CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END
+        """,
+        """
+        CREATE TRIGGER tasks_fts_update AFTER UPDATE OF name ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO tasks_fts (rowid, name) VALUES (new.id, new.name);
+        END
+        """,
+        "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+    )
+    HAS_SEARCH = "SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'"
+    COLUMNS = "id, name, priority, due_at"
+    SELECT_PAGE = f"SELECT {COLUMNS} FROM tasks WHERE id > ? ORDER BY id LIMIT ?"
+    SEARCH_PAGE = """
+        SELECT tasks.id, tasks.name, tasks.priority, tasks.due_at
+        FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid
+        WHERE tasks_fts MATCH ? AND tasks.id > ? ORDER BY tasks.id LIMIT ?
+    """
+    NEXT_DUE = f"""
+        SELECT {COLUMNS} FROM tasks WHERE due_at IS NOT NULL
+        ORDER BY due_at, COALESCE(priority, 0) DESC, id LIMIT ?
+    """
+    NEXT_PRIORITY = f"""
+        SELECT {COLUMNS} FROM tasks WHERE due_at IS NULL AND priority IS NOT NULL
+        ORDER BY COALESCE(priority, 0) DESC, id LIMIT ?
+    """
+    OVERDUE = f"""
+        SELECT {COLUMNS} FROM tasks WHERE due_at IS NOT NULL AND due_at < ?
+        ORDER BY due_at, COALESCE(priority, 0) DESC, id LIMIT ?
+    """
+    SELECT_ALL = f"SELECT {COLUMNS} FROM tasks ORDER BY id"
+    SELECT_ONE = f"SELECT {COLUMNS} FROM tasks WHERE id = ?"
+    SELECT_VERSIONED = f"SELECT {COLUMNS}, version FROM tasks WHERE id = ?"
+    SELECT_VERSION = "SELECT version FROM tasks WHERE id = ?"
+    COUNT = "SELECT COUNT(*) AS total FROM tasks"
+    INSERT = f"INSERT INTO tasks (name, priority, due_at) VALUES (?, ?, ?) RETURNING {COLUMNS}"
+    UPDATE = f"""
+        UPDATE tasks SET name = ?, priority = ?, due_at = ?, version = version + 1
+        WHERE id = ? RETURNING {COLUMNS}
+    """
+    UPDATE_NAME = f"UPDATE tasks SET name = ?, version = version + 1 WHERE id = ? RETURNING {COLUMNS}"
+    DELETE = "DELETE FROM tasks WHERE id = ?"
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.changes = ChangeFeed()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            # Las bases de datos creadas con versiones anteriores de la tabla no tienen todas las columnas
+            columns = [column["name"] for column in conn.execute("PRAGMA table_info(tasks)")]
+            for column, statement in self.MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            for statement in self.SCHEDULE_SCHEMA:
+                conn.execute(statement)
+            if conn.execute(self.HAS_SEARCH).fetchone() is None:
+                for statement in self.SEARCH_SCHEMA:
+                    conn.execute(statement)
+
+    def _connection(self):
+        """
+        Devuelve la conexión del hilo actual, creándola la primera vez
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            conn.row_factory = _row_to_task
+            # En modo WAL, synchronous=NORMAL no puede corromper la base de datos
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def __len__(self):
+        return self._connection().execute(self.COUNT).fetchone()["total"]
+
+    def all(self):
+        """
+        Devuelve la lista de tareas en orden de creación
+        """
+        return self._connection().execute(self.SELECT_ALL).fetchall()
+
+    def get(self, task_id):
+        """
+        Devuelve la tarea con el ID indicado o None si no existe
+        """
+        return self._connection().execute(self.SELECT_ONE, (task_id,)).fetchone()
+
+    def page(self, after=0, limit=None, query=None):
+        """
+        Igual que TaskStore.page(); sin limit devuelve un iterador sobre el cursor,
+        de modo que las filas se leen a medida que se consumen
+        """
+        # En SQLite, LIMIT -1 significa sin límite
+        limit = -1 if limit is None else limit
+        conn = self._connection()
+        if query is None:
+            return conn.execute(self.SELECT_PAGE, (after, limit))
+        words = tokenize(query)
+        if not words:
+            return []
+        match = " ".join(f'"{word}"' for word in sorted(words))
+        return conn.execute(self.SEARCH_PAGE, (match, after, limit))
+
+    def due(self, n, before=None):
+        """
+        Igual que TaskStore.due()
+        """
+        conn = self._connection()
+        if before is not None:
+            return conn.execute(self.OVERDUE, (before, n)).fetchall()
+        tasks = conn.execute(self.NEXT_DUE, (n,)).fetchall()
+        if len(tasks) < n:
+            tasks += conn.execute(self.NEXT_PRIORITY, (n - len(tasks),)).fetchall()
+        return tasks
+
+    def get_versioned(self, task_id):
+        """
+        Devuelve (tarea, versión) o None si la tarea no existe
+        """
+        row = self._connection().execute(self.SELECT_VERSIONED, (task_id,)).fetchone()
+        return None if row is None else _split_version(row)
+
+    def add(self, name, fields=None):
+        """
+        Crea una tarea con el siguiente ID disponible y la devuelve
+        """
+        fields = fields or {}
+        with self._connection() as conn:
+            task = conn.execute(self.INSERT, (name, fields.get("priority"), fields.get("due_at"))).fetchone()
+        self.changes.publish(task["id"], False)
+        return task
+
+    def update(self, task_id, name, expected_versions=None, fields=None):
+        """
+        Cambia el nombre de una tarea y la devuelve, o devuelve None si no existe
+        """
+        result = self.update_versioned(task_id, name, expected_versions, fields)
+        return result and result[0]
+
+    def update_versioned(self, task_id, name, expected_versions=None, fields=None):
+        """
+        Igual que TaskStore.update_versioned()
+        """
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(self.SELECT_VERSIONED, (task_id,)).fetchone()
+            if row is None:
+                return None
+            task, version = _split_version(row)
+            if expected_versions is not None and version not in expected_versions:
+                raise VersionConflict(task_id, version)
+            task = merge_fields(task, fields)
+            task = conn.execute(self.UPDATE, (name, task.get("priority"), task.get("due_at"), task_id)).fetchone()
+        self.changes.publish(task_id, False)
+        return task, version + 1
+
+    def delete(self, task_id, expected_versions=None):
+        """
+        Elimina una tarea. Devuelve False si no existe.
+        Si se indican expected_versions y la versión actual no es una de ellas, lanza VersionConflict.
+        """
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if self._check_version(conn, task_id, expected_versions) is None:
+                return False
+            conn.execute(self.DELETE, (task_id,))
+        self.changes.publish(task_id, True)
+        return True
+
+    def _check_version(self, conn, task_id, expected_versions):
+        """
+        Devuelve la versión actual de la tarea o None si no existe; lanza VersionConflict
+        si no es una de las esperadas (la excepción deshace la transacción)
+        """
+        row = conn.execute(self.SELECT_VERSION, (task_id,)).fetchone()
+        if row is not None and expected_versions is not None and row["version"] not in expected_versions:
+            raise VersionConflict(task_id, row["version"])
+        return None if row is None else row["version"]
+
+    def bulk(self, creates=(), updates=(), deletes=(), atomic=False):
+        """
+        Igual que TaskStore.bulk(), en una única transacción
+        """
+        with self._connection() as conn:
+            created = [conn.execute(self.INSERT, (name, *_optional_columns(fields))).fetchone() for name, fields in creates]
+            updated = [self._bulk_update(conn, task_id, name, fields) for task_id, name, fields in updates]
+            deleted = [conn.execute(self.DELETE, (task_id,)).rowcount > 0 for task_id in deletes]
+            applied = not atomic or (None not in updated and all(deleted))
+            if not applied:
+                conn.rollback()
+        if applied:
+            for task in created + [task for task in updated if task is not None]:
+                self.changes.publish(task["id"], False)
+            for task_id, was_deleted in zip(deletes, deleted):
+                if was_deleted:
+                    self.changes.publish(task_id, True)
+        return BulkResult(applied, created, updated, deleted)
+
+    def _bulk_update(self, conn, task_id, name, fields):
+        """
+        Actualización de bulk(): solo el nombre, o leyendo la tarea si cambian campos opcionales
+        """
+        if not fields:
+            return conn.execute(self.UPDATE_NAME, (name, task_id)).fetchone()
+        row = conn.execute(self.SELECT_VERSIONED, (task_id,)).fetchone()
+        if row is None:
+            return None
+        task = merge_fields(_split_version(row)[0], fields)
+        return conn.execute(self.UPDATE, (name, task.get("priority"), task.get("due_at"), task_id)).fetchone()
+
+    def close(self):
+        """
+        Cierra las conexiones de todos los hilos
+        """
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+def _optional_columns(fields):
+    """
+    Valores de las columnas priority y due_at para unos campos opcionales (None si no están)
+    """
+    fields = fields or {}
+    return fields.get("priority"), fields.get("due_at")
+
+def _split_version(row):
+    """
+    Separa una fila con la columna version en (tarea, versión)
+    """
+    version = row.pop("version")
+    return row, version
+
+def _row_to_task(cursor, row):
+    """
+    Convierte una fila de SQLite en un diccionario de tarea, sin las columnas a NULL
+    """
+    return {column[0]: value for column, value in zip(cursor.description, row) if value is not None}
+
+# Este almacén guardará todas las tareas
+tasks = TaskStore()
+
+def create_app(store=None):
     """
     Crea y configura la aplicación Flask
+    Si se indica store, se usa ese almacén de tareas en lugar del almacén en memoria global
     """
     app = Flask(__name__)
+    if store is None:
+        store = tasks
+
+    def stream_json_list(items):
+        """
+        Genera un array JSON por fragmentos, sin construir la respuesta completa en memoria
+        """
+        yield "["
+        separator = ""
+        items = iter(items)
+        while chunk := list(islice(items, STREAM_CHUNK_SIZE)):
+            yield separator + ",".join(app.json.dumps(item) for item in chunk)
+            separator = ","
+        yield "]"
 
     @app.route('/tasks', methods=['GET'])
     def get_tasks():
         """
-        Devuelve la lista completa de tareas
+        Devuelve la lista de tareas en orden de creación, como un array JSON enviado en streaming
+        Parámetros opcionales:
+        - q: solo las tareas cuyo nombre contiene todas las palabras de q
+        - limit: número máximo de tareas (como mucho MAX_PAGE_SIZE)
+        - cursor: valor de la cabecera X-Next-Cursor de la página anterior
+        Si hay más tareas, las cabeceras X-Next-Cursor y Link (rel="next") indican la página siguiente.
+        La cabecera X-Change-Seq indica la secuencia desde la que pedir cambios a /tasks/changes
+        Código de estado: 200 - OK, 400 - Bad Request si limit o cursor no son válidos
+        """
+        query = request.args.get("q") or None
+        try:
+            limit = int(request.args["limit"]) if "limit" in request.args else None
+            after = int(request.args.get("cursor", 0))
+        except ValueError:
+            limit, after = 0, -1
+        if (limit is not None and not 1 <= limit <= MAX_PAGE_SIZE) or after < 0:
+            return jsonify({"error": f"'limit' debe ser un entero entre 1 y {MAX_PAGE_SIZE} "
+                                     "y 'cursor' un valor devuelto por la API"}), 400
+
+        # La secuencia se lee antes que las tareas: un cambio simultáneo se volverá a enviar
+        headers = {"X-Change-Seq": str(store.changes.seq)}
+        if limit is None:
+            tasks = store.page(after, query=query)
+        else:
+            # Se pide una tarea más para saber si hay página siguiente
+            tasks = list(store.page(after, limit + 1, query))
+            if len(tasks) > limit:
+                tasks = tasks[:limit]
+                cursor = str(tasks[-1]["id"])
+                params = {**request.args.to_dict(), "cursor": cursor}
+                headers["X-Next-Cursor"] = cursor
+                headers["Link"] = f'<{request.base_url}?{urlencode(params)}>; rel="next"'
+        return Response(stream_json_list(tasks), mimetype="application/json", headers=headers)
+
+    def changes_since(since):
+        """
+        Cuerpo de respuesta con las tareas cambiadas y los IDs eliminados después de since,
+        o None si el cliente debe resincronizar
+        """
+        result = store.changes.since(since)
+        if result is None:
+            return None
+        seq, entries = result
+        # Solo cuenta el último cambio de cada tarea; se envía su estado actual
+        latest = {task_id: deleted for _, task_id, deleted in entries}
+        changed, deleted = [], []
+        for task_id, was_deleted in latest.items():
+            task = None if was_deleted else store.get(task_id)
+            if task is None:
+                deleted.append(task_id)
+            else:
+                changed.append(task)
+        return {"seq": seq, "changed": changed, "deleted": deleted}
+
+    def resync_error(since):
+        return {"error": "Los cambios solicitados ya no están disponibles; vuelve a pedir GET /tasks",
+                "resync": True, "since": since, "seq": store.changes.seq}
+
+    def stream_changes(since):
+        """
+        Genera eventos Server-Sent Events con los cambios a partir de since
         """
-        return jsonify(tasks), 200
+        while True:
+            body = changes_since(since)
+            if body is None:
+                yield f"event: resync\ndata: {json.dumps(resync_error(since), ensure_ascii=False)}\n\n"
+                return
+            if body["changed"] or body["deleted"]:
+                since = body["seq"]
+                yield f"id: {since}\nevent: changes\ndata: {json.dumps(body, ensure_ascii=False)}\n\n"
+            elif not store.changes.wait(since, SSE_HEARTBEAT):
+                # Comentario de keep-alive para que los proxies no cierren la conexión
+                yield ": keep-alive\n\n"
+
+    @app.route('/tasks/changes', methods=['GET'])
+    def get_task_changes():
+        """
+        Devuelve los cambios posteriores a la secuencia since: las tareas creadas o modificadas
+        ("changed"), los IDs eliminados ("deleted") y la nueva secuencia ("seq")
+        - Con wait=<segundos> (máximo MAX_CHANGES_WAIT), si no hay cambios espera a que los haya (long-polling)
+        - Con la cabecera "Accept: text/event-stream" envía los cambios como Server-Sent Events;
+          la cabecera Last-Event-ID sustituye a since al reconectar
+        Código de estado: 200 - OK, 400 - Bad Request si since o wait no son válidos,
+        410 - Gone si esos cambios ya no están disponibles y hay que volver a pedir GET /tasks
+        """
+        since = request.headers.get("Last-Event-ID", request.args.get("since"))
+        try:
+            since = int(since)
+            wait = min(float(request.args.get("wait", 0)), MAX_CHANGES_WAIT)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Los parámetros 'since' (entero) y 'wait' (segundos) no son válidos"}), 400
+
+        if request.accept_mimetypes.best == "text/event-stream":
+            return Response(stream_changes(since), mimetype="text/event-stream",
+                            headers={"Cache-Control": "no-cache"})
+
+        body = changes_since(since)
+        if body is not None and not body["changed"] and not body["deleted"] and wait > 0:
+            store.changes.wait(since, wait)
+            body = changes_since(since)
+        if body is None:
+            return jsonify(resync_error(since)), 410
+        return jsonify(body), 200
 
     @app.route('/tasks', methods=['POST'])
     def add_task():
         """
         Aguela una nueva tarea
         El cuerpo de la solicitud debe incluir un JSON con el campo "name"
+        y puede incluir "priority" (entero) y "due_at" (fecha ISO 8601)
         """
-        global next_id
         data = request.get_json()
 
         if not data or 'name' not in data:
             return jsonify({"error": "El campo 'name' es obligatorio"}), 400
 
-        task = {
-            "id": next_id,
-            "name": data["name"]
-        }
-        tasks.append(task)
-        next_id += 1
+        try:
+            fields = parse_task_fields(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        task = store.add(data["name"], fields)
         return jsonify(task), 201
 
+    def scheduled_limit(default):
+        """
+        Valor del parámetro n (número de tareas), o None si no es válido
+        """
+        n = request.args.get("n", default, type=int)
+        return n if n is not None and 1 <= n <= MAX_PAGE_SIZE else None
+
+    @app.route('/tasks/next', methods=['GET'])
+    def get_next_tasks():
+        """
+        Devuelve las n tareas (por defecto 10) que hay que atender antes: primero las que tienen
+        fecha límite, de la más próxima a la más lejana, y después las que solo tienen prioridad;
+        a igualdad, la de mayor prioridad
+        Código de estado: 200 - OK, 400 - Bad Request si n no es válido
+        """
+        n = scheduled_limit(10)
+        if n is None:
+            return jsonify({"error": f"'n' debe ser un entero entre 1 y {MAX_PAGE_SIZE}"}), 400
+        return jsonify(store.due(n)), 200
+
+    @app.route('/tasks/overdue', methods=['GET'])
+    def get_overdue_tasks():
+        """
+        Devuelve hasta n tareas (por defecto 100) cuya fecha límite ya ha pasado, de la más antigua a la más reciente
+        Código de estado: 200 - OK, 400 - Bad Request si n no es válido
+        """
+        n = scheduled_limit(100)
+        if n is None:
+            return jsonify({"error": f"'n' debe ser un entero entre 1 y {MAX_PAGE_SIZE}"}), 400
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return jsonify(store.due(n, before=now)), 200
+
+    def expected_versions():
+        """
+        Versiones aceptadas por la cabecera If-Match, o None si no hay cabecera o es "*"
+        """
+        if "If-Match" not in request.headers or request.if_match.star_tag:
+            return None
+        # Un ETag que no es una versión de tarea no coincide nunca
+        return {int(tag) for tag in request.if_match.as_set() if tag.isdigit()}
+
+    def version_conflict(error):
+        return (jsonify({"error": "La tarea ha cambiado; vuelve a obtenerla antes de modificarla",
+                         "id": error.task_id}),
+                412, {"ETag": f'"{error.version}"'})
+
+    @app.route('/tasks/<int:task_id>', methods=['GET'])
+    def get_task(task_id):
+        """
+        Devuelve una tarea por su ID, con su versión en la cabecera ETag
+        Código de estado: 200 - OK, 404 - Not Found si no existe
+        """
+        result = store.get_versioned(task_id)
+        if result is None:
+            return jsonify({"error": "Tarea no encontrada", "id": task_id}), 404
+        task, version = result
+        return jsonify(task), 200, {"ETag": f'"{version}"'}
+
     @app.route('/tasks/<int:task_id>', methods=['DELETE'])
     def delete_task(task_id):
         """
         Elimina una tarea específica por su ID
+        Con la cabecera If-Match solo se elimina si la tarea sigue en esa versión (ETag)
+        Código de estado: 200 - OK, 404 - Not Found si no existe, 412 - Precondition Failed si ha cambiado
         """
-        global tasks
-        task = next((t for t in tasks if t["id"] == task_id), None)
+        try:
+            deleted = store.delete(task_id, expected_versions())
+        except VersionConflict as error:
+            return version_conflict(error)
 
-        if not task:
+        if not deleted:
             return jsonify({"error": "Tarea no encontrada", "id": task_id}), 404
 
-        tasks = [t for t in tasks if t["id"] != task_id]
         return jsonify({"message": "Tarea eliminada", "id": task_id}), 200
 
     @app.route('/tasks/<int:task_id>', methods=['PUT'])
@@ -86,23 +1273,118 @@ def create_app():
         """
         Actualiza el nombre de una tarea existente por su ID
         El cuerpo de la solicitud debe incluir un JSON con el campo "name"
-        Código de estado: 200 - OK si se actualizó, 404 - Not Found si no existe
+        Si incluye "priority" o "due_at" también se actualizan; con el valor null se eliminan
+        Con la cabecera If-Match solo se actualiza si la tarea sigue en esa versión (ETag);
+        la respuesta incluye el ETag de la nueva versión
+        Código de estado: 200 - OK si se actualizó, 404 - Not Found si no existe,
+        412 - Precondition Failed si la tarea ha cambiado
         """
         data = request.get_json()
 
         if not data or 'name' not in data:
             return jsonify({"error": "El campo 'name' es obligatorio"}), 400
 
-        task = next((t for t in tasks if t["id"] == task_id), None)
+        try:
+            fields = parse_task_fields(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            result = store.update_versioned(task_id, data["name"], expected_versions(), fields)
+        except VersionConflict as error:
+            return version_conflict(error)
 
-        if not task:
+        if not result:
             return jsonify({"error": "Tarea no encontrada", "id": task_id}), 404
 
-        task["name"] = data["name"]
-        return jsonify(task), 200
+        task, version = result
+        return jsonify(task), 200, {"ETag": f'"{version}"'}
+
+    @app.route('/tasks/bulk', methods=['POST'])
+    def bulk_tasks():
+        """
+        Crea, actualiza y elimina varias tareas en una sola petición
+        El cuerpo es un JSON con las listas opcionales:
+        - "create": objetos con el campo "name" y, opcionalmente, "priority" y "due_at"
+        - "update": objetos con los campos "id" y "name" y, opcionalmente, "priority" y "due_at"
+          (con el valor null se eliminan)
+        - "delete": IDs de las tareas a eliminar
+        y el campo opcional "atomic": si es true, o se aplican todos los cambios o ninguno.
+        Devuelve el resultado de cada operación, en el mismo orden, con su propio código de estado.
+        Código de estado: 200 - OK si se aplicaron los cambios válidos, 400 - Bad Request si el cuerpo
+        no es válido (o alguna operación no lo es y atomic es true), 409 - Conflict si atomic es true
+        y alguna tarea no existe
+        """
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "El cuerpo debe ser un objeto JSON"}), 400
+
+        sections = {key: data.get(key, []) for key in ("create", "update", "delete")}
+        if not all(isinstance(items, list) for items in sections.values()):
+            return jsonify({"error": "Los campos 'create', 'update' y 'delete' deben ser listas"}), 400
+        if sum(len(items) for items in sections.values()) > MAX_BULK_SIZE:
+            return jsonify({"error": f"Se admiten como máximo {MAX_BULK_SIZE} operaciones por petición"}), 400
+        atomic = bool(data.get("atomic", False))
+
+        # Cada operación inválida obtiene su error y no se envía al almacén
+        results = {key: [None] * len(items) for key, items in sections.items()}
+        creates, updates, deletes = [], [], []
+        for i, item in enumerate(sections["create"]):
+            if not isinstance(item, dict) or "name" not in item:
+                results["create"][i] = {"status": 400, "error": "El campo 'name' es obligatorio"}
+                continue
+            try:
+                creates.append((i, (item["name"], parse_task_fields(item))))
+            except ValueError as e:
+                results["create"][i] = {"status": 400, "error": str(e)}
+        for i, item in enumerate(sections["update"]):
+            if not isinstance(item, dict) or "name" not in item or type(item.get("id")) is not int:
+                results["update"][i] = {"status": 400, "error": "Los campos 'id' (entero) y 'name' son obligatorios"}
+                continue
+            try:
+                updates.append((i, (item["id"], item["name"], parse_task_fields(item))))
+            except ValueError as e:
+                results["update"][i] = {"status": 400, "error": str(e)}
+        for i, task_id in enumerate(sections["delete"]):
+            if type(task_id) is int:
+                deletes.append((i, task_id))
+            else:
+                results["delete"][i] = {"status": 400, "error": "El ID debe ser un entero"}
+
+        invalid = len(creates) + len(updates) + len(deletes) < sum(len(r) for r in results.values())
+        if atomic and invalid:
+            # Las operaciones válidas quedan a null: no se ha intentado aplicarlas
+            return jsonify({"error": "Alguna operación no es válida; no se aplicó ningún cambio",
+                            "applied": False, **results}), 400
+
+        outcome = store.bulk(
+            [create for _, create in creates],
+            [update for _, update in updates],
+            [task_id for _, task_id in deletes],
+            atomic=atomic,
+        )
+        for (i, _), task in zip(creates, outcome.created):
+            results["create"][i] = {"status": 201, "task": task}
+        for (i, (task_id, _, _)), task in zip(updates, outcome.updated):
+            results["update"][i] = ({"status": 200, "task": task} if task is not None
+                                    else {"status": 404, "error": "Tarea no encontrada", "id": task_id})
+        for (i, task_id), deleted in zip(deletes, outcome.deleted):
+            results["delete"][i] = ({"status": 200, "id": task_id} if deleted
+                                    else {"status": 404, "error": "Tarea no encontrada", "id": task_id})
+
+        if not outcome.applied:
+            return jsonify({"error": "Alguna tarea no existe; no se aplicó ningún cambio",
+                            "applied": False, **results}), 409
+        return jsonify({"applied": True, **results}), 200
 
     return app
 
 if __name__ == '__main__':
-    app = create_app()
+    # Con TASKS_DB las tareas se guardan en SQLite; con TASKS_DATA_DIR, en un log en disco
+    db_path = os.environ.get("TASKS_DB")
+    data_dir = os.environ.get("TASKS_DATA_DIR")
+    if db_path:
+        app = create_app(SQLiteTaskStore(db_path))
+    else:
+        app = create_app(DurableTaskStore(data_dir) if data_dir else None)
     app.run(debug=True)
\ No newline at end of file
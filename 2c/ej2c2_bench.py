@@ -0,0 +1,90 @@
+"""
+Benchmark del almacén de tareas de ej2c2.
+
+Compara la implementación original basada en una lista (búsqueda lineal con next() y
+reconstrucción de la lista en cada borrado) con TaskStore (diccionario indexado por ID)
+y con SQLiteTaskStore (SQLite en modo WAL en un fichero temporal).
+
+Uso:
+    python ej2c2_bench.py [--tasks 1000000] [--ops 20]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from ej2c2 import SQLiteTaskStore, TaskStore
+
+def list_update(tasks, task_id, name):
+    task = next((t for t in tasks if t["id"] == task_id), None)
+    if task:
+        task["name"] = name
+    return task
+
+def list_delete(tasks, task_id):
+    task = next((t for t in tasks if t["id"] == task_id), None)
+    if not task:
+        return tasks
+    return [t for t in tasks if t["id"] != task_id]
+
+def timed(operation, ops):
+    """
+    Ejecuta operation(i) ops veces y devuelve el tiempo medio por operación en microsegundos
+    """
+    start = time.perf_counter()
+    for i in range(ops):
+        operation(i)
+    return (time.perf_counter() - start) / ops * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1_000_000, help="número de tareas")
+    parser.add_argument("--ops", type=int, default=20, help="operaciones medidas por caso")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    ids = [rng.randint(1, args.tasks) for _ in range(args.ops)]
+
+    tasks = [{"id": i, "name": f"Tarea {i}"} for i in range(1, args.tasks + 1)]
+    store = TaskStore()
+    for i in range(1, args.tasks + 1):
+        store.add(f"Tarea {i}")
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp_dir.name, "tasks.db")
+    sqlite_store = SQLiteTaskStore(db_path)
+    # Carga masiva directa en una sola transacción para no medir la inserción
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("INSERT INTO tasks (name) VALUES (?)",
+                         ((f"Tarea {i}",) for i in range(1, args.tasks + 1)))
+
+    results = {
+        "get (lista)": timed(lambda i: next((t for t in tasks if t["id"] == ids[i]), None), args.ops),
+        "get (TaskStore)": timed(lambda i: store.get(ids[i]), args.ops),
+        "get (SQLite)": timed(lambda i: sqlite_store.get(ids[i]), args.ops),
+        "add (TaskStore)": timed(lambda i: store.add("x"), args.ops),
+        "add (SQLite)": timed(lambda i: sqlite_store.add("x"), args.ops),
+        "update (lista)": timed(lambda i: list_update(tasks, ids[i], "x"), args.ops),
+        "update (TaskStore)": timed(lambda i: store.update(ids[i], "x"), args.ops),
+        "update (SQLite)": timed(lambda i: sqlite_store.update(ids[i], "x"), args.ops),
+    }
+
+    def delete_from_list(i):
+        nonlocal tasks
+        tasks = list_delete(tasks, ids[i])
+
+    results["delete (lista)"] = timed(delete_from_list, args.ops)
+    results["delete (TaskStore)"] = timed(lambda i: store.delete(ids[i]), args.ops)
+    results["delete (SQLite)"] = timed(lambda i: sqlite_store.delete(ids[i]), args.ops)
+    sqlite_store.close()
+    tmp_dir.cleanup()
+
+    print(f"{args.tasks} tareas, {args.ops} operaciones por caso")
+    for case, micros in results.items():
+        print(f"{case:<22} {micros:>14.1f} µs/op")
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
+import sys
+import threading
+
 import pytest
 from flask import Flask
 from flask.testing import FlaskClient
-from ej2c2 import create_app
+import ej2c2
+from ej2c2 import create_app, ChangeFeed, DurableTaskStore, SQLiteTaskStore, TaskStore, VersionConflict
 
 @pytest.fixture
 def client() -> FlaskClient:
@@ -10,6 +14,36 @@ def client() -> FlaskClient:
     with app.test_client() as client:
         yield client
 
+# Task store backends; the persistent ones keep their files in the given directory
+STORE_BACKENDS = {
+    "memory": lambda path: TaskStore(),
+    "durable": lambda path: DurableTaskStore(str(path)),
+    "sqlite": lambda path: SQLiteTaskStore(str(path / "tasks.db")),
+}
+
+@pytest.fixture(params=list(STORE_BACKENDS))
+def store(request, tmp_path):
+    """Task store for each backend, closed after the test if it is persistent"""
+    store = STORE_BACKENDS[request.param](tmp_path)
+    yield store
+    if hasattr(store, "close"):
+        store.close()
+
+@pytest.fixture
+def reopen(request, tmp_path):
+    """Close a persistent store and open the same backend again from its files (closed after the test)"""
+    backend = request.node.callspec.params["store"]
+    reopened = []
+
+    def reopen(store):
+        store.close()
+        reopened.append(STORE_BACKENDS[backend](tmp_path))
+        return reopened[-1]
+
+    yield reopen
+    for store in reopened:
+        store.close()
+
 def test_get_tasks_empty(client):
     """Test GET /tasks with an empty task list"""
     response = client.get("/tasks")
@@ -62,3 +96,377 @@ def test_update_nonexistent_task(client):
     response = client.put("/tasks/999", json={"name": "Tarea inexistente"})
     assert response.status_code == 404
     assert response.json == {"error": "Task not found"}
+
+def test_task_store_order_and_delete():
+    """Test TaskStore keeps creation order after updates and deletes"""
+    store = TaskStore()
+    for name in ["a", "b", "c"]:
+        store.add(name)
+
+    assert store.update(2, "B") == {"id": 2, "name": "B"}
+    assert store.delete(1) is True
+    assert store.delete(1) is False
+    assert store.update(1, "x") is None
+    assert store.all() == [{"id": 2, "name": "B"}, {"id": 3, "name": "c"}]
+
+    assert store.add("d")["id"] == 4
+    assert len(store) == 3
+
+def hammer(worker, threads=8):
+    """Run worker(i) on several threads at once with a tiny switch interval to force interleavings"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        barrier = threading.Barrier(threads)
+
+        def run(i):
+            barrier.wait()
+            worker(i)
+
+        pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+def test_concurrent_writers(monkeypatch):
+    """Stress test: parallel POST/DELETE /tasks never duplicate ids or lose writes"""
+    monkeypatch.setattr(ej2c2, "tasks", TaskStore())
+    app = create_app()
+    app.testing = True
+    created = [[] for _ in range(8)]
+
+    def worker(i):
+        client = app.test_client()
+        for n in range(100):
+            task_id = client.post("/tasks", json={"name": f"t{i}-{n}"}).json["id"]
+            created[i].append(task_id)
+            if n % 2:
+                assert client.delete(f"/tasks/{task_id}").status_code == 200
+
+    hammer(worker)
+
+    ids = [task_id for ids in created for task_id in ids]
+    assert len(set(ids)) == 800
+    remaining = app.test_client().get("/tasks").json
+    assert len(remaining) == 400
+    assert [t["id"] for t in remaining] == sorted(t["id"] for t in remaining)
+
+def test_durable_store_recovers_after_restart(tmp_path):
+    """Test DurableTaskStore replays its log after a restart"""
+    store = DurableTaskStore(str(tmp_path))
+    app = create_app(store)
+    client = app.test_client()
+    client.post("/tasks", json={"name": "Comprar leche"})
+    client.post("/tasks", json={"name": "Comprar pan"})
+    client.put("/tasks/1", json={"name": "Comprar leche desnatada"})
+    client.delete("/tasks/2")
+    store.close()
+
+    # A torn trailing line (crash mid-write) is ignored on recovery
+    log_file = sorted(tmp_path.glob("log-*.jsonl"))[-1]
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write('{"seq": 99, "op": "pu')
+
+    recovered = DurableTaskStore(str(tmp_path))
+    assert recovered.all() == [{"id": 1, "name": "Comprar leche desnatada"}]
+    assert recovered.add("Otra tarea")["id"] == 3
+    recovered.close()
+
+def test_durable_store_fails_waiters_after_write_error(tmp_path, monkeypatch):
+    """Test a failed log write is never acknowledged nor visible, for the writer or for later changes"""
+    store = DurableTaskStore(str(tmp_path))
+    client = create_app(store).test_client()
+    client.post("/tasks", json={"name": "Guardada"})
+    seq = int(client.get("/tasks").headers["X-Change-Seq"])
+
+    def full_disk(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(ej2c2.os, "fsync", full_disk)
+    assert client.post("/tasks", json={"name": "Perdida"}).status_code == 500
+    monkeypatch.undo()
+    # Even with the disk back, the store no longer accepts changes, and memory is untouched
+    assert client.put("/tasks/1", json={"name": "Cambiada"}).status_code == 500
+    with pytest.raises(OSError):
+        store.bulk([("Otra", None)])
+    assert client.get("/tasks").json == [{"id": 1, "name": "Guardada"}]
+    assert client.get(f"/tasks/changes?since={seq}").json["changed"] == []
+    store._take_snapshot()
+
+    recovered = DurableTaskStore(str(tmp_path))
+    assert recovered.all() == [{"id": 1, "name": "Guardada"}]
+    recovered.close()
+
+def test_durable_store_snapshots_and_group_commit(tmp_path):
+    """Test concurrent writers with periodic snapshots and bounded log replay"""
+    store = DurableTaskStore(str(tmp_path), snapshot_every=50)
+
+    def worker(i):
+        for n in range(40):
+            task = store.add(f"t{i}-{n}")
+            if n % 4 == 0:
+                store.delete(task["id"])
+
+    hammer(worker, threads=4)
+    store.snapshot()
+    expected = store.all()
+    store.close()
+
+    assert (tmp_path / "snapshot.json").exists()
+    # Only the segment opened by the last snapshot remains
+    assert len(list(tmp_path.glob("log-*.jsonl"))) == 1
+
+    recovered = DurableTaskStore(str(tmp_path))
+    assert recovered.all() == expected
+    assert len(expected) == 120
+    recovered.close()
+
+def test_sqlite_store_matches_in_memory_api(tmp_path):
+    """Test SQLiteTaskStore behind the API, with concurrent writers and persistence"""
+    store = SQLiteTaskStore(str(tmp_path / "tasks.db"))
+    app = create_app(store)
+    client = app.test_client()
+    assert client.post("/tasks", json={"name": "Comprar leche"}).json == {"id": 1, "name": "Comprar leche"}
+    assert client.put("/tasks/1", json={"name": "Comprar pan"}).json == {"id": 1, "name": "Comprar pan"}
+    assert client.put("/tasks/9", json={"name": "x"}).status_code == 404
+    assert client.delete("/tasks/1").status_code == 200
+    assert client.delete("/tasks/1").status_code == 404
+
+    def worker(i):
+        for n in range(25):
+            task = store.add(f"t{i}-{n}")
+            if n % 5 == 0:
+                store.delete(task["id"])
+
+    hammer(worker, threads=4)
+    expected = client.get("/tasks").json
+    assert len(expected) == len(store) == 80
+    # Deleted ids are never reused
+    assert expected[0]["id"] > 1
+    store.close()
+
+    reopened = SQLiteTaskStore(str(tmp_path / "tasks.db"))
+    assert reopened.all() == expected
+    assert reopened.get(expected[-1]["id"]) == expected[-1]
+    reopened.close()
+
+def test_bulk_tasks(store):
+    """Test POST /tasks/bulk with per-item results and all-or-nothing mode"""
+    client = create_app(store).test_client()
+
+    response = client.post("/tasks/bulk", json={"create": [{"name": f"t{i}"} for i in range(1000)]})
+    assert response.status_code == 200
+    assert response.json["create"][-1] == {"status": 201, "task": {"id": 1000, "name": "t999"}}
+
+    response = client.post("/tasks/bulk", json={
+        "create": [{"name": "nueva"}, {}],
+        "update": [{"id": 1, "name": "uno"}, {"id": 5000, "name": "x"}],
+        "delete": [2, 2, "3"],
+    })
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json["create"]] == [201, 400]
+    assert [r["status"] for r in response.json["update"]] == [200, 404]
+    assert [r["status"] for r in response.json["delete"]] == [200, 404, 400]
+    assert store.get(1) == {"id": 1, "name": "uno"}
+    assert store.get(2) is None
+    assert len(store) == 1000
+
+    # All-or-nothing: one missing task rejects the whole batch
+    response = client.post("/tasks/bulk", json={
+        "atomic": True, "create": [{"name": "a"}], "update": [{"id": 3, "name": "b"}], "delete": [2],
+    })
+    assert response.status_code == 409
+    assert response.json["applied"] is False
+    assert response.json["delete"] == [{"status": 404, "error": "Tarea no encontrada", "id": 2}]
+    response = client.post("/tasks/bulk", json={"atomic": True, "create": [{"name": "a"}, {}]})
+    assert response.status_code == 400
+    assert len(store) == 1000 and store.get(3) == {"id": 3, "name": "t2"}
+
+    assert client.post("/tasks/bulk", json={"create": {}}).status_code == 400
+
+def test_task_changes_feed():
+    """Test GET /tasks/changes returns only the changes after a sequence number"""
+    store = TaskStore()
+    store.changes = ChangeFeed(0, maxlen=5)
+    client = create_app(store).test_client()
+    client.post("/tasks", json={"name": "a"})
+    client.post("/tasks", json={"name": "b"})
+
+    response = client.get("/tasks")
+    seq = int(response.headers["X-Change-Seq"])
+    assert seq == 2
+    assert client.get(f"/tasks/changes?since={seq}").json == {"seq": 2, "changed": [], "deleted": []}
+
+    client.put("/tasks/1", json={"name": "a2"})
+    client.post("/tasks", json={"name": "c"})
+    client.delete("/tasks/3")
+    client.delete("/tasks/2")
+    assert client.get(f"/tasks/changes?since={seq}").json == {
+        "seq": 6, "changed": [{"id": 1, "name": "a2"}], "deleted": [3, 2],
+    }
+
+    # Too far behind the bounded log (or from another process): resync
+    for name in "defg":
+        client.post("/tasks", json={"name": name})
+    response = client.get(f"/tasks/changes?since={seq}")
+    assert response.status_code == 410
+    assert response.json["resync"] is True
+    assert client.get("/tasks/changes?since=999").status_code == 410
+    assert client.get("/tasks/changes?since=x").status_code == 400
+
+def test_task_changes_long_poll_and_sse():
+    """Test that long-poll and SSE clients wake up as soon as a task changes"""
+    store = TaskStore()
+    client = create_app(store).test_client()
+    seq = store.changes.seq
+    timer = threading.Timer(0.2, store.add, args=("despierta",))
+    timer.start()
+    response = client.get(f"/tasks/changes?since={seq}&wait=5")
+    timer.join()
+    assert response.json["changed"] == [{"id": 1, "name": "despierta"}]
+    assert response.json["seq"] == seq + 1
+
+    response = client.get("/tasks/changes", headers={"Accept": "text/event-stream", "Last-Event-ID": str(seq)})
+    assert response.mimetype == "text/event-stream"
+    event = next(response.iter_encoded()).decode()
+    assert event.startswith(f"id: {seq + 1}\nevent: changes\n")
+    response.close()
+
+def test_durable_change_feed_survives_restart(tmp_path):
+    """Test the durable store keeps its sequence numbers across restarts"""
+    store = DurableTaskStore(str(tmp_path))
+    store.add("a")
+    seq = store.changes.seq
+    store.close()
+
+    recovered = DurableTaskStore(str(tmp_path))
+    assert recovered.changes.seq == seq
+    recovered.add("b")
+    assert recovered.changes.since(seq) == (seq + 1, [(seq + 1, 2, False)])
+    # Changes from before the restart are no longer in the log
+    assert recovered.changes.since(seq - 1) is None
+    recovered.close()
+
+def test_if_match_versions(store, reopen):
+    """Test ETag versions and If-Match: a stale writer gets 412 instead of a lost update"""
+    client = create_app(store).test_client()
+    client.post("/tasks", json={"name": "Comprar leche"})
+
+    response = client.get("/tasks/1")
+    assert response.json == {"id": 1, "name": "Comprar leche"}
+    etag = response.headers["ETag"]
+    assert etag == '"1"'
+
+    response = client.put("/tasks/1", json={"name": "Comprar pan"}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+
+    # A second writer still holding version 1 loses the race
+    response = client.put("/tasks/1", json={"name": "Comprar sal"}, headers={"If-Match": etag})
+    assert response.status_code == 412
+    assert response.headers["ETag"] == '"2"'
+    assert client.delete("/tasks/1", headers={"If-Match": etag}).status_code == 412
+    assert client.delete("/tasks/1", headers={"If-Match": "W/\"2\""}).status_code == 412
+    assert client.get("/tasks/1").json["name"] == "Comprar pan"
+
+    # Without If-Match (or with *) writes stay unconditional
+    assert client.put("/tasks/1", json={"name": "Comprar miel"}, headers={"If-Match": "*"}).status_code == 200
+    assert client.put("/tasks/1", json={"name": "Comprar té"}).headers["ETag"] == '"4"'
+    assert client.put("/tasks/9", json={"name": "x"}, headers={"If-Match": '"1"'}).status_code == 404
+    if hasattr(store, "close"):
+        store = reopen(store)
+    assert store.get_versioned(1) == ({"id": 1, "name": "Comprar té"}, 4)
+    with pytest.raises(VersionConflict):
+        store.delete(1, expected_versions={3})
+    assert store.delete(1, expected_versions={4, 5})
+
+def test_tasks_paging_and_search(store):
+    """Test GET /tasks with limit/cursor paging and the name word index"""
+    client = create_app(store).test_client()
+    names = ["Comprar leche", "Llamar al médico", "Comprar pan", "Pagar la luz", "comprar LECHE de avena"]
+    store.bulk([(name, None) for name in names * 3])
+    store.delete(2)
+    store.update(4, "Pagar el agua")
+
+    seen = []
+    url = "/tasks?limit=4"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.is_streamed
+        seen.extend(response.json)
+        cursor = response.headers.get("X-Next-Cursor")
+        url = f"/tasks?limit=4&cursor={cursor}" if cursor else None
+    assert seen == client.get("/tasks").json
+    assert len(seen) == 14 and [t["id"] for t in seen] == sorted(t["id"] for t in seen)
+
+    # Word search ignores case and accents, and pages like the full list
+    response = client.get("/tasks?q=leche comprar&limit=4")
+    assert [t["id"] for t in response.json] == [1, 5, 6, 10]
+    assert 'rel="next"' in response.headers["Link"]
+    assert [t["id"] for t in client.get("/tasks?q=leche&cursor=10").json] == [11, 15]
+    assert [t["id"] for t in client.get("/tasks?q=medico").json] == [7, 12]
+    assert client.get("/tasks?q=luz").json == [{"id": 9, "name": "Pagar la luz"}, {"id": 14, "name": "Pagar la luz"}]
+    assert client.get("/tasks?q=agua").json == [{"id": 4, "name": "Pagar el agua"}]
+
+    assert client.get("/tasks?limit=0").status_code == 400
+    assert client.get("/tasks?cursor=abc").status_code == 400
+
+def test_next_and_overdue_tasks(store, reopen):
+    """Test priority/due_at fields with GET /tasks/next and GET /tasks/overdue"""
+    client = create_app(store).test_client()
+    client.post("/tasks", json={"name": "sin programar"})
+    client.post("/tasks", json={"name": "futura", "due_at": "2999-01-01T00:00:00Z"})
+    client.post("/tasks", json={"name": "vencida", "due_at": "2000-01-01T12:00:00+02:00"})
+    client.post("/tasks", json={"name": "vencida urgente", "due_at": "2000-01-01T10:00:00", "priority": 5})
+    client.post("/tasks", json={"name": "solo prioridad", "priority": 1})
+    response = client.post("/tasks", json={"name": "muy vencida", "due_at": "1999-12-31T09:00:00Z"})
+    assert response.json == {"id": 6, "name": "muy vencida", "due_at": "1999-12-31T09:00:00+00:00"}
+
+    # Ties on due_at are broken by priority
+    assert [t["id"] for t in client.get("/tasks/next?n=10").json] == [6, 4, 3, 2, 5]
+    assert [t["id"] for t in client.get("/tasks/next?n=2").json] == [6, 4]
+    assert [t["id"] for t in client.get("/tasks/overdue").json] == [6, 4, 3]
+
+    # Updates and deletes move tasks in and out of the index
+    client.put("/tasks/6", json={"name": "muy vencida", "due_at": None})
+    client.put("/tasks/2", json={"name": "futura", "due_at": "2001-01-01T00:00:00Z"})
+    client.put("/tasks/1", json={"name": "sin programar", "priority": 7})
+    client.delete("/tasks/4")
+    assert client.get("/tasks/6").json == {"id": 6, "name": "muy vencida"}
+    assert [t["id"] for t in client.get("/tasks/overdue?n=5").json] == [3, 2]
+    assert [t["id"] for t in client.get("/tasks/next").json] == [3, 2, 1, 5]
+
+    # /tasks/bulk accepts the same fields
+    response = client.post("/tasks/bulk", json={
+        "create": [{"name": "lote vencida", "priority": 2, "due_at": "2000-01-01T00:00:00"},
+                   {"name": "lote mal", "priority": "alta"}],
+        "update": [{"id": 5, "name": "solo prioridad", "priority": None, "due_at": "1990-01-01T00:00:00Z"},
+                   {"id": 3, "name": "vencida", "due_at": "ayer"}],
+    })
+    assert response.status_code == 200
+    assert response.json["create"][0] == {"status": 201, "task": {
+        "id": 7, "name": "lote vencida", "priority": 2, "due_at": "2000-01-01T00:00:00+00:00"}}
+    assert response.json["create"][1]["status"] == 400
+    assert response.json["update"][0]["task"] == {"id": 5, "name": "solo prioridad", "due_at": "1990-01-01T00:00:00+00:00"}
+    assert response.json["update"][1]["status"] == 400
+    assert [t["id"] for t in client.get("/tasks/overdue").json] == [5, 7, 3, 2]
+
+    assert client.post("/tasks", json={"name": "x", "due_at": "mañana"}).status_code == 400
+    assert client.put("/tasks/1", json={"name": "x", "priority": "alta"}).status_code == 400
+    assert client.get("/tasks/next?n=0").status_code == 400
+    if hasattr(store, "close"):
+        store = reopen(store)
+        assert [t["id"] for t in store.due(10)] == [5, 7, 3, 2, 1]
+
+def test_schedule_index_discards_stale_entries():
+    """Test the heap stays bounded under repeated rescheduling"""
+    store = TaskStore()
+    task = store.add("t", {"priority": 0})
+    for priority in range(1, 1000):
+        store.update(task["id"], "t", fields={"priority": priority})
+    assert len(store._schedule) < 10
+    assert store.due(5) == [{"id": 1, "name": "t", "priority": 999}]
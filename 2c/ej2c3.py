@@ -23,14 +23,55 @@ Requisitos:
 - Devuelve las respuestas en formato JSON utilizando la función jsonify() de Flask.
 - Asegúrate de devolver un código 200 (OK) incluso si no hay productos que cumplan los filtros.
 
+El parámetro `category` admite varias categorías separadas por comas (`category=a,b`) y
+también puede usarse como exclusión (`category!=c`). Estos filtros se resuelven con un
+bitmap por categoría, combinando los bitmaps con operaciones AND/OR/NOT.
+
 Ejemplos:
 1. `GET /products` debe devolver todos los productos.
 2. `GET /products?category=electronics` debe devolver solo productos de categoría "electronics".
 3. `GET /products?min_price=500&max_price=1000` debe devolver productos con precio entre 500 y 1000.
 4. `GET /products?name=pro` debe devolver productos cuyo nombre contenga "pro" (como "Laptop Pro").
+
+Con `fuzzy=true`, el filtro `name` tolera errores tipográficos (por ejemplo, "laptp" encuentra
+"Laptop Pro") y los resultados se ordenan de más a menos parecido.
+
+Además, `GET /products/stats` devuelve estadísticas de precio por categoría (mínimo, máximo,
+media, mediana y percentiles) calculadas con NumPy y admite los mismos filtros, y
+`GET /products/export?format=ndjson|csv` exporta los productos filtrados en streaming.
+
+Los productos se pueden crear, modificar y eliminar con `POST /products`,
+`PUT|PATCH /products/<id>` y `DELETE /products/<id>`; los índices se actualizan de forma
+incremental en cada escritura. `POST /admin/reload` (o la señal SIGHUP) recarga el catálogo
+en segundo plano sin interrumpir las lecturas y `GET /admin/catalog` informa de su versión.
+
+Con varios procesos, `python ej2c3.py --shared-loader` publica el catálogo en memoria
+compartida y los workers arrancados con `SHARED_CATALOG=<prefijo>` lo leen sin copiarlo.
 """
 
-from flask import Flask, jsonify, request
+import bisect
+import csv
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import signal
+import sys
+import threading
+import time
+import weakref
+from collections import namedtuple
+from functools import lru_cache
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from flask import Flask, Response, jsonify, request, stream_with_context
+
+import ej2c1
+
+logger = logging.getLogger(__name__)
 
 # Lista de productos predefinida con categorías
 products = [
@@ -44,60 +85,1109 @@ products = [
     {"id": 8, "name": "Smart Watch", "price": 199.99, "category": "electronics"}
 ]
 
+# Filas por bloque de los bitmaps de categoría (múltiplo de 8)
+BITMAP_BLOCK_BITS = 4096
+
+# Entradas por bloque del índice de precios
+SORTED_BLOCK_SIZE = 512
+
+def build_category_bitmaps(items):
+    """
+    Construye un bitmap por categoría, troceado en bloques de BITMAP_BLOCK_BITS filas:
+    {categoría: {bloque: entero}}, donde el bit j del bloque b corresponde a la posición
+    b * BITMAP_BLOCK_BITS + j. Así una escritura solo reconstruye el entero de su bloque.
+    """
+    positions = {}
+    for position, product in enumerate(items):
+        if product is not None:
+            positions.setdefault(product["category"], []).append(position)
+
+    block_bytes = BITMAP_BLOCK_BITS // 8
+    bitmaps = {}
+    for category, category_positions in positions.items():
+        bits = np.zeros(len(items), dtype=bool)
+        bits[category_positions] = True
+        data = np.packbits(bits, bitorder="little").tobytes()
+        blocks = {}
+        for start in range(0, len(data), block_bytes):
+            value = int.from_bytes(data[start:start + block_bytes], "little")
+            if value:
+                blocks[start // block_bytes] = value
+        bitmaps[category] = blocks
+    return bitmaps
+
+def iter_bitmap(bitmap, offset=0):
+    """
+    Devuelve, en orden creciente, las posiciones de los bits activos de un bitmap (más offset)
+    Recorre los bytes del bitmap (un bit por fila del catálogo), sin pasarlo a texto
+    """
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for index, byte in enumerate(data):
+        while byte:
+            lowest = byte & -byte
+            yield offset + index * 8 + lowest.bit_length() - 1
+            byte ^= lowest
+
+class ChunkedSortedList:
+    """
+    Lista ordenada troceada en bloques (tuplas inmutables) de como mucho 2 * SORTED_BLOCK_SIZE
+    entradas. Insertar o quitar una entrada solo reconstruye su bloque; la lista de bloques se
+    sustituye por una nueva únicamente cuando un bloque se divide o se vacía.
+
+    Pensada para un único escritor (protegido por un cerrojo externo) y lectores sin cerrojo:
+    range() copia los bloques con un único slice y cada bloque es inmutable.
+    """
+
+    def __init__(self, entries=()):
+        entries = sorted(entries)
+        self._blocks = [tuple(entries[i:i + SORTED_BLOCK_SIZE]) for i in range(0, len(entries), SORTED_BLOCK_SIZE)]
+
+    def __iter__(self):
+        for block in list(self._blocks):
+            yield from block
+
+    def add(self, entry):
+        blocks = self._blocks
+        if not blocks:
+            self._blocks = [(entry,)]
+            return
+        index = self._locate(blocks, entry)
+        block = blocks[index]
+        position = bisect.bisect_left(block, entry)
+        block = block[:position] + (entry,) + block[position:]
+        if len(block) > 2 * SORTED_BLOCK_SIZE:
+            self._blocks = blocks[:index] + [block[:SORTED_BLOCK_SIZE], block[SORTED_BLOCK_SIZE:]] + blocks[index + 1:]
+        else:
+            blocks[index] = block
+
+    def remove(self, entry):
+        blocks = self._blocks
+        index = self._locate(blocks, entry)
+        block = blocks[index]
+        position = bisect.bisect_left(block, entry)
+        if position == len(block) or block[position] != entry:
+            raise ValueError(f"{entry!r} no está en la lista")
+        block = block[:position] + block[position + 1:]
+        if block:
+            blocks[index] = block
+        else:
+            self._blocks = blocks[:index] + blocks[index + 1:]
+
+    def range(self, low, high):
+        """
+        Devuelve la lista de entradas entre low y high (ambas incluidas)
+        """
+        blocks = self._blocks
+        # Un escritor puede mover los extremos de un bloque entre la búsqueda y la copia:
+        # se toma un bloque más por cada lado y las entradas se filtran después
+        start = max(bisect.bisect_left(blocks, low, key=lambda block: block[-1]) - 1, 0)
+        end = bisect.bisect_right(blocks, high, key=lambda block: block[0]) + 1
+        return [entry for block in blocks[start:end]
+                for entry in block[bisect.bisect_left(block, low):bisect.bisect_right(block, high)]]
+
+    @staticmethod
+    def _locate(blocks, entry):
+        # Primer bloque cuyo último elemento no es menor que entry (o el último bloque)
+        return min(bisect.bisect_left(blocks, entry, key=lambda block: block[-1]), len(blocks) - 1)
+
+def parse_categories(value):
+    """
+    Convierte un valor del tipo "a,b" en el conjunto de categorías {"a", "b"}
+    """
+    if not value:
+        return set()
+    return {c.strip() for c in value.split(",") if c.strip()}
+
+def trigrams(token):
+    """
+    Devuelve el conjunto de trigramas de una palabra, con relleno al principio y al final
+    """
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def bounded_edit_distance(a, b, limit):
+    """
+    Distancia de Levenshtein entre a y b, o None si es mayor que limit.
+    Abandona el cálculo en cuanto todas las celdas de una fila superan el límite.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+class FuzzyNameIndex:
+    """
+    Índice de nombres para búsqueda tolerante a errores tipográficos.
+    Cada nombre se divide en palabras; un índice de trigramas preselecciona las palabras
+    candidatas y solo con ellas se calcula la distancia de edición acotada.
+    """
+
+    def __init__(self, items=()):
+        self.token_products = {}   # palabra -> IDs de los productos que la contienen
+        self.trigram_tokens = {}   # trigrama -> palabras que lo contienen
+        for product in items:
+            self.add(product)
+
+    @staticmethod
+    def tokenize(text):
+        return text.lower().split()
+
+    def add(self, product):
+        for token in self.tokenize(product["name"]):
+            if token not in self.token_products:
+                self.token_products[token] = set()
+                for trigram in trigrams(token):
+                    self.trigram_tokens.setdefault(trigram, set()).add(token)
+            self.token_products[token].add(product["id"])
+
+    def remove(self, product):
+        for token in self.tokenize(product["name"]):
+            ids = self.token_products.get(token)
+            if ids is None:
+                continue
+            ids.discard(product["id"])
+            if not ids:
+                del self.token_products[token]
+                for trigram in trigrams(token):
+                    tokens = self.trigram_tokens[trigram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self.trigram_tokens[trigram]
+
+    def replace(self, old, new):
+        """
+        Actualiza el índice cuando cambia el nombre de un producto: primero añade las palabras
+        nuevas y después quita las que ya no aparecen, para que el producto nunca desaparezca
+        del índice durante el cambio
+        """
+        old_tokens = set(self.tokenize(old["name"]))
+        new_tokens = set(self.tokenize(new["name"]))
+        self.add({"id": new["id"], "name": " ".join(new_tokens - old_tokens)})
+        self.remove({"id": old["id"], "name": " ".join(old_tokens - new_tokens)})
+
+    def search(self, query, max_distance):
+        """
+        Devuelve un diccionario {id de producto: puntuación} con los productos cuyo nombre
+        contiene, para cada palabra de la consulta, una palabra a distancia <= max_distance.
+        La puntuación es la suma de las distancias (0 = coincidencia exacta).
+        """
+        scores = None
+        for word in self.tokenize(query):
+            word_trigrams = trigrams(word)
+            # Cada edición altera como mucho 3 trigramas
+            required = max(1, len(word_trigrams) - 3 * max_distance)
+            shared = {}
+            for trigram in word_trigrams:
+                for token in self.trigram_tokens.get(trigram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+
+            word_scores = {}
+            for token, count in shared.items():
+                if count < required:
+                    continue
+                distance = bounded_edit_distance(word, token, max_distance)
+                if distance is None:
+                    continue
+                for product_id in self.token_products[token]:
+                    if distance < word_scores.get(product_id, max_distance + 1):
+                        word_scores[product_id] = distance
+
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {pid: score + word_scores[pid] for pid, score in scores.items() if pid in word_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+# Percentiles de precio incluidos en las estadísticas
+PRICE_PERCENTILES = (25, 50, 75, 90, 95, 99)
+
+# Distancia de edición por defecto y máxima en la búsqueda aproximada por nombre
+DEFAULT_FUZZY_DISTANCE = 2
+MAX_FUZZY_DISTANCE = 3
+
+# Columnas de la exportación CSV
+EXPORT_FIELDS = ("id", "name", "price", "category")
+
+# Número de productos por bloque en las exportaciones
+EXPORT_CHUNK_SIZE = 1000
+
+# Filtros normalizados de una consulta (hashables para poder cachear resultados)
+ProductFilters = namedtuple(
+    "ProductFilters", "categories excluded_categories min_price max_price name fuzzy max_distance"
+)
+
+def parse_filters(args):
+    """
+    Lee y normaliza los parámetros de filtrado de una consulta
+    Lanza ValueError con un mensaje descriptivo si algún precio no es un número válido
+    """
+    prices = {}
+    for param in ('min_price', 'max_price'):
+        value = args.get(param)
+        if value is not None:
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError(f"El parámetro {param} debe ser un número válido")
+        prices[param] = value
+
+    fuzzy = args.get('fuzzy', '').lower() in ('1', 'true', 'yes')
+    max_distance = args.get('max_distance', DEFAULT_FUZZY_DISTANCE)
+    try:
+        max_distance = int(max_distance)
+    except ValueError:
+        max_distance = -1
+    if not 0 <= max_distance <= MAX_FUZZY_DISTANCE:
+        raise ValueError(f"El parámetro max_distance debe ser un entero entre 0 y {MAX_FUZZY_DISTANCE}")
+
+    return ProductFilters(
+        categories=frozenset(parse_categories(args.get('category'))),
+        excluded_categories=frozenset(parse_categories(args.get('category!'))),
+        min_price=prices['min_price'],
+        max_price=prices['max_price'],
+        name=args.get('name') or None,
+        fuzzy=fuzzy,
+        max_distance=max_distance
+    )
+
+def matches(product, filters):
+    """
+    Comprueba si un producto cumple los filtros de categoría, precio y nombre (búsqueda exacta)
+    """
+    if filters.categories and product["category"] not in filters.categories:
+        return False
+    if product["category"] in filters.excluded_categories:
+        return False
+    if filters.min_price is not None and product["price"] < filters.min_price:
+        return False
+    if filters.max_price is not None and product["price"] > filters.max_price:
+        return False
+    if filters.name and not filters.fuzzy and filters.name.lower() not in product["name"].lower():
+        return False
+    return True
+
+# Campos que se indican al crear un producto (el ID lo asigna el servidor)
+PRODUCT_FIELDS = ("name", "price", "category")
+
+def parse_product(data, partial=False):
+    """
+    Valida los campos de un producto del catálogo (nombre, precio y categoría)
+    Lanza ValueError con un mensaje descriptivo si algún campo no es válido
+    """
+    return ej2c1.parse_product(data, partial, PRODUCT_FIELDS)
+
+def price_summary(count, minimum, maximum, mean, percentiles):
+    """
+    Da formato JSON a las estadísticas de precio de un grupo de productos
+    """
+    return {
+        "count": int(count),
+        "min": round(float(minimum), 2),
+        "max": round(float(maximum), 2),
+        "mean": round(float(mean), 2),
+        "median": round(float(percentiles[PRICE_PERCENTILES.index(50)]), 2),
+        "percentiles": {f"p{q}": round(float(v), 2) for q, v in zip(PRICE_PERCENTILES, percentiles)}
+    }
+
+def compute_stats(prices, categories, version):
+    """
+    Calcula las estadísticas de precio (global y por categoría) a partir de dos columnas
+    paralelas: un array de precios y la categoría de cada uno
+    """
+    if len(prices) == 0:
+        return {"version": version, "overall": {"count": 0}, "categories": {}}
+
+    prices = np.asarray(prices, dtype=np.float64)
+    category_names, codes = np.unique(np.asarray(categories), return_inverse=True)
+
+    # Ordena por categoría y, dentro de cada categoría, por precio
+    order = np.lexsort((prices, codes))
+    sorted_prices = prices[order]
+    counts = np.bincount(codes, minlength=len(category_names))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ends = starts + counts - 1
+
+    means = np.add.reduceat(sorted_prices, starts) / counts
+
+    # Percentiles con interpolación lineal (como np.percentile) para todos los grupos a la vez
+    positions = starts[:, None] + (counts[:, None] - 1) * (np.array(PRICE_PERCENTILES) / 100.0)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    weights = positions - lower
+    percentiles = sorted_prices[lower] * (1 - weights) + sorted_prices[upper] * weights
+
+    categories = {
+        str(category): price_summary(counts[i], sorted_prices[starts[i]], sorted_prices[ends[i]],
+                                     means[i], percentiles[i])
+        for i, category in enumerate(category_names)
+    }
+    overall = price_summary(prices.size, prices.min(), prices.max(), prices.mean(),
+                            np.percentile(prices, PRICE_PERCENTILES))
+
+    return {"version": version, "overall": overall, "categories": categories}
+
+class Catalog:
+    """
+    Catálogo de productos con sus índices: por ID, por categoría (bitmaps por bloques), por
+    precio (lista ordenada por bloques) y por nombre (trigramas).
+
+    Las escrituras se serializan con un cerrojo y actualizan los índices de forma incremental,
+    sin reconstruirlos: cada una solo rehace un bloque de bitmap y un bloque del índice de
+    precios, así que su coste no crece con el tamaño del catálogo. Los lectores nunca esperan: los productos no se modifican nunca (una
+    actualización crea un diccionario nuevo y lo sustituye con una única asignación) y los
+    índices solo preseleccionan candidatos que después se comprueban con matches(). Así un
+    lector ve cada producto en su versión anterior o en la nueva, nunca a medias.
+    """
+
+    def __init__(self, items, version=0, write_lock=None):
+        self.slots = [dict(p) for p in items]   # posición -> producto (None si se eliminó)
+        self.positions = {p["id"]: i for i, p in enumerate(self.slots)}
+        self.category_bitmaps = build_category_bitmaps(self.slots)
+        self.price_index = ChunkedSortedList((p["price"], i) for i, p in enumerate(self.slots))
+        self.name_index = FuzzyNameIndex(self.slots)
+        self.version = version
+        self.next_id = max(self.positions, default=0) + 1
+        self.read_only = False
+        self._write_lock = write_lock or threading.RLock()
+        self._cached_stats = lru_cache(maxsize=128)(self._compute_stats)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def get(self, product_id):
+        """
+        Devuelve el producto con el ID indicado o None si no existe
+        """
+        position = self.positions.get(product_id)
+        return self.slots[position] if position is not None else None
+
+    def select(self, filters):
+        """
+        Recorre de forma perezosa los productos que cumplen los filtros indicados.
+        Los productos no se copian, pero los índices sí ocupan memoria durante el recorrido:
+        un rango de precios ordena por posición las entradas que caen en él (proporcional al
+        número de coincidencias) y un filtro de categorías combina bitmaps de un bit por fila.
+        """
+        slots = self.slots
+        if filters.min_price is not None or filters.max_price is not None:
+            # Rango de precios resuelto con búsqueda binaria sobre el índice de precios
+            low = (-math.inf if filters.min_price is None else filters.min_price, -1)
+            high = (math.inf if filters.max_price is None else filters.max_price, math.inf)
+            # Durante una actualización de precio la posición está en el índice con los dos precios:
+            # el conjunto evita devolverla dos veces y matches() descarta el precio que no es el actual
+            candidates = (slots[i] for i in sorted({i for _, i in self.price_index.range(low, high)}))
+        elif filters.categories or filters.excluded_categories:
+            # Los bloques se copian con list() antes de combinarlos: un escritor puede añadir o quitar
+            # bloques mientras tanto. Las posiciones añadidas después de empezar se ignoran.
+            size = len(slots)
+            if filters.categories:
+                selected = {}
+                for c in filters.categories:
+                    for block, bits in list(self.category_bitmaps.get(c, {}).items()):
+                        selected[block] = selected.get(block, 0) | bits
+            else:
+                full = (1 << BITMAP_BLOCK_BITS) - 1
+                selected = dict.fromkeys(range((size + BITMAP_BLOCK_BITS - 1) // BITMAP_BLOCK_BITS), full)
+            for c in filters.excluded_categories:
+                for block, bits in list(self.category_bitmaps.get(c, {}).items()):
+                    if block in selected:
+                        selected[block] &= ~bits
+            candidates = (slots[i] for block in sorted(selected)
+                          for i in iter_bitmap(selected[block], block * BITMAP_BLOCK_BITS) if i < size)
+        else:
+            candidates = iter(slots)
+
+        candidates = (p for p in candidates if p is not None and matches(p, filters))
+
+        if filters.name and filters.fuzzy:
+            # Búsqueda aproximada: resultados ordenados por puntuación (menor distancia primero)
+            scores = self.name_index.search(filters.name, filters.max_distance)
+            candidates = iter(sorted((p for p in candidates if p["id"] in scores), key=lambda p: scores[p["id"]]))
+
+        return candidates
+
+    def stats(self, filters):
+        """
+        Devuelve las estadísticas de precio de los productos filtrados, cacheadas por versión
+        """
+        return self._cached_stats(self.version, filters)
+
+    def _compute_stats(self, version, filters):
+        selected = list(self.select(filters))
+        prices = np.fromiter((p["price"] for p in selected), dtype=np.float64, count=len(selected))
+        return compute_stats(prices, [p["category"] for p in selected], version)
+
+    def create(self, fields):
+        """
+        Añade un producto nuevo con el siguiente ID disponible y lo devuelve
+        """
+        with self._write_lock:
+            product = {"id": self.next_id, **fields}
+            position = len(self.slots)
+            self.slots.append(product)
+            self._set_category_bit(product["category"], position)
+            self.price_index.add((product["price"], position))
+            self.name_index.add(product)
+            self.positions[product["id"]] = position
+            self.next_id += 1
+            self.version += 1
+            return product
+
+    def update(self, product_id, fields):
+        """
+        Actualiza los campos indicados de un producto y devuelve su nueva versión
+        Devuelve None si el producto no existe
+        """
+        with self._write_lock:
+            position = self.positions.get(product_id)
+            if position is None:
+                return None
+            old = self.slots[position]
+            new = {**old, **fields, "id": product_id}
+
+            # Primero se añaden las entradas nuevas, después se sustituye el producto
+            # y por último se quitan las entradas antiguas
+            if new["category"] != old["category"]:
+                self._set_category_bit(new["category"], position)
+            if new["price"] != old["price"]:
+                self.price_index.add((new["price"], position))
+            if new["name"] != old["name"]:
+                self.name_index.replace(old, new)
+
+            self.slots[position] = new
+
+            if new["category"] != old["category"]:
+                self._clear_category_bit(old["category"], position)
+            if new["price"] != old["price"]:
+                self.price_index.remove((old["price"], position))
+
+            self.version += 1
+            return new
+
+    def delete(self, product_id):
+        """
+        Elimina un producto. Devuelve False si no existe.
+        La posición queda vacía; se reutiliza al recargar el catálogo completo.
+        """
+        with self._write_lock:
+            position = self.positions.pop(product_id, None)
+            if position is None:
+                return False
+            old = self.slots[position]
+            self.slots[position] = None
+            self._clear_category_bit(old["category"], position)
+            self.price_index.remove((old["price"], position))
+            self.name_index.remove(old)
+            self.version += 1
+            return True
+
+    def _set_category_bit(self, category, position):
+        blocks = self.category_bitmaps.setdefault(category, {})
+        block, bit = divmod(position, BITMAP_BLOCK_BITS)
+        blocks[block] = blocks.get(block, 0) | (1 << bit)
+
+    def _clear_category_bit(self, category, position):
+        blocks = self.category_bitmaps[category]
+        block, bit = divmod(position, BITMAP_BLOCK_BITS)
+        bits = blocks[block] & ~(1 << bit)
+        if bits:
+            blocks[block] = bits
+        else:
+            del blocks[block]
+            if not blocks:
+                del self.category_bitmaps[category]
+
+def load_products(path=None):
+    """
+    Carga la lista de productos desde un fichero JSON, o devuelve la lista predefinida si no se indica
+    Lanza ValueError si el contenido del fichero no es una lista de productos válidos
+    """
+    return ej2c1.load_products(path, products, PRODUCT_FIELDS)
+
+class CatalogReloader(ej2c1.CatalogReloader):
+    """
+    Recarga el catálogo en segundo plano al estilo RCU: el catálogo nuevo, con sus índices
+    y la caché de estadísticas precalentada, se construye sin bloquear a nadie y se publica
+    con una única asignación de la variable global catalog. Los lectores que ya tenían
+    el catálogo anterior terminan con él; los nuevos ven el catálogo nuevo completo.
+
+    Las escrituras realizadas sobre el catálogo anterior mientras se construye el nuevo
+    se descartan: los datos recargados sustituyen al catálogo completo.
+    """
+
+    def __init__(self):
+        super().__init__(load_products)
+
+    def publish(self, items):
+        global catalog
+        new_catalog = Catalog(items, version=catalog.version + 1, write_lock=write_lock)
+        new_catalog.stats(parse_filters({}))
+        with write_lock:
+            if catalog.version >= new_catalog.version:
+                # Hubo escrituras durante la construcción: la versión debe seguir creciendo
+                new_catalog.version = catalog.version + 1
+            catalog = new_catalog
+
+# Cerrojo compartido por todos los catálogos: serializa las escrituras y la publicación
+# de un catálogo recargado, de modo que una escritura nunca se aplica a un catálogo retirado
+write_lock = threading.RLock()
+
+# Catálogo con los productos predefinidos
+catalog = Catalog(products, write_lock=write_lock)
+
+reloader = CatalogReloader()
+
+# Identificador de los segmentos de memoria compartida del catálogo
+SHARED_CATALOG_MAGIC = 0x43415431
+
+class SharedSegment(shared_memory.SharedMemory):
+    """
+    Segmento de memoria compartida que no se cierra explícitamente al destruirse:
+    el mapeo se libera cuando desaparecen las vistas de NumPy que lo usan.
+    El descriptor del segmento se cierra nada más mapearlo (el mapeo no lo necesita), así
+    que cada versión conectada no deja un descriptor abierto.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __del__(self):
+        pass
+
+# Segmentos creados por este proceso (el cargador es el único responsable de eliminarlos)
+published_segments = set()
+
+def attach_segment(name):
+    """
+    Se conecta a un segmento existente sin registrarlo en el resource_tracker,
+    para que un proceso lector que termina no elimine el segmento de los demás
+    """
+    if sys.version_info >= (3, 13):
+        return SharedSegment(name=name, track=False)
+    segment = SharedSegment(name=name)
+    if name not in published_segments:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+def shared_layout(count, category_count, names_size, categories_size):
+    """
+    Calcula la disposición de las columnas dentro de un segmento del catálogo
+    Devuelve ({columna: (desplazamiento, dtype, tamaño)}, tamaño total en bytes)
+    """
+    columns = [
+        ("header", np.int64, 8),
+        ("ids", np.int64, count),
+        ("id_order", np.int64, count),
+        ("prices", np.float64, count),
+        ("category_codes", np.int32, count),
+        ("name_offsets", np.int64, count + 1),
+        ("category_offsets", np.int64, category_count + 1),
+        ("names", np.uint8, names_size),
+        ("categories", np.uint8, categories_size)
+    ]
+    layout = {}
+    offset = 0
+    for column, dtype, size in columns:
+        layout[column] = (offset, dtype, size)
+        # Cada columna empieza alineada a 8 bytes
+        offset += -(-size * np.dtype(dtype).itemsize // 8) * 8
+    return layout, max(offset, 1)
+
+def column_views(buffer, layout):
+    """
+    Devuelve un array de NumPy por columna, apuntando directamente al buffer del segmento
+    """
+    return {
+        column: np.ndarray((size,), dtype=dtype, buffer=buffer, offset=offset)
+        for column, (offset, dtype, size) in layout.items()
+    }
+
+def string_heap(values):
+    """
+    Concatena textos en un único bloque UTF-8 y devuelve (bloque, desplazamientos)
+    """
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded], dtype=np.int64)
+    return b"".join(encoded), offsets
+
+class SharedCatalogPublisher:
+    """
+    Proceso cargador: publica el catálogo en columnas (IDs, precios, códigos de categoría y
+    un bloque con los nombres) en segmentos versionados "<prefijo>_v<versión>", y la versión
+    vigente en el segmento de control "<prefijo>_current". Conserva la versión anterior para
+    que los procesos que aún no han cambiado puedan terminar de conectarse a ella.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.version = 0
+        self._segments = {}
+        try:
+            self._control = self._create(f"{prefix}_current", 8)
+        except FileExistsError:
+            self._adopt()
+        self._current = np.ndarray((1,), dtype=np.int64, buffer=self._control.buf)
+        self._current[0] = self.version
+
+    def _adopt(self):
+        """
+        Un cargador anterior terminó sin eliminar sus segmentos: se reutiliza su segmento de
+        control (los workers conectados a él siguen viendo las versiones nuevas), se continúa
+        su numeración y sus dos últimas versiones pasan a este cargador, que las eliminará
+        como las suyas
+        """
+        self._control = shared_memory.SharedMemory(name=f"{self.prefix}_current")
+        published_segments.add(self._control.name)
+        self.version = int(np.ndarray((1,), dtype=np.int64, buffer=self._control.buf)[0])
+        for version in (self.version - 1, self.version):
+            name = f"{self.prefix}_v{version}"
+            try:
+                self._segments[version] = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            published_segments.add(name)
+
+    def publish(self, items):
+        """
+        Publica una nueva versión del catálogo y devuelve su número
+        """
+        items = [p for p in items if p is not None]
+        categories = sorted({p["category"] for p in items})
+        category_codes = {c: code for code, c in enumerate(categories)}
+        names, name_offsets = string_heap(p["name"] for p in items)
+        category_heap, category_offsets = string_heap(categories)
+
+        version = self.version + 1
+        layout, size = shared_layout(len(items), len(categories), len(names), len(category_heap))
+        name = f"{self.prefix}_v{version}"
+        try:
+            segment = self._create(name, size)
+        except FileExistsError:
+            # Versión a medio publicar por un cargador anterior: nunca se anunció, nadie la usa
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            segment = self._create(name, size)
+        views = column_views(segment.buf, layout)
+        views["header"][:] = [SHARED_CATALOG_MAGIC, version, len(items), len(categories),
+                              len(names), len(category_heap), 0, 0]
+        views["ids"][:] = [p["id"] for p in items]
+        views["id_order"][:] = np.argsort(views["ids"], kind="stable")
+        views["prices"][:] = [p["price"] for p in items]
+        views["category_codes"][:] = [category_codes[p["category"]] for p in items]
+        views["name_offsets"][:] = name_offsets
+        views["category_offsets"][:] = category_offsets
+        views["names"][:] = np.frombuffer(names, dtype=np.uint8)
+        views["categories"][:] = np.frombuffer(category_heap, dtype=np.uint8)
+        del views
+
+        # La nueva versión solo se anuncia cuando el segmento está completo
+        self._segments[version] = segment
+        self.version = version
+        self._current[0] = version
+
+        for old_version in [v for v in self._segments if v < version - 1]:
+            self._release(old_version)
+        return version
+
+    @staticmethod
+    def _create(name, size):
+        published_segments.add(name)
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    def _release(self, version):
+        segment = self._segments.pop(version)
+        segment.close()
+        segment.unlink()
+        published_segments.discard(segment.name)
+
+    def close(self):
+        """
+        Elimina todos los segmentos publicados
+        """
+        for version in list(self._segments):
+            self._release(version)
+        del self._current
+        self._control.close()
+        self._control.unlink()
+        published_segments.discard(self._control.name)
+
+class SharedCatalog:
+    """
+    Catálogo de solo lectura respaldado por un segmento publicado por SharedCatalogPublisher.
+    Todos los procesos comparten las columnas; cada uno solo guarda en su memoria los nombres
+    de las categorías y, si se usa la búsqueda aproximada, su propio índice de nombres.
+    """
+
+    read_only = True
+
+    def __init__(self, segment):
+        self._segment = segment
+        header = np.ndarray((8,), dtype=np.int64, buffer=segment.buf)
+        if header[0] != SHARED_CATALOG_MAGIC:
+            raise ValueError(f"El segmento {segment.name} no contiene un catálogo")
+        self.version = int(header[1])
+        layout, _ = shared_layout(*(int(v) for v in header[2:6]))
+        views = column_views(segment.buf, layout)
+        for view in views.values():
+            view.flags.writeable = False
+        self.ids = views["ids"]
+        self.id_order = views["id_order"]
+        self.prices = views["prices"]
+        self.category_codes = views["category_codes"]
+        self.name_offsets = views["name_offsets"]
+        self.names = views["names"]
+        self.category_names = [
+            bytes(views["categories"][start:end]).decode("utf-8")
+            for start, end in zip(views["category_offsets"][:-1], views["category_offsets"][1:])
+        ]
+        self._name_index = None
+        # La caché guarda una referencia débil al catálogo: sin ciclo de referencias, una
+        # versión retirada (y su mapeo) se libera en cuanto deja de usarla la última petición
+        ref = weakref.ref(self)
+        self._cached_stats = lru_cache(maxsize=128)(lambda version, filters: ref()._compute_stats(version, filters))
+
+    @classmethod
+    def attach(cls, prefix):
+        """
+        Se conecta a la versión vigente del catálogo publicado con el prefijo indicado
+        """
+        return cls(attach_segment(f"{prefix}_v{shared_catalog_version(prefix)}"))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def product(self, row):
+        """
+        Reconstruye el diccionario del producto almacenado en una fila
+        """
+        start, end = self.name_offsets[row], self.name_offsets[row + 1]
+        return {
+            "id": int(self.ids[row]),
+            "name": bytes(self.names[start:end]).decode("utf-8"),
+            "price": float(self.prices[row]),
+            "category": self.category_names[self.category_codes[row]]
+        }
+
+    def get(self, product_id):
+        index = np.searchsorted(self.ids, product_id, sorter=self.id_order)
+        if index < len(self.ids) and self.ids[self.id_order[index]] == product_id:
+            return self.product(self.id_order[index])
+        return None
+
+    def _rows(self, filters):
+        """
+        Filas que cumplen los filtros de categoría y precio, calculadas con máscaras vectoriales
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        codes = {name: code for code, name in enumerate(self.category_names)}
+        if filters.categories:
+            mask &= np.isin(self.category_codes, [codes[c] for c in filters.categories if c in codes])
+        if filters.excluded_categories:
+            mask &= ~np.isin(self.category_codes, [codes[c] for c in filters.excluded_categories if c in codes])
+        if filters.min_price is not None:
+            mask &= self.prices >= filters.min_price
+        if filters.max_price is not None:
+            mask &= self.prices <= filters.max_price
+        return np.flatnonzero(mask)
+
+    def _select_rows(self, filters):
+        """
+        Recorre los pares (fila, producto) que cumplen todos los filtros
+        """
+        candidates = ((row, self.product(row)) for row in self._rows(filters))
+        candidates = ((row, p) for row, p in candidates if matches(p, filters))
+        if filters.name and filters.fuzzy:
+            if self._name_index is None:
+                self._name_index = FuzzyNameIndex(self.product(row) for row in range(len(self.ids)))
+            scores = self._name_index.search(filters.name, filters.max_distance)
+            candidates = iter(sorted(((row, p) for row, p in candidates if p["id"] in scores),
+                                     key=lambda item: scores[item[1]["id"]]))
+        return candidates
+
+    def select(self, filters):
+        return (p for _, p in self._select_rows(filters))
+
+    def stats(self, filters):
+        return self._cached_stats(self.version, filters)
+
+    def _compute_stats(self, version, filters):
+        if filters.name:
+            rows = np.fromiter((row for row, _ in self._select_rows(filters)), dtype=np.int64)
+        else:
+            rows = self._rows(filters)
+        categories = np.array(self.category_names or [""])[self.category_codes[rows]]
+        return compute_stats(self.prices[rows], categories, version)
+
+# Vistas de los segmentos de control a los que ya se ha conectado este proceso
+shared_controls = {}
+
+def shared_catalog_version(prefix):
+    """
+    Devuelve la versión vigente anunciada en el segmento de control
+    """
+    current = shared_controls.get(prefix)
+    if current is None:
+        current = np.ndarray((1,), dtype=np.int64, buffer=attach_segment(f"{prefix}_current").buf)
+        shared_controls[prefix] = current
+    return int(current[0])
+
+def refresh_shared_catalog(prefix):
+    """
+    Cambia el catálogo global por la versión compartida vigente si ha cambiado.
+    La sustitución es una única asignación, como en una recarga normal.
+    """
+    global catalog
+    if not isinstance(catalog, SharedCatalog) or catalog.version != shared_catalog_version(prefix):
+        catalog = SharedCatalog.attach(prefix)
+
+def republish_catalog(publisher, path=None):
+    """
+    Vuelve a cargar el fichero de productos y publica una nueva versión compartida.
+    Si el fichero no se puede leer o no es válido se registra el error y la versión
+    publicada sigue vigente. Devuelve si se publicó la nueva versión.
+    """
+    try:
+        publisher.publish(load_products(path))
+    except (OSError, ValueError) as e:
+        logger.error("No se pudo recargar el catálogo compartido (sigue la versión %d): %s", publisher.version, e)
+        return False
+    return True
+
+def run_shared_loader(prefix, path=None):
+    """
+    Ejecuta el proceso cargador: publica el catálogo, lo vuelve a publicar con SIGHUP
+    y elimina los segmentos al terminar
+    """
+    publisher = SharedCatalogPublisher(prefix)
+    try:
+        publisher.publish(load_products(path))
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: republish_catalog(publisher, path))
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+
+def chunked(lines, chunk_size):
+    """
+    Agrupa las líneas de un iterador en bloques de chunk_size líneas
+    """
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+def ndjson_lines(items):
+    """
+    Serializa cada producto como una línea JSON (NDJSON)
+    """
+    for product in items:
+        yield json.dumps(product, ensure_ascii=False) + "\n"
+
+def csv_lines(items):
+    """
+    Serializa los productos como líneas CSV, empezando por la cabecera
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in itertools.chain([EXPORT_FIELDS], ([p.get(f) for f in EXPORT_FIELDS] for p in items)):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+# Formatos de exportación: (función que genera las líneas, tipo MIME)
+EXPORT_FORMATS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+    "csv": (csv_lines, "text/csv")
+}
+
 def create_app():
     """
     Crea y configura la aplicación Flask
     """
     app = Flask(__name__)
+    # Fichero JSON opcional con los productos que se cargan al recargar el catálogo
+    app.config["PRODUCTS_FILE"] = os.environ.get("PRODUCTS_FILE")
+    # Prefijo del catálogo publicado en memoria compartida por el proceso cargador (opcional)
+    app.config["SHARED_CATALOG"] = os.environ.get("SHARED_CATALOG")
+
+    @app.before_request
+    def use_shared_catalog():
+        """
+        Si el catálogo está en memoria compartida, usa siempre la versión vigente
+        """
+        if app.config["SHARED_CATALOG"]:
+            refresh_shared_catalog(app.config["SHARED_CATALOG"])
+
+    def read_only_error():
+        return jsonify({"error": "El catálogo compartido es de solo lectura; se modifica desde el proceso cargador"}), 409
 
     @app.route('/products', methods=['GET'])
     def get_products():
         """
         Devuelve una lista de productos filtrada según los parámetros de consulta.
         Parámetros admitidos:
-        - category: Filtrar por categoría
+        - category: Filtrar por una o varias categorías separadas por comas
+        - category!: Excluir una o varias categorías separadas por comas
         - min_price: Precio mínimo
         - max_price: Precio máximo
         - name: Buscar por nombre (coincidencia parcial)
+        - fuzzy: Si es "true", la búsqueda por nombre tolera errores tipográficos
+        - max_distance: Distancia de edición máxima por palabra en la búsqueda aproximada
         """
-        # Obtén los parámetros de consulta
-        category = request.args.get('category')
-        min_price = request.args.get('min_price')
-        max_price = request.args.get('max_price')
-        name = request.args.get('name')
+        try:
+            filters = parse_filters(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        # Convertir precios a float si están presentes
-        if min_price is not None:
-            try:
-                min_price = float(min_price)
-            except ValueError:
-                return jsonify({"error": "El parámetro min_price debe ser un número válido"}), 400
+        return jsonify(list(catalog.select(filters))), 200
 
-        if max_price is not None:
-            try:
-                max_price = float(max_price)
-            except ValueError:
-                return jsonify({"error": "El parámetro max_price debe ser un número válido"}), 400
+    @app.route('/products/stats', methods=['GET'])
+    def get_products_stats():
+        """
+        Devuelve estadísticas de precio (mínimo, máximo, media, mediana y percentiles)
+        globales y agrupadas por categoría. Admite los mismos filtros que GET /products.
+        """
+        try:
+            filters = parse_filters(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(catalog.stats(filters)), 200
+
+    @app.route('/products/export', methods=['GET'])
+    def export_products():
+        """
+        Exporta los productos en streaming, en bloques de EXPORT_CHUNK_SIZE productos.
+        Las filas se serializan una a una; los filtros por precio o categoría usan además
+        la memoria de sus índices (ver Catalog.select).
+        Parámetro format: "ndjson" (por defecto) o "csv". Admite los mismos filtros que GET /products.
+        """
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "El parámetro format debe ser 'ndjson' o 'csv'"}), 400
+
+        try:
+            filters = parse_filters(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        # Filtrar productos según los parámetros
-        filtered_products = products
+        serialize, mimetype = EXPORT_FORMATS[export_format]
+        body = chunked(serialize(catalog.select(filters)), EXPORT_CHUNK_SIZE)
+        return Response(stream_with_context(body), mimetype=mimetype, headers={
+            "Content-Disposition": f"attachment; filename=products.{export_format}"
+        })
 
-        if category:
-            filtered_products = [p for p in filtered_products if p["category"] == category]
+    @app.route('/products', methods=['POST'])
+    def create_product():
+        """
+        Crea un producto nuevo
+        El cuerpo debe incluir un JSON con los campos "name", "price" y "category"
+        Código de estado: 201 - Created, 400 - Bad Request si los datos no son válidos
+        """
+        try:
+            fields = parse_product(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        if min_price is not None:
-            filtered_products = [p for p in filtered_products if p["price"] >= min_price]
+        if catalog.read_only:
+            return read_only_error()
+        with write_lock:
+            product = catalog.create(fields)
+        return jsonify(product), 201
 
-        if max_price is not None:
-            filtered_products = [p for p in filtered_products if p["price"] <= max_price]
+    @app.route('/products/<int:product_id>', methods=['PUT', 'PATCH'])
+    def update_product(product_id):
+        """
+        Actualiza un producto existente
+        PUT requiere todos los campos; PATCH solo los que se quieran cambiar
+        Código de estado: 200 - OK, 400 - Bad Request, 404 - Not Found si no existe
+        """
+        try:
+            fields = parse_product(request.get_json(silent=True), partial=request.method == 'PATCH')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        if name:
-            filtered_products = [p for p in filtered_products if name.lower() in p["name"].lower()]
+        if catalog.read_only:
+            return read_only_error()
+        with write_lock:
+            product = catalog.update(product_id, fields)
+        if product is None:
+            return jsonify({"error": "Producto no encontrado", "id": product_id}), 404
+        return jsonify(product), 200
 
-        return jsonify(filtered_products), 200
+    @app.route('/products/<int:product_id>', methods=['DELETE'])
+    def delete_product(product_id):
+        """
+        Elimina un producto por su ID
+        Código de estado: 200 - OK, 404 - Not Found si no existe
+        """
+        if catalog.read_only:
+            return read_only_error()
+        with write_lock:
+            deleted = catalog.delete(product_id)
+        if not deleted:
+            return jsonify({"error": "Producto no encontrado", "id": product_id}), 404
+        return jsonify({"message": "Producto eliminado", "id": product_id}), 200
+
+    @app.route('/admin/reload', methods=['POST'])
+    def reload_catalog():
+        """
+        Inicia la recarga del catálogo en segundo plano desde PRODUCTS_FILE (o la lista predefinida)
+        Código de estado: 202 - Accepted, 409 - Conflict si ya hay una recarga en curso
+        """
+        if catalog.read_only:
+            return read_only_error()
+        if not reloader.start(app.config.get("PRODUCTS_FILE")):
+            return jsonify({"error": "Ya hay una recarga en curso"}), 409
+        return jsonify({"message": "Recarga iniciada", "version": catalog.version}), 202
+
+    @app.route('/admin/catalog', methods=['GET'])
+    def catalog_status():
+        """
+        Devuelve la versión del catálogo publicado y el estado de la última recarga
+        """
+        current = catalog
+        return jsonify({
+            "version": current.version,
+            "products": len(current),
+            "reloading": reloader.running,
+            "last_reload_at": reloader.last_reload_at,
+            "last_error": reloader.last_error
+        }), 200
 
     return app
 
 if __name__ == '__main__':
+    if sys.argv[1:] == ['--shared-loader']:
+        # Proceso cargador: publica el catálogo en memoria compartida para los workers
+        # que se arrancan con la variable de entorno SHARED_CATALOG=<prefijo>
+        run_shared_loader(os.environ.get("SHARED_CATALOG", "catalog"), os.environ.get("PRODUCTS_FILE"))
+        sys.exit(0)
+
     app = create_app()
+    if hasattr(signal, "SIGHUP"):
+        # kill -HUP <pid> recarga el catálogo sin reiniciar el proceso
+        signal.signal(signal.SIGHUP, lambda signum, frame: reloader.start(app.config.get("PRODUCTS_FILE")))
     app.run(debug=True)
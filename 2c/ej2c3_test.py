@@ -1,6 +1,15 @@
+import csv
+import gc
+import io
+import json
+import os
+import random
+import weakref
+
 import pytest
 from flask.testing import FlaskClient
-from ej2c3 import create_app
+import ej2c3
+from ej2c3 import create_app, Catalog, FuzzyNameIndex, SharedCatalog, SharedCatalogPublisher
 
 @pytest.fixture
 def client() -> FlaskClient:
@@ -114,3 +123,377 @@ def test_filter_no_results(client):
     assert response.status_code == 200
     data = response.json
     assert len(data) == 0  # No debería haber productos
+
+def test_filter_by_multiple_categories(client):
+    """
+    Prueba filtrar productos por varias categorías a la vez
+    """
+    response = client.get("/products?category=furniture,appliances")
+    assert response.status_code == 200
+    data = response.json
+    assert [p["id"] for p in data] == [4, 5, 6]
+
+def test_filter_excluding_category(client):
+    """
+    Prueba excluir categorías con category!= y combinarlo con otros filtros
+    """
+    response = client.get("/products?category!=electronics")
+    assert response.status_code == 200
+    data = response.json
+    assert [p["id"] for p in data] == [4, 5, 6]
+
+    response = client.get("/products?category=electronics,furniture&category!=furniture&max_price=200")
+    assert response.status_code == 200
+    data = response.json
+    assert [p["id"] for p in data] == [7, 8]
+
+def test_products_stats(client):
+    """
+    Prueba las estadísticas de precio por categoría
+    """
+    response = client.get("/products/stats")
+    assert response.status_code == 200
+    data = response.json
+    assert data["overall"]["count"] == 8
+    assert data["overall"]["max"] == 999.99
+
+    furniture = data["categories"]["furniture"]
+    assert furniture["count"] == 2
+    assert furniture["min"] == 189.99
+    assert furniture["max"] == 249.99
+    assert furniture["mean"] == 219.99
+    assert furniture["median"] == 219.99
+
+    electronics = data["categories"]["electronics"]
+    assert electronics["median"] == 349.99
+    assert electronics["percentiles"]["p25"] == 199.99
+
+def test_products_stats_with_filters(client):
+    """
+    Prueba que las estadísticas respetan los filtros de GET /products
+    """
+    response = client.get("/products/stats?category!=electronics&max_price=200")
+    assert response.status_code == 200
+    data = response.json
+    assert data["overall"]["count"] == 2
+    assert set(data["categories"]) == {"furniture", "appliances"}
+
+    response = client.get("/products/stats?category=nonexistent")
+    assert response.status_code == 200
+    assert response.json["overall"] == {"count": 0}
+
+    response = client.get("/products/stats?min_price=abc")
+    assert response.status_code == 400
+
+def test_fuzzy_name_search(client):
+    """
+    Prueba la búsqueda por nombre tolerante a errores tipográficos
+    """
+    response = client.get("/products?name=laptp&fuzzy=true")
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json] == [1]
+
+    response = client.get("/products?name=smrt&fuzzy=true&max_distance=1")
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json] == [8]
+
+    response = client.get("/products?name=pro&fuzzy=true&max_price=100")
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json] == [6]
+
+def test_fuzzy_name_search_invalid_distance(client):
+    """
+    Prueba que max_distance fuera de rango devuelve un error 400
+    """
+    response = client.get("/products?name=laptp&fuzzy=true&max_distance=10")
+    assert response.status_code == 400
+    assert "error" in response.json
+
+def test_fuzzy_name_index_ranking():
+    """
+    Prueba que el índice puntúa con la distancia de edición (menor es mejor)
+    """
+    index = FuzzyNameIndex([
+        {"id": 1, "name": "Lamp"},
+        {"id": 2, "name": "Laptop"},
+        {"id": 3, "name": "Laptops"}
+    ])
+    assert index.search("laptop", 2) == {2: 0, 3: 1}
+    assert index.search("laptp", 1) == {2: 1}
+
+def test_export_ndjson(client):
+    """
+    Prueba la exportación en formato NDJSON con filtros
+    """
+    response = client.get("/products/export?category=furniture")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [4, 5]
+
+def test_export_csv(client):
+    """
+    Prueba la exportación en formato CSV
+    """
+    response = client.get("/products/export?format=csv")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ["id", "name", "price", "category"]
+    assert len(rows) == 9
+    assert rows[1] == ["1", "Laptop Pro", "999.99", "electronics"]
+
+    response = client.get("/products/export?format=xml")
+    assert response.status_code == 400
+
+@pytest.fixture
+def writable_client(monkeypatch) -> FlaskClient:
+    """
+    Cliente de pruebas con un catálogo propio para no alterar el resto de pruebas
+    """
+    monkeypatch.setattr(ej2c3, "catalog", Catalog(ej2c3.products, write_lock=ej2c3.write_lock))
+    app = create_app()
+    app.testing = True
+    with app.test_client() as client:
+        yield client
+
+def test_create_product(writable_client):
+    """
+    Prueba crear un producto y encontrarlo con los filtros y las estadísticas
+    """
+    response = writable_client.post("/products", json={"name": "Gaming Laptop", "price": 1499.0, "category": "gaming"})
+    assert response.status_code == 201
+    assert response.json == {"id": 9, "name": "Gaming Laptop", "price": 1499.0, "category": "gaming"}
+
+    response = writable_client.get("/products?category=gaming")
+    assert [p["id"] for p in response.json] == [9]
+    response = writable_client.get("/products?min_price=1000")
+    assert [p["id"] for p in response.json] == [9]
+    response = writable_client.get("/products?name=gamng&fuzzy=true")
+    assert [p["id"] for p in response.json] == [9]
+    response = writable_client.get("/products/stats")
+    assert response.json["overall"]["count"] == 9
+
+    response = writable_client.post("/products", json={"name": "Sin precio", "category": "gaming"})
+    assert response.status_code == 400
+
+def test_update_product(writable_client):
+    """
+    Prueba actualizar un producto con PUT y PATCH manteniendo los índices al día
+    """
+    response = writable_client.patch("/products/6", json={"category": "kitchen", "price": 79.99})
+    assert response.status_code == 200
+    assert response.json == {"id": 6, "name": "Coffee Maker Pro", "price": 79.99, "category": "kitchen"}
+
+    assert writable_client.get("/products?category=appliances").json == []
+    assert [p["id"] for p in writable_client.get("/products?category=kitchen&max_price=80").json] == [6]
+
+    response = writable_client.put("/products/1", json={"name": "Laptop Air", "price": 899.99, "category": "electronics"})
+    assert response.status_code == 200
+    assert [p["id"] for p in writable_client.get("/products?name=laptop air").json] == [1]
+    assert [p["id"] for p in writable_client.get("/products?name=pro").json] == [6]
+
+    response = writable_client.put("/products/1", json={"name": "Laptop Air"})
+    assert response.status_code == 400
+    response = writable_client.patch("/products/999", json={"price": 1})
+    assert response.status_code == 404
+
+def test_delete_product(writable_client):
+    """
+    Prueba eliminar un producto
+    """
+    response = writable_client.delete("/products/4")
+    assert response.status_code == 200
+
+    assert [p["id"] for p in writable_client.get("/products?category=furniture").json] == [5]
+    assert len(writable_client.get("/products").json) == 7
+    assert writable_client.get("/products/stats?category=furniture").json["overall"]["count"] == 1
+
+    response = writable_client.delete("/products/4")
+    assert response.status_code == 404
+
+def test_reload_catalog(writable_client, tmp_path):
+    """
+    Prueba la recarga del catálogo desde un fichero y el cambio de versión
+    """
+    products_file = tmp_path / "products.json"
+    products_file.write_text(json.dumps([
+        {"id": 10, "name": "Standing Desk", "price": 499.0, "category": "furniture"},
+        {"id": 11, "name": "Desk Lamp", "price": 39.5, "category": "lighting"}
+    ]))
+    writable_client.application.config["PRODUCTS_FILE"] = str(products_file)
+
+    old_version = writable_client.get("/admin/catalog").json["version"]
+    response = writable_client.post("/admin/reload")
+    assert response.status_code == 202
+    ej2c3.reloader.wait(5)
+
+    status = writable_client.get("/admin/catalog").json
+    assert status["version"] > old_version
+    assert status["products"] == 2
+    assert status["last_error"] is None
+    assert [p["id"] for p in writable_client.get("/products?category=furniture").json] == [10]
+
+    # Una recarga fallida mantiene el catálogo publicado
+    products_file.write_text(json.dumps([{"id": 12, "name": "Sin precio", "category": "x"}]))
+    writable_client.post("/admin/reload")
+    ej2c3.reloader.wait(5)
+    status = writable_client.get("/admin/catalog").json
+    assert status["products"] == 2
+    assert "price" in status["last_error"]
+
+@pytest.fixture
+def shared_publisher(monkeypatch):
+    """
+    Publica el catálogo en memoria compartida con un prefijo único y lo elimina al terminar
+    """
+    monkeypatch.setattr(ej2c3, "catalog", ej2c3.catalog)
+    publisher = SharedCatalogPublisher(f"test_catalog_{os.getpid()}_{id(monkeypatch)}")
+    publisher.publish(ej2c3.products)
+    yield publisher
+    publisher.close()
+
+def test_shared_catalog_columns(shared_publisher):
+    """
+    Prueba que las columnas publicadas se leen igual que el catálogo original
+    """
+    shared = SharedCatalog.attach(shared_publisher.prefix)
+    assert shared.version == 1
+    assert len(shared) == 8
+    assert shared.get(6) == ej2c3.products[5]
+    assert shared.get(99) is None
+    assert not shared.prices.flags.writeable
+
+    filters = ej2c3.parse_filters({"category": "electronics,furniture", "category!": "furniture", "max_price": "200"})
+    assert [p["id"] for p in shared.select(filters)] == [7, 8]
+    assert shared.stats(ej2c3.parse_filters({})) == Catalog(ej2c3.products, version=1).stats(ej2c3.parse_filters({}))
+
+def test_republish_keeps_version_on_invalid_file(shared_publisher, tmp_path):
+    """
+    Prueba que una recarga con un fichero corrupto no retira la versión publicada
+    """
+    path = tmp_path / "products.json"
+    path.write_text("{no es json", encoding="utf-8")
+    assert not ej2c3.republish_catalog(shared_publisher, str(path))
+    assert ej2c3.shared_catalog_version(shared_publisher.prefix) == 1
+    assert len(SharedCatalog.attach(shared_publisher.prefix)) == 8
+
+    path.write_text(json.dumps(ej2c3.products[:3]), encoding="utf-8")
+    assert ej2c3.republish_catalog(shared_publisher, str(path))
+    assert ej2c3.shared_catalog_version(shared_publisher.prefix) == 2
+    assert len(SharedCatalog.attach(shared_publisher.prefix)) == 3
+
+def test_shared_catalog_versions_are_released(shared_publisher, monkeypatch):
+    """
+    Prueba que un worker que cambia de versión no acumula descriptores ni mapeos
+    de las versiones retiradas
+    """
+    monkeypatch.setattr(ej2c3, "catalog", ej2c3.catalog)
+    # Tras una primera versión nueva el cargador ya conserva sus dos versiones
+    shared_publisher.publish(ej2c3.products)
+    ej2c3.refresh_shared_catalog(shared_publisher.prefix)
+    gc.disable()
+    try:
+        fds = len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None
+        old = weakref.ref(ej2c3.catalog)
+        ej2c3.catalog.stats(ej2c3.parse_filters({}))
+        for _ in range(20):
+            shared_publisher.publish(ej2c3.products)
+            ej2c3.refresh_shared_catalog(shared_publisher.prefix)
+        # Sin recolector de ciclos: la versión retirada se libera al dejar de usarse
+        assert old() is None
+        if fds is not None:
+            assert len(os.listdir("/proc/self/fd")) <= fds
+    finally:
+        gc.enable()
+
+def test_publisher_adopts_segments_of_a_crashed_loader(monkeypatch):
+    """
+    Prueba que un cargador nuevo reutiliza el segmento de control que dejó uno anterior
+    y continúa su numeración de versiones
+    """
+    monkeypatch.setattr(ej2c3, "catalog", ej2c3.catalog)
+    prefix = f"test_catalog_crash_{os.getpid()}"
+    crashed = SharedCatalogPublisher(prefix)
+    crashed.publish(ej2c3.products)
+    crashed.publish(ej2c3.products[:4])
+    # El cargador termina sin close(): sus segmentos siguen existiendo
+
+    publisher = SharedCatalogPublisher(prefix)
+    try:
+        assert publisher.version == 2
+        assert ej2c3.shared_catalog_version(prefix) == 2
+        assert len(SharedCatalog.attach(prefix)) == 4
+        assert publisher.publish(ej2c3.products[:3]) == 3
+        assert len(SharedCatalog.attach(prefix)) == 3
+    finally:
+        publisher.close()
+        crashed._segments.clear()
+        ej2c3.shared_controls.pop(prefix, None)
+
+def test_shared_catalog_app(shared_publisher):
+    """
+    Prueba un worker que sirve el catálogo desde memoria compartida y sigue sus versiones
+    """
+    app = create_app()
+    app.testing = True
+    app.config["SHARED_CATALOG"] = shared_publisher.prefix
+    client = app.test_client()
+
+    assert len(client.get("/products").json) == 8
+    assert [p["id"] for p in client.get("/products?name=laptp&fuzzy=true").json] == [1]
+    response = client.post("/products", json={"name": "Lamp", "price": 20, "category": "lighting"})
+    assert response.status_code == 409
+
+    shared_publisher.publish(ej2c3.products[:2])
+    status = client.get("/admin/catalog").json
+    assert status["version"] == 2
+    assert status["products"] == 2
+
+def test_price_range_during_update_returns_each_product_once():
+    """
+    Prueba que un lector que consulta a mitad de una actualización de precio (con el precio
+    nuevo ya en el índice y el antiguo aún sin quitar) ve el producto una sola vez
+    """
+    catalog = Catalog(ej2c3.products, version=1)
+    position = catalog.positions[6]
+    catalog.price_index.add((150.0, position))
+
+    filters = ej2c3.parse_filters({"min_price": "0", "max_price": "1000"})
+    assert [p["id"] for p in catalog.select(filters)] == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert [p["id"] for p in catalog.select(ej2c3.parse_filters({"min_price": "100", "max_price": "200"}))] == [5, 7, 8]
+
+def test_catalog_indexes_follow_writes_across_blocks(monkeypatch):
+    """
+    Prueba que los índices por bloques (bitmaps de categoría e índice de precios) siguen
+    coincidiendo con un recorrido completo tras muchas escrituras que dividen y vacían bloques
+    """
+    monkeypatch.setattr(ej2c3, "BITMAP_BLOCK_BITS", 8)
+    monkeypatch.setattr(ej2c3, "SORTED_BLOCK_SIZE", 2)
+    rng = random.Random(7)
+    catalog = Catalog(ej2c3.products, version=1)
+    categories = ["electronics", "furniture", "appliances", "toys"]
+    for _ in range(300):
+        ids = list(catalog.positions)
+        action = rng.random()
+        if action < 0.5 or not ids:
+            catalog.create({"name": "Item", "price": float(rng.randint(1, 50)), "category": rng.choice(categories)})
+        elif action < 0.8:
+            catalog.update(rng.choice(ids), {"price": float(rng.randint(1, 50)), "category": rng.choice(categories)})
+        else:
+            catalog.delete(rng.choice(ids))
+
+    queries = [
+        {"category": "toys"},
+        {"category": "furniture,appliances"},
+        {"category!": "electronics"},
+        {"category": "toys,furniture", "category!": "furniture"},
+        {"min_price": "10", "max_price": "20"},
+        {"min_price": "45"},
+        {"max_price": "3"},
+    ]
+    for args in queries:
+        filters = ej2c3.parse_filters(args)
+        expected = [p["id"] for p in catalog.slots if p is not None and ej2c3.matches(p, filters)]
+        assert [p["id"] for p in catalog.select(filters)] == expected, args
+    assert list(catalog.price_index) == sorted((p["price"], i) for i, p in enumerate(catalog.slots) if p is not None)
@@ -18,16 +18,342 @@ Esta actividad te enseñará a utilizar el sistema de registro de Flask,
 una habilidad crucial para el desarrollo y depuración de aplicaciones web.
 """
 
-from flask import Flask, request
+import atexit
+import logging
+import os
+import queue
+import random
+from datetime import datetime, timedelta, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import Flask, current_app, has_request_context, jsonify, request
+from flask.logging import default_handler
+
+# Registros que caben en la cola del log asíncrono
+LOG_QUEUE_SIZE = 10_000
+
+# Registros que se acumulan como máximo antes de escribirlos en el fichero
+LOG_BATCH_SIZE = 500
+
+# Formato de las líneas del fichero de log
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Registros que guarda el búfer circular en memoria
+LOG_RING_SIZE = 1000
+
+# Nivel mínimo de los registros que guarda el búfer circular
+LOG_RING_LEVEL = "INFO"
+
+# Origen de las horas del búfer circular, que se guardan en microsegundos enteros
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Qué hacer con un registro nuevo cuando la cola está llena
+DROP_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler para una cola acotada, con una política para cuando está llena:
+    - "drop_newest": se descarta el registro nuevo
+    - "drop_oldest": se descarta el registro más antiguo de la cola para dejar sitio al nuevo
+    - "block": la petición espera a que haya sitio (no se pierde ningún registro)
+    Los registros descartados se cuentan en dropped.
+
+    En el hilo de la petición solo se calcula el mensaje (los argumentos podrían cambiar después);
+    el formato de la línea y de la traza de las excepciones se hace en el hilo del QueueListener.
+    """
+
+    def __init__(self, log_queue, drop_policy="drop_newest"):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Política de descarte no válida: {drop_policy}")
+        super().__init__(log_queue)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.listener = None    # listener que vacía la cola, si lo instaló setup_queue_logging
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.drop_policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.drop_policy == "drop_oldest":
+                try:
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+
+class BatchingFileHandler(logging.FileHandler):
+    """
+    Manejador de fichero que acumula las líneas en memoria y las escribe juntas: cuando hay
+    batch_size líneas o cuando se llama a flush() (el listener lo hace al vaciar la cola)
+    """
+
+    def __init__(self, filename, batch_size=LOG_BATCH_SIZE, encoding="utf-8"):
+        super().__init__(filename, encoding=encoding)
+        self.batch_size = batch_size
+        self._batch = []
+
+    def emit(self, record):
+        try:
+            self._batch.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self._batch and self.stream is not None:
+                self.stream.write("".join(self._batch))
+                self._batch.clear()
+            super().flush()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+class BatchingQueueListener(QueueListener):
+    """
+    QueueListener que escribe el lote acumulado por sus manejadores cada vez que vacía la cola,
+    y cuyo stop() se puede llamar más de una vez (a mano y desde atexit)
+    """
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        super().stop()
+        for handler in self.handlers:
+            handler.close()
+
+class RouteSampler(logging.Filter):
+    """
+    Filtro que deja pasar solo una fracción de los registros de cada ruta (por nombre de endpoint).
+    Las rutas sin tasa configurada y los registros de nivel ERROR o superior pasan siempre.
+    Al ir en el logger, los registros descartados no llegan a formatearse en ningún manejador.
+    Las aplicaciones con el mismo nombre comparten logger y un único filtro, así que las tasas
+    se leen de la aplicación de la petición en curso (app.extensions["log_sampling"]).
+    """
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or not has_request_context():
+            return True
+        rate = current_app.extensions.get("log_sampling", {}).get(request.endpoint)
+        return rate is None or random.random() < rate
+
+class RingBufferHandler(logging.Handler):
+    """
+    Manejador que guarda los últimos capacity registros en memoria, sin E/S.
+    Los huecos se reservan al crearlo y cada registro sobrescribe el más antiguo;
+    de cada registro solo se guarda la hora, el nivel, el logger y el mensaje ya calculado.
+    La hora se guarda en microsegundos enteros, la misma precisión con la que se devuelve:
+    así una hora devuelta por records() sirve tal cual como since/until.
+    """
+
+    def __init__(self, capacity=LOG_RING_SIZE):
+        if capacity < 1:
+            raise ValueError(f"La capacidad del búfer debe ser al menos 1: {capacity}")
+        super().__init__()
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._written = 0
+
+    def emit(self, record):
+        # Handler.handle ya tiene el cerrojo del manejador
+        created = round(record.created * 1_000_000)
+        self._slots[self._written % self.capacity] = (created, record.levelno, record.name, record.getMessage())
+        self._written += 1
+
+    def records(self, level=logging.NOTSET, logger=None, since=None, until=None):
+        """
+        Devuelve, del más antiguo al más reciente, los registros guardados de nivel >= level,
+        del logger indicado o de sus descendientes y con la hora (microsegundos desde EPOCH)
+        en [since, until]
+        """
+        with self.lock:
+            start = max(0, self._written - self.capacity)
+            entries = [self._slots[i % self.capacity] for i in range(start, self._written)]
+        return [
+            {
+                "time": (EPOCH + timedelta(microseconds=created)).isoformat(),
+                "level": logging.getLevelName(levelno),
+                "logger": name,
+                "message": message,
+            }
+            for created, levelno, name, message in entries
+            if levelno >= level
+            and (logger is None or name == logger or name.startswith(logger + "."))
+            and (since is None or created >= since)
+            and (until is None or created <= until)
+        ]
+
+def parse_time(value):
+    """
+    Convierte una fecha ISO 8601 en microsegundos desde EPOCH; sin zona horaria se entiende UTC
+    """
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+def install_ring(logger, ring, level):
+    """
+    Añade el búfer circular a logger y baja el nivel del logger a level si hace falta
+    (sin depurar, el nivel efectivo de app.logger es WARNING). Los demás manejadores del
+    logger (consola, fichero) quedan en el nivel efectivo que tenía hasta ahora.
+    """
+    previous = logger.getEffectiveLevel()
+    threshold = logging.getLevelName(level)
+    if not isinstance(threshold, int):
+        raise ValueError(f"Nivel no válido para el búfer de registros: {level}")
+    if threshold < previous:
+        for handler in logger.handlers:
+            if handler.level < previous:
+                handler.setLevel(previous)
+        logger.setLevel(threshold)
+    logger.addHandler(ring)
+
+def setup_queue_logging(app, filename, queue_size=LOG_QUEUE_SIZE, drop_policy="drop_newest",
+                        batch_size=LOG_BATCH_SIZE, level=logging.INFO):
+    """
+    Configura el log de la aplicación para que no haga E/S en el hilo de la petición:
+    app.logger solo añade los registros a una cola acotada (BoundedQueueHandler) y un
+    BatchingQueueListener en segundo plano los escribe por lotes en filename.
+    Al terminar el proceso (atexit) se escriben los registros pendientes.
+    El logger es el mismo para todas las aplicaciones con este nombre: si ya tenía una cola,
+    se retira y su listener se para (escribiendo lo pendiente) antes de instalar la nueva.
+    Devuelve el listener, que también queda en app.extensions["log_listener"].
+    """
+    for handler in [h for h in app.logger.handlers if isinstance(h, BoundedQueueHandler)]:
+        app.logger.removeHandler(handler)
+        if handler.listener is not None:
+            handler.listener.stop()
+            atexit.unregister(handler.listener.stop)
+
+    log_queue = queue.Queue(queue_size)
+    file_handler = BatchingFileHandler(filename, batch_size=batch_size)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = BatchingQueueListener(log_queue, file_handler, respect_handler_level=True)
+
+    app.logger.removeHandler(default_handler)
+    queue_handler = BoundedQueueHandler(log_queue, drop_policy)
+    queue_handler.listener = listener
+    app.logger.addHandler(queue_handler)
+    app.logger.setLevel(level)
+    # Sin propagar: los manejadores del logger raíz volverían a escribir en el hilo de la petición
+    app.logger.propagate = False
+
+    listener.start()
+    atexit.register(listener.stop)
+    app.extensions["log_listener"] = listener
+    return listener
 
 def create_app():
     """
     Crea y configura la aplicación Flask
+    Con la variable de entorno LOG_FILE, el log se escribe en ese fichero desde un hilo en
+    segundo plano (ver setup_queue_logging); LOG_DROP_POLICY elige la política de descarte.
+    Los últimos LOG_RING_SIZE registros del logger, desde el nivel LOG_RING_LEVEL, se guardan
+    además en memoria y se consultan en /admin/logs
     """
     app = Flask(__name__)
 
     # Configuración básica del logger
     # Por defecto, los mensajes se registrarán en la consola
+    app.config["LOG_FILE"] = os.environ.get("LOG_FILE")
+    app.config["LOG_DROP_POLICY"] = os.environ.get("LOG_DROP_POLICY", "drop_newest")
+    if app.config["LOG_FILE"]:
+        setup_queue_logging(app, app.config["LOG_FILE"], drop_policy=app.config["LOG_DROP_POLICY"])
+
+    # El logger es el mismo para todas las aplicaciones con este nombre:
+    # el búfer y el filtro se instalan una sola vez
+    ring = next((h for h in app.logger.handlers if isinstance(h, RingBufferHandler)), None)
+    if ring is None:
+        ring = RingBufferHandler(int(os.environ.get("LOG_RING_SIZE", LOG_RING_SIZE)))
+        install_ring(app.logger, ring, os.environ.get("LOG_RING_LEVEL", LOG_RING_LEVEL).upper())
+    app.extensions["log_ring"] = ring
+    if not any(isinstance(f, RouteSampler) for f in app.logger.filters):
+        app.logger.addFilter(RouteSampler())
+    app.extensions["log_sampling"] = {}
+
+    @app.route('/admin/logging', methods=['GET'])
+    def get_logging():
+        """
+        Devuelve el nivel del logger de la aplicación, de werkzeug y del raíz, y las tasas de muestreo
+        """
+        loggers = {
+            name: logging.getLevelName(logging.getLogger(name).level)
+            for name in (app.logger.name, "werkzeug", "root")
+        }
+        return jsonify({"levels": loggers, "sampling": app.extensions["log_sampling"]}), 200
+
+    @app.route('/admin/logging', methods=['PUT'])
+    def set_logging():
+        """
+        Cambia en caliente los niveles de los loggers y las tasas de muestreo por ruta. Ejemplo:
+        {"levels": {"ej2d1": "DEBUG"}, "sampling": {"log_info": 0.1, "log_warning": null}}
+        Una tasa entre 0 y 1 es la fracción de registros que se conserva; null la elimina.
+        No se aplica ningún cambio si alguno no es válido.
+        """
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "El cuerpo debe ser un objeto JSON"}), 400
+        levels = data.get("levels", {})
+        sampling = data.get("sampling", {})
+        if not isinstance(levels, dict) or not isinstance(sampling, dict):
+            return jsonify({"error": "levels y sampling deben ser objetos"}), 400
+
+        for name, level in levels.items():
+            if not isinstance(level, str) or not isinstance(logging.getLevelName(level.upper()), int):
+                return jsonify({"error": f"Nivel no válido para {name}: {level}"}), 400
+        for endpoint, rate in sampling.items():
+            if endpoint not in app.view_functions:
+                return jsonify({"error": f"Ruta desconocida: {endpoint}"}), 400
+            if rate is not None and (isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 <= rate <= 1):
+                return jsonify({"error": f"Tasa no válida para {endpoint}: {rate}"}), 400
+
+        for name, level in levels.items():
+            logging.getLogger(None if name == "root" else name).setLevel(level.upper())
+        rates = app.extensions["log_sampling"]
+        for endpoint, rate in sampling.items():
+            if rate is None:
+                rates.pop(endpoint, None)
+            else:
+                rates[endpoint] = rate
+        return get_logging()
+
+    @app.route('/admin/logs', methods=['GET'])
+    def get_logs():
+        """
+        Devuelve los registros del búfer en memoria. Parámetros opcionales:
+        level (nivel mínimo), logger (nombre, incluye sus descendientes) y
+        since/until (fechas ISO 8601, ambas incluidas)
+        """
+        level = request.args.get("level", "NOTSET").upper()
+        if not isinstance(logging.getLevelName(level), int):
+            return jsonify({"error": f"Nivel no válido: {level}"}), 400
+        try:
+            since = parse_time(request.args["since"]) if "since" in request.args else None
+            until = parse_time(request.args["until"]) if "until" in request.args else None
+        except ValueError:
+            return jsonify({"error": "since y until deben ser fechas ISO 8601"}), 400
+        records = app.extensions["log_ring"].records(logging.getLevelName(level), request.args.get("logger"), since, until)
+        return jsonify({"records": records, "count": len(records)}), 200
 
     @app.route('/info', methods=['GET'])
     def log_info():
@@ -76,19 +402,13 @@ def create_app():
         Ejemplo: /status?level=warning
         """
         level = request.args.get('level', '').lower()
-        message = f"Mensaje desde /status con level={level}"
-
-        if level == 'info':
-            app.logger.info(message)
-        elif level == 'warning':
-            app.logger.warning(message)
-        elif level == 'error':
-            app.logger.error(message)
-        elif level == 'critical':
-            app.logger.critical(message)
-        else:
+        levels = {'info': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR, 'critical': logging.CRITICAL}
+        if level not in levels:
             return f"Nivel '{level}' no soportado. Usa: info, warning, error, critical"
 
+        # El mensaje solo se formatea si el nivel está activo
+        app.logger.log(levels[level], "Mensaje desde /status con level=%s", level)
+
         return f"Mensaje '{level.upper()}' registrado en el log"
 
     return app
@@ -1,7 +1,8 @@
 import pytest
 from flask.testing import FlaskClient
-from ej2d1 import create_app
+from ej2d1 import create_app, setup_queue_logging, BoundedQueueHandler, RingBufferHandler, RouteSampler, parse_time
 import logging
+import queue
 from io import StringIO
 
 class LogCaptureHandler(logging.Handler):
@@ -120,3 +121,208 @@ def test_status_endpoint_with_level(client):
     except:
         # Si el endpoint no está implementado, la prueba se omite
         pytest.skip("El endpoint /status no está implementado")
+
+def test_queue_logging_writes_file(tmp_path):
+    """
+    Prueba que con setup_queue_logging los mensajes acaban en el fichero, incluidos
+    los pendientes al parar el listener
+    """
+    app = create_app()
+    log_file = tmp_path / "app.log"
+    listener = setup_queue_logging(app, str(log_file), batch_size=50)
+    client = app.test_client()
+    for _ in range(120):
+        assert client.get("/warning").status_code == 200
+    listener.stop()
+    listener.stop()  # Una segunda llamada (como la de atexit) no hace nada
+
+    lines = log_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 120
+    assert all(" WARNING " in line for line in lines)
+
+def test_queue_logging_once_per_logger(tmp_path):
+    """
+    Prueba que configurar el log asíncrono de nuevo sustituye la cola anterior
+    en lugar de añadir otra: cada mensaje se escribe una sola vez
+    """
+    first, second = create_app(), create_app()
+    old_listener = setup_queue_logging(first, str(tmp_path / "first.log"))
+    listener = setup_queue_logging(second, str(tmp_path / "second.log"))
+    try:
+        queues = [h for h in second.logger.handlers if isinstance(h, BoundedQueueHandler)]
+        assert len(queues) == 1 and queues[0].listener is listener
+        assert old_listener._thread is None
+        second.test_client().get("/warning")
+    finally:
+        listener.stop()
+        second.logger.removeHandler(queues[0])
+    lines = (tmp_path / "second.log").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert (tmp_path / "first.log").read_text(encoding="utf-8") == ""
+
+def test_queue_handler_drop_policies():
+    """
+    Prueba las políticas de descarte con la cola llena
+    """
+    logger = logging.getLogger("ej2d1_test.drop")
+    logger.propagate = False
+    for policy, expected in (("drop_newest", ["0", "1"]), ("drop_oldest", ["3", "4"])):
+        log_queue = queue.Queue(2)
+        handler = BoundedQueueHandler(log_queue, policy)
+        logger.addHandler(handler)
+        for i in range(5):
+            logger.warning("%d", i)
+        logger.removeHandler(handler)
+        assert [record.msg for record in list(log_queue.queue)] == expected
+        assert handler.dropped == 3
+
+    with pytest.raises(ValueError):
+        BoundedQueueHandler(queue.Queue(2), "otra")
+
+def test_admin_logging_levels_and_sampling(client):
+    """
+    Prueba el cambio en caliente del nivel del logger y del muestreo por ruta
+    """
+    response = client.get("/admin/logging")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["levels"]["ej2d1"] == "INFO"
+    assert set(data["levels"]) == {"ej2d1", "werkzeug", "root"}
+    assert data["sampling"] == {}
+
+    # Con el nivel en ERROR los mensajes INFO y WARNING no se registran
+    response = client.put("/admin/logging", json={"levels": {"ej2d1": "error"}})
+    assert response.status_code == 200
+    assert response.get_json()["levels"]["ej2d1"] == "ERROR"
+    client.log_capture.get_logs()
+    client.get("/info")
+    client.get("/warning")
+    client.get("/error")
+    logs = client.log_capture.get_logs()
+    assert "INFO:" not in logs and "WARNING:" not in logs and "ERROR:" in logs
+
+    # Con tasa 0 se descartan los WARNING de /warning, pero no los de /status
+    response = client.put("/admin/logging", json={"levels": {"ej2d1": "INFO"}, "sampling": {"log_warning": 0}})
+    assert response.get_json()["sampling"] == {"log_warning": 0}
+    client.get("/warning")
+    client.get("/status?level=warning")
+    assert client.log_capture.get_logs().count("WARNING:") == 1
+
+    # Una tasa null elimina el muestreo de la ruta
+    response = client.put("/admin/logging", json={"sampling": {"log_warning": None}})
+    assert response.get_json()["sampling"] == {}
+    client.get("/warning")
+    assert "WARNING:" in client.log_capture.get_logs()
+
+    # Los cambios no válidos se rechazan sin aplicar nada
+    for body in ({"levels": {"ej2d1": "MUCHO"}}, {"sampling": {"no_existe": 0.5}},
+                 {"levels": {"ej2d1": "DEBUG"}, "sampling": {"log_info": 2}}, [1]):
+        assert client.put("/admin/logging", json=body).status_code == 400
+    assert client.get("/admin/logging").get_json()["levels"]["ej2d1"] == "INFO"
+
+def test_ring_buffer_keeps_last_records():
+    """
+    Prueba que el búfer circular conserva solo los últimos registros y filtra por logger
+    """
+    handler = RingBufferHandler(3)
+    for name in ("ej2d1_test.ring", "ej2d1_test.ring.child", "ej2d1_test.other"):
+        logger = logging.getLogger(name)
+        logger.propagate = False
+        logger.addHandler(handler)
+    for i in range(5):
+        logging.getLogger("ej2d1_test.ring").warning("mensaje %d", i)
+    logging.getLogger("ej2d1_test.ring.child").error("hijo")
+    logging.getLogger("ej2d1_test.other").error("otro")
+
+    assert [r["message"] for r in handler.records()] == ["mensaje 4", "hijo", "otro"]
+    assert [r["message"] for r in handler.records(logger="ej2d1_test.ring")] == ["mensaje 4", "hijo"]
+    assert [r["message"] for r in handler.records(level=logging.ERROR)] == ["hijo", "otro"]
+
+def test_ring_buffer_time_round_trip():
+    """
+    Prueba que la hora devuelta de cada registro, usada como since y until, lo selecciona
+    """
+    handler = RingBufferHandler(100)
+    base = 1_700_000_000.0
+    for i in range(100):
+        handler.handle(logging.makeLogRecord({"msg": str(i), "levelno": logging.INFO, "created": base + i * 0.0123456789}))
+    for record in handler.records():
+        moment = parse_time(record["time"])
+        assert [r["message"] for r in handler.records(since=moment, until=moment)] == [record["message"]]
+
+    with pytest.raises(ValueError):
+        RingBufferHandler(0)
+
+def test_admin_logs_endpoint(client):
+    """
+    Prueba la consulta del búfer de registros por nivel, logger y ventana de tiempo
+    """
+    client.get("/info")
+    client.get("/error")
+    response = client.get("/admin/logs")
+    assert response.status_code == 200
+    messages = [r["message"] for r in response.get_json()["records"]]
+    assert messages[-2:] == ["Mensaje de nivel INFO registrado desde /info",
+                             "Mensaje de nivel ERROR registrado desde /error"]
+
+    records = client.get("/admin/logs?level=error&logger=ej2d1").get_json()["records"]
+    assert all(r["level"] in ("ERROR", "CRITICAL") and r["logger"] == "ej2d1" for r in records)
+    error = records[-1]
+    assert error["message"] == "Mensaje de nivel ERROR registrado desde /error"
+
+    # La hora devuelta de un registro sirve como since y until para volver a encontrarlo
+    window = {"since": error["time"], "until": error["time"]}
+    assert error in client.get("/admin/logs", query_string=window).get_json()["records"]
+    assert client.get("/admin/logs", query_string={"until": "2000-01-01T00:00:00"}).get_json()["count"] == 0
+
+    assert client.get("/admin/logs?level=mucho").status_code == 400
+    assert client.get("/admin/logs?since=ayer").status_code == 400
+
+def test_shared_logger_setup():
+    """
+    Prueba que varias aplicaciones comparten un único búfer y un único filtro en el logger,
+    pero cada una tiene sus propias tasas de muestreo
+    """
+    first, second = create_app(), create_app()
+    samplers = [f for f in first.logger.filters if isinstance(f, RouteSampler)]
+    assert len(samplers) == 1
+    rings = [h for h in first.logger.handlers if isinstance(h, RingBufferHandler)]
+    assert rings == [first.extensions["log_ring"]] and second.extensions["log_ring"] is rings[0]
+
+    capture = LogCaptureHandler()
+    first.logger.addHandler(capture)
+    first.logger.setLevel(logging.INFO)
+    try:
+        assert first.test_client().put("/admin/logging", json={"sampling": {"log_warning": 0}}).status_code == 200
+        first.test_client().get("/warning")
+        second.test_client().get("/warning")
+        assert capture.get_logs().count("WARNING:") == 1
+        assert second.test_client().get("/admin/logging").get_json()["sampling"] == {}
+    finally:
+        first.logger.removeHandler(capture)
+
+def test_ring_buffer_keeps_info_without_debug():
+    """
+    Prueba que, sin configurar el logger, el búfer guarda los registros INFO
+    mientras la consola sigue mostrando solo desde WARNING
+    """
+    from flask.logging import default_handler
+    logger = logging.getLogger("ej2d1")
+    saved = (logger.level, default_handler.level, list(logger.handlers))
+    # Como en un proceso nuevo: solo el manejador de consola de Flask
+    logger.handlers[:] = [default_handler]
+    logger.setLevel(logging.NOTSET)
+    default_handler.setLevel(logging.NOTSET)
+    try:
+        app = create_app()
+        client = app.test_client()
+        client.get("/info")
+        client.get("/warning")
+        levels = [r["level"] for r in client.get("/admin/logs").get_json()["records"]]
+        assert levels[-2:] == ["INFO", "WARNING"]
+        assert logger.level == logging.INFO
+        assert default_handler.level == logging.WARNING
+    finally:
+        logger.handlers[:] = saved[2]
+        logger.setLevel(saved[0])
+        default_handler.setLevel(saved[1])
@@ -32,28 +32,576 @@ Tu tarea es implementar esta API en Flask con el manejo adecuado de errores.
 """
 
 from flask import Flask, jsonify, request, abort
+import io
+import json
 import logging
+import os
+import hashlib
+import queue
+import random
+import sqlite3
+import threading
+import time
+import traceback
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
 
-# Configuración del registro (logging)
-logging.basicConfig(level=logging.INFO)
+# Animales que se validan e insertan juntos en /animals/import
+IMPORT_BATCH_SIZE = 1000
+
+# Errores por línea que se incluyen como máximo en el resumen de /animals/import
+MAX_IMPORT_ERRORS = 100
+
+# Longitud máxima en bytes de una línea de /animals/import
+MAX_IMPORT_LINE = 64 * 1024
+
+# Segundos entre resúmenes de errores repetidos en el log
+ERROR_SUMMARY_INTERVAL = 60
+
+# Número máximo de huellas de error distintas que se cuentan por separado
+MAX_ERROR_FINGERPRINTS = 1000
+
+# Ruta con la que se agrupan las peticiones que no coinciden con ninguna ruta de la aplicación
+UNMATCHED_ROUTE = "<sin ruta>"
+
+# Ruta con la que se agrupan los errores nuevos cuando ya hay MAX_ERROR_FINGERPRINTS huellas
+OVERFLOW_ROUTE = "<otras>"
+
+# Número máximo de huellas de excepción distintas que se guardan
+MAX_EXCEPTION_FINGERPRINTS = 1000
+
+# Excepciones pendientes de formatear en segundo plano; si la cola está llena se descartan
+EXCEPTION_QUEUE_SIZE = 100
+
+# Configuración del registro (logging); la configuración global se hace solo al ejecutar el módulo
 logger = logging.getLogger(__name__)
 
-# Lista de animales predefinida
-animals = [
+class AnimalStore:
+    """
+    Almacén de animales seguro para servidores con varios hilos.
+    Todas las escrituras se hacen con un cerrojo: la asignación de IDs es atómica y no se pierden
+    altas ni borrados concurrentes.
+
+    Los animales se guardan en un diccionario por ID (en orden de alta) y se mantienen dos índices
+    que add() y delete() actualizan sin recorrer la colección:
+    - por especie: especie -> IDs de sus animales
+    - por nombre: lista ordenada de (nombre en minúsculas, ID) para buscar por prefijo con bisect
+    """
+
+    def __init__(self, animals):
+        self._animals = {}
+        self._by_species = {}   # especie -> {ID: None}, un diccionario usado como conjunto ordenado
+        self._names = []        # (nombre normalizado, ID) ordenados
+        self._lock = threading.Lock()
+        for animal in animals:
+            self._insert(animal)
+        # Este contador se usará para asignar IDs únicos
+        self.next_id = max(self._animals, default=0) + 1
+
+    def __len__(self):
+        return len(self._animals)
+
+    def all(self):
+        """
+        Devuelve la lista de animales
+        """
+        with self._lock:
+            return list(self._animals.values())
+
+    def get(self, animal_id):
+        """
+        Devuelve el animal con el ID indicado o None si no existe
+        """
+        return self._animals.get(animal_id)
+
+    def find(self, species=None, name_prefix=None):
+        """
+        Devuelve, en orden de alta, los animales de la especie indicada y/o cuyo nombre
+        empieza por name_prefix (sin distinguir mayúsculas de minúsculas)
+        """
+        with self._lock:
+            by_species = self._by_species.get(species, {}) if species is not None else None
+            if name_prefix is not None:
+                key = name_key(name_prefix)
+                lo = bisect_left(self._names, (key,))
+                hi = bisect_left(self._names, (key + "\U0010ffff",))
+                # Se recorre el candidato más pequeño y se comprueba el otro filtro
+                if by_species is None or hi - lo <= len(by_species):
+                    ids = sorted(animal_id for _, animal_id in self._names[lo:hi])
+                    if by_species is not None:
+                        ids = [animal_id for animal_id in ids if animal_id in by_species]
+                else:
+                    ids = [animal_id for animal_id in by_species
+                           if name_key(self._animals[animal_id]["name"]).startswith(key)]
+            elif by_species is not None:
+                ids = by_species
+            else:
+                ids = self._animals
+            return [self._animals[animal_id] for animal_id in ids]
+
+    def add(self, name, species):
+        """
+        Crea un animal con el siguiente ID disponible y lo devuelve
+        """
+        with self._lock:
+            animal = {"id": self.next_id, "name": name, "species": species}
+            self._insert(animal)
+            self.next_id += 1
+            return animal
+
+    def add_many(self, items):
+        """
+        Crea un animal por cada par (nombre, especie) tomando el cerrojo una sola vez
+        y devuelve la lista de animales creados
+        """
+        with self._lock:
+            added = []
+            for name, species in items:
+                animal = {"id": self.next_id, "name": name, "species": species}
+                self._insert(animal, sort_names=False)
+                self.next_id += 1
+                added.append(animal)
+            # Un único sort al final: timsort fusiona la parte ya ordenada con los nombres nuevos
+            self._names.sort()
+            return added
+
+    def delete(self, animal_id):
+        """
+        Elimina un animal. Devuelve False si no existe.
+        """
+        with self._lock:
+            animal = self._animals.pop(animal_id, None)
+            if animal is None:
+                return False
+            same_species = self._by_species[animal["species"]]
+            del same_species[animal_id]
+            if not same_species:
+                del self._by_species[animal["species"]]
+            del self._names[bisect_left(self._names, (name_key(animal["name"]), animal_id))]
+            return True
+
+    def _insert(self, animal, sort_names=True):
+        self._animals[animal["id"]] = animal
+        self._by_species.setdefault(animal["species"], {})[animal["id"]] = None
+        if sort_names:
+            insort(self._names, (name_key(animal["name"]), animal["id"]))
+        else:
+            self._names.append((name_key(animal["name"]), animal["id"]))
+
+def name_key(name):
+    """
+    Clave de un nombre para el índice ordenado: sin distinguir mayúsculas de minúsculas
+    """
+    return str(name).casefold()
+
+def parse_import_line(line):
+    """
+    Valida una línea NDJSON de /animals/import y devuelve (nombre, especie).
+    Lanza ValueError con la descripción del problema si no es válida.
+    """
+    try:
+        data = json.loads(line)
+    except ValueError:
+        # UnicodeDecodeError también es un ValueError
+        raise ValueError("JSON no válido") from None
+    if not isinstance(data, dict):
+        raise ValueError("Cada línea debe ser un objeto JSON")
+    if not isinstance(data.get("name"), str) or not isinstance(data.get("species"), str):
+        raise ValueError("Los campos 'name' y 'species' son obligatorios y deben ser texto")
+    return data["name"], data["species"]
+
+def read_lines(stream, max_length):
+    """
+    Genera (número de línea, línea) leyendo el flujo de forma incremental.
+    Las líneas de más de max_length bytes se descartan hasta el siguiente salto de línea
+    y se generan como None, de modo que la memoria usada no depende del tamaño de la entrada.
+    """
+    number = 0
+    while True:
+        line = stream.readline(max_length + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_length and not line.endswith(b"\n"):
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_length + 1)
+            yield number, None
+        else:
+            yield number, line
+
+def with_name_keys(animals):
+    """
+    Añade a cada animal su name_key, para insertarlo con SQLiteAnimalStore.INSERT_WITH_ID
+    """
+    return ({**animal, "name_key": name_key(animal["name"])} for animal in animals)
+
+class SQLiteAnimalStore:
+    """
+    Almacén de animales en una base de datos SQLite, con la misma interfaz que AnimalStore.
+    Usa el modo WAL (las lecturas no bloquean a las escrituras), una conexión reutilizada por
+    cada hilo y sentencias SQL constantes que sqlite3 prepara una vez por conexión.
+    Las búsquedas por ID usan la clave primaria y la especie tiene su propio índice.
+    Para buscar por prefijo, la columna name_key guarda name_key(name) con su propio índice.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS animals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            species TEXT NOT NULL,
+            name_key TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS animals_species ON animals (species)",
+    )
+    ADD_NAME_KEY = "ALTER TABLE animals ADD COLUMN name_key TEXT"
+    NAME_INDEX = "CREATE INDEX IF NOT EXISTS animals_name_key ON animals (name_key)"
+    SELECT_ALL = "SELECT id, name, species FROM animals ORDER BY id"
+    SELECT_ONE = "SELECT id, name, species FROM animals WHERE id = ?"
+    SELECT_NAMES = "SELECT id, name FROM animals"
+    FIND_SPECIES = "SELECT id, name, species FROM animals WHERE species = ? ORDER BY id"
+    FIND_PREFIX = "SELECT id, name, species FROM animals WHERE name_key >= ? AND name_key < ? ORDER BY id"
+    FIND_BOTH = """
+        SELECT id, name, species FROM animals
+        WHERE species = ? AND name_key >= ? AND name_key < ? ORDER BY id
+    """
+    COUNT = "SELECT COUNT(*) AS total FROM animals"
+    INSERT = "INSERT INTO animals (name, species, name_key) VALUES (?, ?, ?) RETURNING id, name, species"
+    INSERT_WITH_ID = "INSERT INTO animals (id, name, species, name_key) VALUES (:id, :name, :species, :name_key)"
+    SET_NAME_KEY = "UPDATE animals SET name_key = ? WHERE id = ?"
+    DELETE = "DELETE FROM animals WHERE id = ?"
+
+    def __init__(self, path, animals=(), timeout=30.0):
+        """
+        Los animales indicados solo se insertan si la tabla está vacía
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            # Las bases de datos creadas antes de la búsqueda por prefijo no tienen name_key
+            if "name_key" not in [column["name"] for column in conn.execute("PRAGMA table_info(animals)")]:
+                conn.execute(self.ADD_NAME_KEY)
+                rows = conn.execute(self.SELECT_NAMES).fetchall()
+                conn.executemany(self.SET_NAME_KEY, [(name_key(row["name"]), row["id"]) for row in rows])
+            conn.execute(self.NAME_INDEX)
+            if conn.execute(self.COUNT).fetchone()["total"] == 0:
+                conn.executemany(self.INSERT_WITH_ID, with_name_keys(animals))
+
+    def _connection(self):
+        """
+        Devuelve la conexión del hilo actual, creándola la primera vez
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            conn.row_factory = _row_to_dict
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def __len__(self):
+        return self._connection().execute(self.COUNT).fetchone()["total"]
+
+    def all(self):
+        """
+        Devuelve la lista de animales
+        """
+        return self._connection().execute(self.SELECT_ALL).fetchall()
+
+    def get(self, animal_id):
+        """
+        Devuelve el animal con el ID indicado o None si no existe
+        """
+        return self._connection().execute(self.SELECT_ONE, (animal_id,)).fetchone()
+
+    def find(self, species=None, name_prefix=None):
+        """
+        Igual que AnimalStore.find()
+        """
+        conn = self._connection()
+        if name_prefix is None:
+            if species is None:
+                return self.all()
+            return conn.execute(self.FIND_SPECIES, (species,)).fetchall()
+        key = name_key(name_prefix)
+        if species is None:
+            return conn.execute(self.FIND_PREFIX, (key, key + "\U0010ffff")).fetchall()
+        return conn.execute(self.FIND_BOTH, (species, key, key + "\U0010ffff")).fetchall()
+
+    def add(self, name, species):
+        """
+        Crea un animal con el siguiente ID disponible y lo devuelve
+        """
+        with self._connection() as conn:
+            return conn.execute(self.INSERT, (name, species, name_key(name))).fetchone()
+
+    def add_many(self, items):
+        """
+        Igual que AnimalStore.add_many(), en una única transacción
+        """
+        with self._connection() as conn:
+            return [conn.execute(self.INSERT, (name, species, name_key(name))).fetchone() for name, species in items]
+
+    def delete(self, animal_id):
+        """
+        Elimina un animal. Devuelve False si no existe.
+        """
+        with self._connection() as conn:
+            return conn.execute(self.DELETE, (animal_id,)).rowcount > 0
+
+    def close(self):
+        """
+        Cierra las conexiones de todos los hilos
+        """
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+def _row_to_dict(cursor, row):
+    """
+    Convierte una fila de SQLite en un diccionario
+    """
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+class ErrorLogAggregator:
+    """
+    Agrupa los errores por su huella (código de estado, ruta, mensaje) para no registrar una
+    línea por cada error repetido.
+
+    - La primera vez que aparece una huella se registra una línea con la ruta concreta.
+    - Las repeticiones solo se cuentan; cada ERROR_SUMMARY_INTERVAL segundos (al registrar el
+      siguiente error) se emite una línea de resumen por huella con las repeticiones del periodo.
+    - Los contadores se pueden consultar con snapshot(). Las peticiones a rutas inexistentes se
+      agrupan en UNMATCHED_ROUTE y, a partir de MAX_ERROR_FINGERPRINTS huellas, las nuevas
+      se agrupan en OVERFLOW_ROUTE, de modo que la memoria usada está acotada.
+    """
+
+    def __init__(self, logger, interval=ERROR_SUMMARY_INTERVAL, max_fingerprints=MAX_ERROR_FINGERPRINTS,
+                 clock=time.monotonic):
+        self.logger = logger
+        self.interval = interval
+        self.max_fingerprints = max_fingerprints
+        self._clock = clock
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._next_summary = clock() + interval
+
+    def record(self, level, status, route, message, path):
+        """
+        Cuenta un error y registra la primera aparición de su huella o los resúmenes pendientes
+        """
+        now = time.time()
+        with self._lock:
+            key = (status, route, message)
+            if key not in self._counters and len(self._counters) >= self.max_fingerprints:
+                key = (status, OVERFLOW_ROUTE, message)
+            entry = self._counters.get(key)
+            first = entry is None
+            if first:
+                entry = self._counters[key] = {"level": level, "count": 0, "suppressed": 0, "first_seen": now}
+            else:
+                entry["suppressed"] += 1
+            entry["count"] += 1
+            entry["last_seen"] = now
+
+            summaries = []
+            if self._clock() >= self._next_summary:
+                self._next_summary = self._clock() + self.interval
+                # Las huellas con el nivel desactivado conservan su cuenta y no se resumen
+                for fingerprint, pending in self._counters.items():
+                    if pending["suppressed"] and self.logger.isEnabledFor(pending["level"]):
+                        summaries.append((fingerprint, pending["level"], pending["suppressed"]))
+                        pending["suppressed"] = 0
+
+        # El log se escribe fuera del cerrojo
+        if first:
+            self.logger.log(level, "Error %d: %s en %s", status, message, path)
+        for (status, route, message), level, repeated in summaries:
+            self.logger.log(level, "Error %d: %s en %s repetido %d veces en los últimos %d s",
+                            status, message, route, repeated, self.interval)
+
+    def snapshot(self):
+        """
+        Devuelve los contadores de cada huella, de la más frecuente a la menos frecuente
+        """
+        with self._lock:
+            items = [(key, dict(entry)) for key, entry in self._counters.items()]
+        items.sort(key=lambda item: item[1]["count"], reverse=True)
+        return [{
+            "status": status,
+            "route": route,
+            "message": message,
+            "count": entry["count"],
+            "pending_summary": entry["suppressed"],
+            "first_seen": iso_time(entry["first_seen"]),
+            "last_seen": iso_time(entry["last_seen"]),
+        } for (status, route, message), entry in items]
+
+def innermost_frame(tb):
+    """
+    Devuelve (fichero, función, línea) del último marco de una traza: donde se lanzó la excepción
+    """
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    code = tb.tb_frame.f_code
+    return os.path.basename(code.co_filename), code.co_name, tb.tb_lineno
+
+class ExceptionTelemetry:
+    """
+    Agrega las excepciones no controladas por su huella: el tipo de la excepción y el marco
+    donde se lanzó. Por cada huella guarda el número de apariciones, la primera y la última
+    vez que se vio y un ejemplo con su traza completa.
+
+    En el hilo de la petición solo se calcula la huella (sin formatear nada) y se actualizan
+    los contadores. El ejemplo se elige por muestreo de reservorio (cada aparición tiene la
+    misma probabilidad de ser el ejemplo guardado), y la traza de los ejemplos elegidos se
+    formatea en un hilo en segundo plano. La primera aparición de cada huella se registra
+    en el log con su traza desde ese hilo. Si una excepción se descarta (demasiadas huellas o
+    cola llena), capture() lo indica para que quien llama registre la traza por su cuenta.
+    """
+
+    def __init__(self, logger, max_fingerprints=MAX_EXCEPTION_FINGERPRINTS, queue_size=EXCEPTION_QUEUE_SIZE):
+        self.logger = logger
+        self.max_fingerprints = max_fingerprints
+        self.dropped = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(queue_size)
+        self._worker = None
+
+    def capture(self, exc, path):
+        """
+        Cuenta una excepción y devuelve (huella, guardada). guardada es False si se descartó
+        (dropped): entonces su traza no llegará al log desde aquí
+        """
+        filename, function, lineno = innermost_frame(exc.__traceback__)
+        exc_type = f"{type(exc).__module__}.{type(exc).__qualname__}"
+        fingerprint = hashlib.sha1(f"{exc_type}|{filename}|{function}|{lineno}".encode()).hexdigest()[:12]
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            first = entry is None
+            if first:
+                if len(self._entries) >= self.max_fingerprints:
+                    self.dropped += 1
+                    return fingerprint, False
+                entry = self._entries[fingerprint] = {
+                    "type": exc_type,
+                    "frame": f"{filename}:{lineno} en {function}",
+                    "count": 0,
+                    "first_seen": now,
+                    "exemplar": None,
+                }
+            entry["count"] += 1
+            entry["last_seen"] = now
+            sampled = random.randrange(entry["count"]) == 0
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._format_exemplars, daemon=True)
+                self._worker.start()
+        if sampled:
+            try:
+                self._queue.put_nowait((fingerprint, first, exc, path, now))
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                return fingerprint, False
+        return fingerprint, True
+
+    def _format_exemplars(self):
+        while True:
+            fingerprint, first, exc, path, seen = self._queue.get()
+            try:
+                text = "".join(traceback.format_exception(exc))
+                with self._lock:
+                    self._entries[fingerprint]["exemplar"] = {
+                        "path": path,
+                        "message": str(exc),
+                        "seen": seen,
+                        "traceback": text,
+                    }
+                if first:
+                    self.logger.error("Excepción %s en %s (huella %s):\n%s", type(exc).__name__, path, fingerprint, text)
+            finally:
+                self._queue.task_done()
+
+    def wait(self):
+        """
+        Espera a que se hayan formateado todas las excepciones pendientes
+        """
+        self._queue.join()
+
+    def snapshot(self):
+        """
+        Devuelve las excepciones agregadas, de la más frecuente a la menos frecuente
+        """
+        with self._lock:
+            items = [(fingerprint, dict(entry)) for fingerprint, entry in self._entries.items()]
+        items.sort(key=lambda item: item[1]["count"], reverse=True)
+        return [{
+            "fingerprint": fingerprint,
+            "type": entry["type"],
+            "frame": entry["frame"],
+            "count": entry["count"],
+            "first_seen": iso_time(entry["first_seen"]),
+            "last_seen": iso_time(entry["last_seen"]),
+            "exemplar": entry["exemplar"] and {**entry["exemplar"], "seen": iso_time(entry["exemplar"]["seen"])},
+        } for fingerprint, entry in items]
+
+def iso_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+class AnimalApp(Flask):
+    """
+    Aplicación Flask que no formatea la traza de las excepciones no controladas en el hilo
+    de la petición: de eso se encarga ExceptionTelemetry desde el manejador de errores 500.
+    Si la telemetría descarta una excepción, el manejador usa log_dropped_exception().
+    """
+
+    def log_exception(self, exc_info):
+        pass
+
+    def log_dropped_exception(self, exc_info):
+        """
+        Registra la traza de forma síncrona, como Flask, para que ninguna excepción quede sin rastro
+        """
+        super().log_exception(exc_info)
+
+# Animales predefinidos
+INITIAL_ANIMALS = [
     {"id": 1, "name": "León", "species": "Panthera leo"},
     {"id": 2, "name": "Elefante", "species": "Loxodonta africana"},
     {"id": 3, "name": "Jirafa", "species": "Giraffa camelopardalis"}
 ]
 
-# Este contador se usará para asignar IDs únicos
-next_id = 4
+# Almacén con los animales predefinidos
+animals = AnimalStore(INITIAL_ANIMALS)
 
 def create_app():
     """
     Crea y configura la aplicación Flask con manejadores de errores personalizados
     """
-    app = Flask(__name__)
-    
+    app = AnimalApp(__name__)
+    app.extensions["error_log"] = ErrorLogAggregator(app.logger)
+    app.extensions["exceptions"] = ExceptionTelemetry(app.logger)
+
+    def log_error(level, status, message):
+        """
+        Registra un error agrupándolo por (código, ruta, mensaje)
+        """
+        route = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+        app.extensions["error_log"].record(level, status, route, message, request.path)
+
     # Manejador de errores 400 - Bad Request
     @app.errorhandler(400)
     def bad_request(error):
@@ -61,8 +609,8 @@ def create_app():
         Maneja errores de solicitud incorrecta (400)
         Devuelve un JSON con mensaje de error y código de estado 400
         """
-        # Registra el error usando app.logger.warning() con un mensaje descriptivo
-        app.logger.warning(f"Error 400: Solicitud incorrecta en {request.path}")
+        # Registra el error con nivel WARNING (agrupado con los errores iguales)
+        log_error(logging.WARNING, 400, "Solicitud incorrecta")
         # Devuelve un JSON con un mensaje descriptivo y el código de estado 400
         return jsonify({
             "error": "Solicitud incorrecta",
@@ -76,8 +624,8 @@ def create_app():
         Maneja errores de recurso no encontrado (404)
         Devuelve un JSON con mensaje de error y código de estado 404
         """
-        # Registra el error usando app.logger.info() con un mensaje descriptivo
-        app.logger.info(f"Error 404: Recurso no encontrado en {request.path}")
+        # Registra el error con nivel INFO (agrupado con los errores iguales)
+        log_error(logging.INFO, 404, "Recurso no encontrado")
         # Devuelve un JSON con un mensaje descriptivo y el código de estado 404
         return jsonify({
             "error": "Recurso no encontrado",
@@ -91,8 +639,8 @@ def create_app():
         Maneja errores de método no permitido (405)
         Devuelve un JSON con mensaje de error y código de estado 405
         """
-        # Registra el error usando app.logger.warning() con un mensaje descriptivo
-        app.logger.warning(f"Error 405: Método no permitido en {request.path}")
+        # Registra el error con nivel WARNING (agrupado con los errores iguales)
+        log_error(logging.WARNING, 405, "Método no permitido")
         # Devuelve un JSON con un mensaje descriptivo y el código de estado 405
         return jsonify({
             "error": "Método no permitido",
@@ -106,8 +654,17 @@ def create_app():
         Maneja errores internos del servidor (500)
         Registra el error en los logs y devuelve un JSON con mensaje de error
         """
-        # Registra el error usando app.logger.error() con los detalles del error
-        app.logger.error(f"Error 500: Error interno del servidor en {request.path} - {str(error)}")
+        # Las excepciones no controladas llegan envueltas en un InternalServerError
+        exc = getattr(error, "original_exception", None)
+        if exc is not None and exc.__traceback__ is not None:
+            fingerprint, captured = app.extensions["exceptions"].capture(exc, request.path)
+            if not captured:
+                app.log_dropped_exception((type(exc), exc, exc.__traceback__))
+            message = f"Error interno del servidor ({type(exc).__name__}, huella {fingerprint})"
+        else:
+            message = "Error interno del servidor"
+        # Registra el error con nivel ERROR (agrupado con los errores iguales)
+        log_error(logging.ERROR, 500, message)
         # Devuelve un JSON con un mensaje descriptivo y el código de estado 500
         return jsonify({
             "error": "Error interno del servidor",
@@ -118,9 +675,15 @@ def create_app():
     def get_animals():
         """
         Devuelve la lista completa de animales
+        Con los parámetros opcionales species (especie exacta) y name_prefix (comienzo del nombre,
+        sin distinguir mayúsculas de minúsculas) devuelve solo los animales que cumplen ambos
         """
-        # Devuelve la lista de animales en formato JSON con código 200
-        return jsonify(animals), 200
+        species = request.args.get("species")
+        name_prefix = request.args.get("name_prefix")
+        if species is None and name_prefix is None:
+            # Devuelve la lista de animales en formato JSON con código 200
+            return jsonify(animals.all()), 200
+        return jsonify(animals.find(species, name_prefix)), 200
 
     @app.route('/animals/<int:animal_id>', methods=['GET'])
     def get_animal(animal_id):
@@ -128,7 +691,7 @@ def create_app():
         Devuelve la información de un animal específico por su ID
         Si el animal no existe, debe activar un error 404
         """
-        animal = next((a for a in animals if a['id'] == animal_id), None)
+        animal = animals.get(animal_id)
         if animal is None:
             # Si el animal no existe, usa abort(404) para lanzar un error 404
             abort(404)
@@ -147,35 +710,86 @@ def create_app():
             # Si falta algún campo, usa abort(400) para lanzar un error
             abort(400)
 
-        # Si todo está correcto, agrega el nuevo animal a la lista y devuelve una respuesta adecuada (código 201)
-        global next_id
-        new_animal = {
-            "id": next_id,
-            "name": data["name"],
-            "species": data["species"]
-        }
-        animals.append(new_animal)
-        next_id += 1
+        # Si todo está correcto, agrega el nuevo animal y devuelve una respuesta adecuada (código 201)
+        new_animal = animals.add(data["name"], data["species"])
         return jsonify(new_animal), 201
 
+    @app.route('/animals/import', methods=['POST'])
+    def import_animals():
+        """
+        Importa animales desde un cuerpo NDJSON: un objeto JSON con "name" y "species" por línea
+        El cuerpo se lee por líneas a medida que llega y los animales se insertan en lotes de
+        IMPORT_BATCH_SIZE, así que la memoria usada no depende del tamaño de la entrada.
+        Las líneas no válidas no detienen la importación: se cuentan en el resumen, que incluye
+        el detalle de los primeros MAX_IMPORT_ERRORS errores. Las líneas vacías se ignoran.
+        """
+        imported = 0
+        failed = 0
+        errors = []
+        batch = []
+
+        def flush():
+            nonlocal imported
+            if batch:
+                imported += len(animals.add_many(batch))
+                batch.clear()
+
+        # request.stream lee byte a byte en readline(); el búfer lo lee por bloques
+        stream = io.BufferedReader(request.stream, buffer_size=MAX_IMPORT_LINE)
+        for number, line in read_lines(stream, MAX_IMPORT_LINE):
+            if line is not None and not line.strip():
+                continue
+            try:
+                if line is None:
+                    raise ValueError(f"La línea supera los {MAX_IMPORT_LINE} bytes")
+                batch.append(parse_import_line(line))
+            except ValueError as e:
+                failed += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append({"line": number, "error": str(e)})
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+        flush()
+
+        app.logger.info("Importación de animales: %d importados, %d con errores", imported, failed)
+        return jsonify({
+            "imported": imported,
+            "failed": failed,
+            "errors": errors,
+            "errors_truncated": failed > len(errors),
+        }), 200
+
     @app.route('/animals/<int:animal_id>', methods=['DELETE'])
     def delete_animal(animal_id):
         """
         Elimina un animal específico por su ID
         Si el animal no existe, debe activar un error 404
         """
-        # Verifica si el animal existe
-        animal = next((a for a in animals if a["id"] == animal_id), None)
-
-        if not animal:
+        # Elimina el animal si existe
+        if not animals.delete(animal_id):
             # Si no existe, usa abort(404) para lanzar un error 404
             abort(404)
 
-        # Si existe, elimínalo de la lista y devuelve una respuesta adecuada
-        global animals
-        animals = [a for a in animals if a["id"] != animal_id]
+        # Si existía, devuelve una respuesta adecuada
         return jsonify({"message": "Animal eliminado", "id": animal_id}), 200
 
+    @app.route('/admin/errors', methods=['GET'])
+    def get_error_counters():
+        """
+        Devuelve los contadores de errores agrupados por (código, ruta, mensaje)
+        """
+        error_log = app.extensions["error_log"]
+        return jsonify({"summary_interval": error_log.interval, "errors": error_log.snapshot()}), 200
+
+    @app.route('/admin/exceptions', methods=['GET'])
+    def get_exception_counters():
+        """
+        Devuelve las excepciones no controladas agrupadas por tipo y marco, con un ejemplo de cada una
+        """
+        telemetry = app.extensions["exceptions"]
+        return jsonify({"dropped": telemetry.dropped, "exceptions": telemetry.snapshot()}), 200
+
     # Endpoint adicional que lanza un error 500 para probar el manejador
     @app.route('/test-error', methods=['GET'])
     def test_error():
@@ -188,5 +802,14 @@ def create_app():
     return app
 
 if __name__ == '__main__':
+    # Con ANIMALS_DB los animales se guardan en SQLite
+    if os.environ.get("ANIMALS_DB"):
+        animals = SQLiteAnimalStore(os.environ["ANIMALS_DB"], INITIAL_ANIMALS)
     app = create_app()
+    # Con LOG_FILE el log se escribe en segundo plano, como en ej2d1
+    if os.environ.get("LOG_FILE"):
+        from ej2d1 import setup_queue_logging
+        setup_queue_logging(app, os.environ["LOG_FILE"], drop_policy=os.environ.get("LOG_DROP_POLICY", "drop_newest"))
+    else:
+        logging.basicConfig(level=logging.INFO)
     app.run(debug=True)
\ No newline at end of file
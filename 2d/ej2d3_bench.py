@@ -0,0 +1,97 @@
+"""
+Benchmark del almacén de animales de ej2d3.
+
+Compara la implementación original basada en una lista (búsqueda lineal), AnimalStore
+(diccionario por ID con índices por especie y nombre) y SQLiteAnimalStore (SQLite en modo WAL
+en un fichero temporal) en lecturas por ID, búsquedas, altas, borrados y lecturas concurrentes.
+
+Uso:
+    python ej2d3_bench.py [--animals 100000] [--ops 200] [--threads 4]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from ej2d3 import AnimalStore, SQLiteAnimalStore, with_name_keys
+
+def list_get(animals, animal_id):
+    return next((a for a in animals if a["id"] == animal_id), None)
+
+def list_find(animals, species, name_prefix):
+    prefix = name_prefix.casefold()
+    return [a for a in animals if a["species"] == species and a["name"].casefold().startswith(prefix)]
+
+def list_delete(animals, animal_id):
+    for i, animal in enumerate(animals):
+        if animal["id"] == animal_id:
+            del animals[i]
+            return True
+    return False
+
+def timed(operation, ops):
+    """
+    Ejecuta operation(i) ops veces y devuelve el tiempo medio por operación en microsegundos
+    """
+    start = time.perf_counter()
+    for i in range(ops):
+        operation(i)
+    return (time.perf_counter() - start) / ops * 1e6
+
+def timed_threads(operation, ops, threads):
+    """
+    Ejecuta operation(i) ops veces en cada hilo y devuelve el tiempo medio por operación en microsegundos
+    """
+    workers = [threading.Thread(target=lambda: [operation(i) for i in range(ops)]) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return (time.perf_counter() - start) / (ops * threads) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--animals", type=int, default=100_000, help="número de animales")
+    parser.add_argument("--ops", type=int, default=200, help="operaciones medidas por caso")
+    parser.add_argument("--threads", type=int, default=4, help="hilos en el caso concurrente")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    ids = [rng.randint(1, args.animals) for _ in range(args.ops)]
+    initial = [{"id": i, "name": f"Animal {i}", "species": f"Especie {i % 100}"} for i in range(1, args.animals + 1)]
+
+    memory_store = AnimalStore(initial)
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp_dir.name, "animals.db")
+    sqlite_store = SQLiteAnimalStore(db_path)
+    # Carga masiva directa en una sola transacción para no medir la inserción
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(SQLiteAnimalStore.INSERT_WITH_ID, with_name_keys(initial))
+
+    animal_list = list(initial)
+    results = {
+        "get (lista)": timed(lambda i: list_get(animal_list, ids[i]), args.ops),
+        "find (lista)": timed(lambda i: list_find(animal_list, f"Especie {i % 100}", f"Animal {i}"), args.ops),
+        "delete (lista)": timed(lambda i: list_delete(animal_list, ids[i]), args.ops),
+    }
+    for label, store in (("AnimalStore", memory_store), ("SQLite", sqlite_store)):
+        results[f"get ({label})"] = timed(lambda i: store.get(ids[i]), args.ops)
+        results[f"find ({label})"] = timed(lambda i: store.find(f"Especie {i % 100}", f"Animal {i}"), args.ops)
+        results[f"get x{args.threads} hilos ({label})"] = timed_threads(lambda i: store.get(ids[i]), args.ops, args.threads)
+        results[f"add ({label})"] = timed(lambda i: store.add("Nuevo", "Especie"), args.ops)
+        results[f"delete ({label})"] = timed(lambda i: store.delete(ids[i]), args.ops)
+
+    sqlite_store.close()
+    tmp_dir.cleanup()
+
+    print(f"{args.animals} animales, {args.ops} operaciones por caso")
+    for case, micros in results.items():
+        print(f"{case:<31} {micros:>14.1f} µs/op")
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,12 @@
 import pytest
 from flask import Flask
 from flask.testing import FlaskClient
-from ej2d3 import create_app
+import ej2d3
+from ej2d3 import create_app, AnimalStore, ErrorLogAggregator, ExceptionTelemetry, INITIAL_ANIMALS, SQLiteAnimalStore
+import json
 import logging
+import sys
+import threading
 from io import StringIO
 
 
@@ -121,3 +125,186 @@ def test_method_not_allowed(client):
 #     assert "ERROR:" in logs, "Debe registrarse un mensaje de nivel ERROR para errores 500"
 #     assert "test-error" in logs, "El log debe incluir información de la ruta que causó el error"
 
+
+def test_concurrent_animal_writers(monkeypatch):
+    """Stress test: parallel POST/DELETE /animals never duplicate ids or lose writes"""
+    monkeypatch.setattr(ej2d3, "animals", AnimalStore([]))
+    app = create_app()
+    app.testing = True
+    created = [[] for _ in range(8)]
+
+    def worker(i):
+        client = app.test_client()
+        for n in range(100):
+            response = client.post("/animals", json={"name": f"a{i}-{n}", "species": "Testus"})
+            created[i].append(response.json["id"])
+            if n % 2:
+                assert client.delete(f"/animals/{response.json['id']}").status_code == 200
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    ids = [animal_id for ids in created for animal_id in ids]
+    assert len(set(ids)) == 800
+    assert len(app.test_client().get("/animals").json) == 400
+
+def test_sqlite_animal_store(monkeypatch, tmp_path):
+    """Test SQLiteAnimalStore behind the API: seeding, CRUD and persistence"""
+    path = str(tmp_path / "animals.db")
+    store = SQLiteAnimalStore(path, INITIAL_ANIMALS)
+    monkeypatch.setattr(ej2d3, "animals", store)
+    client = create_app().test_client()
+
+    assert client.get("/animals").json == INITIAL_ANIMALS
+    response = client.post("/animals", json={"name": "Cebra", "species": "Equus quagga"})
+    assert response.json == {"id": 4, "name": "Cebra", "species": "Equus quagga"}
+    assert client.get("/animals/4").json["name"] == "Cebra"
+    assert client.delete("/animals/1").status_code == 200
+    assert client.get("/animals/1").status_code == 404
+    store.close()
+
+    # The seed is only inserted into an empty table
+    reopened = SQLiteAnimalStore(path, INITIAL_ANIMALS)
+    assert [a["id"] for a in reopened.all()] == [2, 3, 4]
+    assert len(reopened) == 3
+    reopened.close()
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_filter_animals_by_species_and_name_prefix(monkeypatch, tmp_path, backend):
+    """Test GET /animals?species=&name_prefix= served from the indexes"""
+    seed = INITIAL_ANIMALS + [
+        {"id": 4, "name": "Leopardo", "species": "Panthera pardus"},
+        {"id": 5, "name": "leona", "species": "Panthera leo"},
+        {"id": 6, "name": "Lémur", "species": "Lemur catta"},
+    ]
+    store = AnimalStore(seed) if backend == "memory" else SQLiteAnimalStore(str(tmp_path / "a.db"), seed)
+    monkeypatch.setattr(ej2d3, "animals", store)
+    client = create_app().test_client()
+
+    def ids(url):
+        return [a["id"] for a in client.get(url).json]
+
+    assert ids("/animals?species=Panthera leo") == [1, 5]
+    assert ids("/animals?name_prefix=le") == [1, 4, 5]
+    assert ids("/animals?name_prefix=LÉ") == [6]
+    assert ids("/animals?species=Panthera leo&name_prefix=LEON") == [5]
+    assert ids("/animals?species=Felis catus") == []
+
+    # Indexes follow adds and deletes
+    client.post("/animals", json={"name": "Leonberger", "species": "Canis familiaris"})
+    client.delete("/animals/5")
+    assert ids("/animals?name_prefix=leon") == [7]
+    assert ids("/animals?species=Panthera leo") == [1]
+    assert ids("/animals") == [1, 2, 3, 4, 6, 7]
+    if backend == "sqlite":
+        store.close()
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_import_animals_ndjson(monkeypatch, tmp_path, backend):
+    """Test POST /animals/import with batched inserts and per-line errors"""
+    store = AnimalStore([]) if backend == "memory" else SQLiteAnimalStore(str(tmp_path / "a.db"))
+    monkeypatch.setattr(ej2d3, "animals", store)
+    monkeypatch.setattr(ej2d3, "IMPORT_BATCH_SIZE", 7)
+    monkeypatch.setattr(ej2d3, "MAX_IMPORT_ERRORS", 2)
+    monkeypatch.setattr(ej2d3, "MAX_IMPORT_LINE", 200)
+    app = create_app()
+    log_capture = LogCaptureHandler()
+    app.logger.addHandler(log_capture)
+    client = app.test_client()
+
+    lines = [json.dumps({"name": f"Animal {i}", "species": "Testus"}) for i in range(20)]
+    lines[3] = "{no es json"
+    lines[8] = json.dumps({"name": "Sin especie"})
+    lines[12] = json.dumps({"name": "x" * 500, "species": "Testus"})
+    lines[15] = ""
+    body = ("\n".join(lines) + "\n").encode("utf-8")
+
+    response = client.post("/animals/import", data=body, content_type="application/x-ndjson")
+    assert response.status_code == 200
+    assert response.json == {
+        "imported": 16,
+        "failed": 3,
+        "errors": [{"line": 4, "error": "JSON no válido"},
+                   {"line": 9, "error": "Los campos 'name' y 'species' son obligatorios y deben ser texto"}],
+        "errors_truncated": True,
+    }
+    names = [a["name"] for a in client.get("/animals").json]
+    assert names[:4] == ["Animal 0", "Animal 1", "Animal 2", "Animal 4"]
+    assert names[-1] == "Animal 19" and len(names) == 16
+    # Bad lines do not go through the 400 handler
+    assert "Error 400" not in log_capture.get_logs()
+    if backend == "sqlite":
+        store.close()
+
+def test_repeated_errors_are_aggregated(client):
+    """Test a 404 storm logs once, then periodic summaries, with counters on /admin/errors"""
+    now = [0.0]
+    app = client.application
+    app.extensions["error_log"] = ErrorLogAggregator(app.logger, interval=60, clock=lambda: now[0])
+
+    for i in range(500):
+        client.get(f"/animals/{1000 + i}")
+    for i in range(3):
+        client.get(f"/wp-admin/{i}.php")
+    logs = client.log_capture.get_logs()
+    assert logs.count("Error 404") == 2
+    assert "INFO: Error 404: Recurso no encontrado en /animals/1000" in logs
+
+    # After the interval, the next error triggers one summary line per fingerprint
+    now[0] = 61
+    client.post("/animals", json={})
+    logs = client.log_capture.get_logs()
+    assert "WARNING: Error 400: Solicitud incorrecta en /animals" in logs
+    assert "en /animals/<int:animal_id> repetido 499 veces en los últimos 60 s" in logs
+    assert "en <sin ruta> repetido 2 veces" in logs
+
+    errors = client.get("/admin/errors").json["errors"]
+    assert [(e["status"], e["route"], e["count"]) for e in errors] == [
+        (404, "/animals/<int:animal_id>", 500), (404, "<sin ruta>", 3), (400, "/animals", 1),
+    ]
+
+def test_exception_telemetry(client):
+    """Test unhandled exceptions are fingerprinted and aggregated with a formatted exemplar"""
+    app = client.application
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+    for _ in range(5):
+        response = client.get("/test-error")
+        assert response.status_code == 500
+        assert response.json["error"] == "Error interno del servidor"
+    app.extensions["exceptions"].wait()
+
+    exceptions = client.get("/admin/exceptions").json["exceptions"]
+    assert len(exceptions) == 1
+    entry = exceptions[0]
+    assert entry["type"] == "builtins.Exception"
+    assert entry["frame"].startswith("ej2d3.py:") and entry["frame"].endswith("en test_error")
+    assert entry["count"] == 5
+    assert entry["exemplar"]["path"] == "/test-error"
+    assert "raise Exception" in entry["exemplar"]["traceback"]
+
+    # One aggregated ERROR line plus the traceback logged once from the background thread
+    logs = client.log_capture.get_logs()
+    assert logs.count(f"huella {entry['fingerprint']}") == 2
+    assert "ERROR: Error 500: Error interno del servidor (Exception" in logs and "/test-error" in logs
+    assert logs.count("Traceback") == 1
+
+def test_dropped_exceptions_are_logged_synchronously(client):
+    """Test an exception dropped by the telemetry still leaves its traceback in the log"""
+    app = client.application
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+    app.extensions["exceptions"] = ExceptionTelemetry(app.logger, max_fingerprints=0)
+    for _ in range(2):
+        assert client.get("/test-error").status_code == 500
+
+    assert app.extensions["exceptions"].dropped == 2
+    logs = client.log_capture.get_logs()
+    assert logs.count("Traceback") == 2
+    assert "Exception on /test-error [GET]" in logs